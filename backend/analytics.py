@@ -0,0 +1,175 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# The facility-wide summary is one document, kept current with $inc on
+# every test insert/delete and client stats change:
+#   tests.count, tests.score_histogram.<total_score>,
+#   tests.exercises.<exercise_id>.tested / .pain,
+#   clients.latest_score_histogram.<latest_score>
+SUMMARY_ID = "facility"
+
+async def _apply_increments(db: AsyncIOMotorDatabase, increments: Dict[str, int], session: Optional[AsyncIOMotorClientSession] = None):
+    increments = {path: n for path, n in increments.items() if n}
+    if increments:
+        await db.analytics_summary.update_one(
+            {"_id": SUMMARY_ID},
+            {"$inc": increments},
+            upsert=True,
+            session=session
+        )
+
+def _test_increments(test: Dict[str, Any], sign: int) -> Dict[str, int]:
+    increments = {
+        "tests.count": sign,
+        f"tests.score_histogram.{test['total_score']}": sign,
+    }
+    for exercise_id, score in test["scores"].items():
+        increments[f"tests.exercises.{exercise_id}.tested"] = sign
+        if score.get("pain"):
+            increments[f"tests.exercises.{exercise_id}.pain"] = sign
+    return increments
+
+async def record_test_added(db: AsyncIOMotorDatabase, test: Dict[str, Any], session: Optional[AsyncIOMotorClientSession] = None):
+    """Count a newly stored test document in the summary"""
+    await _apply_increments(db, _test_increments(test, 1), session)
+
+async def record_tests_added(db: AsyncIOMotorDatabase, tests: List[Dict[str, Any]], session: Optional[AsyncIOMotorClientSession] = None):
+    """Count a batch of newly stored tests with a single summary update"""
+    increments: Dict[str, int] = {}
+    for test in tests:
+        for path, count in _test_increments(test, 1).items():
+            increments[path] = increments.get(path, 0) + count
+    await _apply_increments(db, increments, session)
+
+async def record_test_removed(db: AsyncIOMotorDatabase, test: Dict[str, Any], session: Optional[AsyncIOMotorClientSession] = None):
+    """Remove a deleted test document from the summary"""
+    await _apply_increments(db, _test_increments(test, -1), session)
+
+async def record_latest_score_change(
+    db: AsyncIOMotorDatabase,
+    old_score: Optional[int],
+    new_score: Optional[int],
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Move a client between latest-score buckets (None means no tests)"""
+    if old_score == new_score:
+        return
+    increments = {}
+    if old_score is not None:
+        increments[f"clients.latest_score_histogram.{old_score}"] = -1
+    if new_score is not None:
+        increments[f"clients.latest_score_histogram.{new_score}"] = 1
+    await _apply_increments(db, increments, session)
+
+async def record_latest_score_changes(
+    db: AsyncIOMotorDatabase,
+    changes: List[Tuple[Optional[int], Optional[int]]],
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Apply many (old, new) latest-score moves with a single summary update"""
+    increments: Dict[str, int] = {}
+    for old_score, new_score in changes:
+        if old_score == new_score:
+            continue
+        if old_score is not None:
+            path = f"clients.latest_score_histogram.{old_score}"
+            increments[path] = increments.get(path, 0) - 1
+        if new_score is not None:
+            path = f"clients.latest_score_histogram.{new_score}"
+            increments[path] = increments.get(path, 0) + 1
+    await _apply_increments(db, increments, session)
+
+def _tests_summary_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aggregate the summary fields contributed by the tests matching `match`"""
+    return [
+        {"$match": match},
+        {
+            "$facet": {
+                "scores": [
+                    {"$group": {"_id": "$total_score", "count": {"$sum": 1}}}
+                ],
+                "exercises": [
+                    {"$project": {"scores": {"$objectToArray": "$scores"}}},
+                    {"$unwind": "$scores"},
+                    {
+                        "$group": {
+                            "_id": "$scores.k",
+                            "tested": {"$sum": 1},
+                            "pain": {"$sum": {"$cond": ["$scores.v.pain", 1, 0]}}
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+
+def _facet_increments(facet: Dict[str, Any], sign: int) -> Dict[str, int]:
+    increments = {"tests.count": sign * sum(bucket["count"] for bucket in facet["scores"])}
+    for bucket in facet["scores"]:
+        increments[f"tests.score_histogram.{bucket['_id']}"] = sign * bucket["count"]
+    for exercise in facet["exercises"]:
+        increments[f"tests.exercises.{exercise['_id']}.tested"] = sign * exercise["tested"]
+        increments[f"tests.exercises.{exercise['_id']}.pain"] = sign * exercise["pain"]
+    return increments
+
+async def tests_removal_increments(
+    db: AsyncIOMotorDatabase,
+    match: Dict[str, Any],
+    session: Optional[AsyncIOMotorClientSession] = None
+) -> Dict[str, int]:
+    """Summary increments that remove the tests matching `match`; read before deleting them"""
+    facets = await db.test_results.aggregate(_tests_summary_pipeline(match), session=session).to_list(1)
+    return _facet_increments(facets[0], -1)
+
+async def record_tests_removed(
+    db: AsyncIOMotorDatabase,
+    increments: Dict[str, int],
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Apply increments from tests_removal_increments once the tests are deleted"""
+    await _apply_increments(db, increments, session)
+
+async def record_client_removed(
+    db: AsyncIOMotorDatabase,
+    latest_score: Optional[int],
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Subtract a deleted client from the latest-score histogram (its tests are removed separately)"""
+    if latest_score is not None:
+        await _apply_increments(db, {f"clients.latest_score_histogram.{latest_score}": -1}, session)
+
+async def rebuild_analytics_summary(db: AsyncIOMotorDatabase):
+    """Recompute the summary document from test_results and clients"""
+    facets = await db.test_results.aggregate(_tests_summary_pipeline({})).to_list(1)
+    increments = _facet_increments(facets[0], 1)
+
+    summary = {"tests": {"count": increments.pop("tests.count"), "score_histogram": {}, "exercises": {}}}
+    for path, count in increments.items():
+        parts = path.split(".")
+        if parts[1] == "score_histogram":
+            summary["tests"]["score_histogram"][parts[2]] = count
+        else:
+            summary["tests"]["exercises"].setdefault(parts[2], {})[parts[3]] = count
+
+    latest = await db.clients.aggregate([
+        {"$match": {"latest_score": {"$ne": None}}},
+        {"$group": {"_id": "$latest_score", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    summary["clients"] = {"latest_score_histogram": {str(bucket["_id"]): bucket["count"] for bucket in latest}}
+    summary["rebuilt_at"] = datetime.utcnow()
+
+    await db.analytics_summary.replace_one({"_id": SUMMARY_ID}, summary, upsert=True)
+
+async def ensure_analytics_summary(db: AsyncIOMotorDatabase):
+    """Build the summary on first start so incremental updates have a base to apply to"""
+    try:
+        if await db.analytics_summary.count_documents({"_id": SUMMARY_ID}, limit=1) == 0:
+            await rebuild_analytics_summary(db)
+            logger.info("Built analytics summary")
+    except Exception as e:
+        logger.error(f"Error building analytics summary: {str(e)}")
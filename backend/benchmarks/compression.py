@@ -0,0 +1,52 @@
+"""Ratio and cost of each response codec and level on a page of clients and on the FMS catalog.
+
+Run from backend/:  python -m benchmarks.compression
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from compression import CODECS, compress
+from routes.fms_exercises import CATALOG
+from serialization import CLIENT_SHAPE, dumps
+
+LEVELS = {"gzip": (1, 4, 6, 9), "br": (1, 2, 4, 6, 11), "zstd": (1, 3, 6, 19)}
+
+def client_page(size: int = 100) -> bytes:
+    """A GET /clients/ body of `size` clients"""
+    now = datetime(2024, 1, 1)
+    clients = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Client {index}",
+            "email": f"client{index}@example.com",
+            "phone": f"+1 555 01{index:02d}",
+            "date_of_birth": "1990-05-17",
+            "occupation": "Physiotherapist",
+            "created_at": now + timedelta(days=index),
+            "total_tests": index % 7,
+            "latest_score": 10 + index % 11,
+            "last_test_date": now + timedelta(days=index, hours=3),
+        }
+        for index in range(size)
+    ]
+    return dumps(CLIENT_SHAPE.documents(clients))
+
+def measure(body: bytes, coding: str, level: int):
+    """(compressed size, microseconds per compress)"""
+    runs = max(5, 2_000_000 // max(len(body), 1) // (level + 1))
+    started = time.perf_counter()
+    for _ in range(runs):
+        compressed = compress(body, coding, level)
+    return len(compressed), (time.perf_counter() - started) / runs * 1e6
+
+def main():
+    for label, body in (("clients page (100)", client_page()), ("FMS catalog", CATALOG.body)):
+        print(f"{label}: {len(body)} bytes")
+        for coding in CODECS:
+            for level in LEVELS[coding]:
+                size, cost = measure(body, coding, level)
+                print(f"  {coding:5} {level:3}  {size:7} bytes  {len(body) / size:5.1f}x  {cost:9.1f} us")
+
+if __name__ == "__main__":
+    main()
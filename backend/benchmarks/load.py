@@ -0,0 +1,309 @@
+"""Concurrent load test of the API, reported as JSON to diff between releases.
+
+Starts the app in-process with uvicorn on a free local port (or targets
+--base-url), seeds clients and tests through the API, then runs
+--concurrency asyncio workers for --duration seconds. Each request picks
+an operation from the weighted --mix.
+
+Run from backend/:
+    python -m benchmarks.load --in-memory --duration 20 --output load.json
+    python -m benchmarks.load --mongo-url mongodb://localhost:27017 --db-name fms_load
+    python -m benchmarks.load --base-url http://127.0.0.1:8001 --mix get_client=80,exercises=20
+
+--in-memory runs the app on the memory storage backend (STORAGE_BACKEND=memory).
+It measures the app and serialization rather than the database, so it is
+only comparable with other --in-memory runs. The harness needs httpx, from
+requirements-dev.txt.
+"""
+import argparse
+import asyncio
+import os
+import platform
+import random
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+import orjson
+from trends import EXERCISE_IDS
+
+DEFAULT_MIX = "get_client=25,list_clients=15,client_tests=20,get_test=15,create_test=10,exercises=10,summary=3,filter_tests=2"
+
+class LoadState:
+    """Ids created by the seed and by write operations, shared by the workers"""
+
+    def __init__(self):
+        self.client_ids: List[str] = []
+        self.test_ids: List[str] = []
+
+def random_scores(rng: random.Random) -> Dict[str, Any]:
+    return {exercise_id: {"score": rng.randint(0, 3), "pain": rng.random() < 0.1} for exercise_id in EXERCISE_IDS}
+
+# Operations: (client, state, rng) -> response
+Operation = Callable[[httpx.AsyncClient, LoadState, random.Random], Awaitable[httpx.Response]]
+
+async def list_clients(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get("/api/clients/", params={"limit": 50})
+
+async def get_client(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get(f"/api/clients/{rng.choice(state.client_ids)}")
+
+async def client_tests(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get(f"/api/test-results/client/{rng.choice(state.client_ids)}", params={"limit": 20})
+
+async def get_test(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get(f"/api/test-results/{rng.choice(state.test_ids)}")
+
+async def create_test(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    response = await http.post("/api/test-results/", json={
+        "client_id": rng.choice(state.client_ids),
+        "scores": random_scores(rng),
+    })
+    if response.status_code == 200:
+        state.test_ids.append(response.json()["id"])
+    return response
+
+async def create_client(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    response = await http.post("/api/clients/", json=client_payload(rng))
+    if response.status_code == 200:
+        state.client_ids.append(response.json()["id"])
+    return response
+
+async def exercises(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get("/api/fms-exercises/")
+
+async def summary(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get("/api/clients/summary")
+
+async def filter_tests(http: httpx.AsyncClient, state: LoadState, rng: random.Random) -> httpx.Response:
+    return await http.get("/api/test-results/filter", params={"exercise": rng.choice(EXERCISE_IDS), "max_score": 1, "limit": 50})
+
+OPERATIONS: Dict[str, Operation] = {
+    "list_clients": list_clients,
+    "get_client": get_client,
+    "client_tests": client_tests,
+    "get_test": get_test,
+    "create_test": create_test,
+    "create_client": create_client,
+    "exercises": exercises,
+    "summary": summary,
+    "filter_tests": filter_tests,
+}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """name=weight pairs, e.g. "get_client=80,exercises=20" """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def client_payload(rng: random.Random) -> Dict[str, Any]:
+    number = rng.randrange(10 ** 9)
+    return {"name": f"Load Client {number}", "email": f"load{number}@example.com", "occupation": "Athlete"}
+
+async def seed(http: httpx.AsyncClient, state: LoadState, clients: int, tests_per_client: int, rng: random.Random):
+    """Create the clients, then their tests through the batch sync endpoint"""
+    semaphore = asyncio.Semaphore(16)
+
+    async def create(payload):
+        async with semaphore:
+            response = await http.post("/api/clients/", json=payload)
+            response.raise_for_status()
+            state.client_ids.append(response.json()["id"])
+
+    await asyncio.gather(*(create(client_payload(rng)) for _ in range(clients)))
+
+    items = [
+        {"idempotency_key": str(uuid.uuid4()), "client_id": client_id, "scores": random_scores(rng)}
+        for client_id in state.client_ids
+        for _ in range(tests_per_client)
+    ]
+    for start in range(0, len(items), 500):
+        response = await http.post("/api/test-results/batch", json={"items": items[start:start + 500]})
+        response.raise_for_status()
+        state.test_ids.extend(result["id"] for result in response.json()["results"] if result["status"] == "created")
+
+def latency_summary(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Milliseconds, rounded to microseconds"""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    values = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def operation_report(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    requests = len(latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 6) if requests else 0.0,
+        "throughput_rps": round(requests / duration, 2),
+        "latency_ms": latency_summary(latencies),
+    }
+
+async def run_load(
+    http: httpx.AsyncClient,
+    state: LoadState,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed_value: int
+) -> Dict[str, Any]:
+    """Run the workers; only requests finishing after the warmup are counted"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    status_codes: Dict[str, int] = {}
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    async def worker(index: int):
+        rng = random.Random(seed_value * 1000 + index)
+        while True:
+            name = rng.choices(names, weights)[0]
+            request_started = time.perf_counter()
+            if request_started >= stop_at:
+                return
+            try:
+                response = await OPERATIONS[name](http, state, rng)
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except Exception as e:
+                status = type(e).__name__
+                failed = True
+            finished = time.perf_counter()
+            if finished < measure_from or finished > stop_at:
+                continue
+            latencies[name].append(finished - request_started)
+            status_codes[status] = status_codes.get(status, 0) + 1
+            if failed:
+                errors[name] += 1
+
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+
+    all_latencies = [latency for samples in latencies.values() for latency in samples]
+    return {
+        **operation_report(all_latencies, sum(errors.values()), duration),
+        "status_codes": status_codes,
+        "operations": {name: operation_report(latencies[name], errors[name], duration) for name in names},
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def start_local_server(port: int):
+    """Serve the app in this process and event loop; returns (server, task) once it accepts connections"""
+    import uvicorn
+    from server import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_config=None, access_log=False))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            await task
+            raise RuntimeError("Server exited during startup")
+        await asyncio.sleep(0.05)
+    return server, task
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    server = task = None
+    base_url = args.base_url
+    if base_url is None:
+        server, task = await start_local_server(free_port())
+        base_url = f"http://127.0.0.1:{server.config.port}"
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as http:
+            state = LoadState()
+            seed_started = time.perf_counter()
+            await seed(http, state, args.clients, args.tests_per_client, rng)
+            seed_seconds = time.perf_counter() - seed_started
+            results = await run_load(http, state, mix, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.should_exit = True
+            await task
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "target": "external" if args.base_url else ("in-memory" if args.in_memory else "mongodb"),
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "clients": args.clients,
+            "tests_per_client": args.tests_per_client,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "seed_s": round(seed_seconds, 3),
+        **results,
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--in-memory", action="store_true", help="Run the app on the memory storage backend instead of MongoDB")
+    target.add_argument("--mongo-url", help="MongoDB for the in-process app (default: MONGO_URL)")
+    target.add_argument("--base-url", help="Load an already running server instead of starting one")
+    parser.add_argument("--db-name", default="fms_load_test", help="Database for the in-process app; use a scratch one")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operations (default: {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds run before measuring")
+    parser.add_argument("--clients", type=int, default=200, help="Clients seeded before the run")
+    parser.add_argument("--tests-per-client", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    # Request logs would compete with the workers; warnings still show
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.base_url is None:
+        os.environ["DB_NAME"] = args.db_name
+        if args.in_memory:
+            os.environ["STORAGE_BACKEND"] = "memory"
+        elif args.mongo_url:
+            os.environ["MONGO_URL"] = args.mongo_url
+
+    report = asyncio.run(main_async(args))
+    output = orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+    if args.output:
+        with open(args.output, "wb") as file:
+            file.write(output + b"\n")
+    else:
+        sys.stdout.buffer.write(output + b"\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""CPU per request for the read routes' response building, before and after the trusted-read path.
+
+Run from backend/:  python -m benchmarks.serialization
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models.client import Client
+from models.test_result import TestResultView
+from serialization import CLIENT_SHAPE, TEST_RESULT_VIEW_SHAPE
+from trends import EXERCISE_IDS
+
+SIZES = (1, 100, 1000)
+
+def sample_tests(count: int) -> List[Dict[str, Any]]:
+    client_id = str(uuid.uuid4())
+    started = datetime(2024, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "client_id": client_id,
+            "test_date": started + timedelta(days=index),
+            "scores": {
+                exercise_id: {"score": 2, "pain": False, "notes": None, "left": 2, "right": 3}
+                for exercise_id in EXERCISE_IDS
+            },
+            "total_score": 14,
+            "assessor_notes": "Routine screen",
+        }
+        for index in range(count)
+    ]
+
+def sample_clients(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Client {index}",
+            "email": f"client{index}@example.com",
+            "phone": None,
+            "date_of_birth": "1990-01-01",
+            "occupation": "Athlete",
+            "created_at": datetime(2024, 1, 1),
+            "total_tests": 3,
+            "latest_score": 15,
+            "last_test_date": datetime(2024, 6, 1),
+        }
+        for index in range(count)
+    ]
+
+def validated(model, field, exclude_unset: bool) -> Callable[[List[Dict[str, Any]]], bytes]:
+    """The previous path: build models, let FastAPI validate them against response_model, render with json"""
+    loop = asyncio.new_event_loop()
+
+    def build(documents):
+        content = [model(**document) for document in documents]
+        serialized = loop.run_until_complete(serialize_response(
+            field=field, response_content=content, exclude_unset=exclude_unset, is_coroutine=True
+        ))
+        return JSONResponse(serialized).body
+    return build
+
+def trusted(shape) -> Callable[[List[Dict[str, Any]]], bytes]:
+    def build(documents):
+        return ORJSONResponse(shape.documents(documents)).body
+    return build
+
+def cpu_per_call(build: Callable, documents: List[Dict[str, Any]]) -> float:
+    """Median process CPU time of one call, in microseconds"""
+    repeats = max(5, 2000 // len(documents))
+    samples = []
+    for _ in range(repeats):
+        # Copies, since the routes receive fresh documents from the driver
+        batch = [dict(document) for document in documents]
+        started = time.process_time()
+        build(batch)
+        samples.append(time.process_time() - started)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6
+
+def main():
+    cases = [
+        ("test history", sample_tests, TestResultView, TEST_RESULT_VIEW_SHAPE, True),
+        ("client list", sample_clients, Client, CLIENT_SHAPE, False),
+    ]
+    print(f"{'route':<14}{'docs':>6}{'before us':>12}{'after us':>12}{'speedup':>9}")
+    for name, sample, model, shape, exclude_unset in cases:
+        field = create_response_field(name="Response", type_=List[model])
+        for size in SIZES:
+            documents = sample(size)
+            before = cpu_per_call(validated(model, field, exclude_unset), documents)
+            after = cpu_per_call(trusted(shape), documents)
+            print(f"{name:<14}{size:>6}{before:>12.0f}{after:>12.0f}{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend(ABC):
+    """Read-through cache of serialized responses.
+
+    Backends store bytes under string keys with a TTL. Every write path
+    that changes a cached resource deletes its key; the TTL bounds how
+    long another worker's in-process copy can lag behind such a write.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """The stored bytes, or None when missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None):
+        """Store bytes for ttl_seconds (default: the backend's TTL)"""
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        """Delete the given keys; missing ones are ignored"""
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str):
+        """Delete every key starting with prefix"""
+
+    def _count(self, value: Optional[bytes]) -> Optional[bytes]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU with expiry"""
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 10000):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            return self._count(None)
+        self._entries.move_to_end(key)
+        return self._count(entry[1])
+
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None):
+        expires = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **super().stats(),
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+class RedisCache(CacheBackend):
+    """Shared cache in Redis (needs the redis package); LRU eviction is left to the server's maxmemory-policy"""
+
+    def __init__(self, url: str, ttl_seconds: float = 60, namespace: str = "fms:"):
+        import redis.asyncio as redis
+
+        super().__init__(ttl_seconds)
+        self.namespace = namespace
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._count(await self._redis.get(self.namespace + key))
+
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None):
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        await self._redis.set(self.namespace + key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*(self.namespace + key for key in keys))
+
+    async def delete_prefix(self, prefix: str):
+        batch = []
+        async for key in self._redis.scan_iter(match=f"{self.namespace}{prefix}*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                await self._redis.delete(*batch)
+                batch = []
+        if batch:
+            await self._redis.delete(*batch)
+
+def create_cache() -> CacheBackend:
+    """Redis when CACHE_URL is set, otherwise the in-process LRU"""
+    ttl_seconds = float(os.environ.get("CACHE_TTL_SECONDS", 60))
+    url = os.environ.get("CACHE_URL")
+    if url:
+        try:
+            return RedisCache(url, ttl_seconds)
+        except ImportError:
+            logger.warning("CACHE_URL is set but the redis package is missing; using the in-process cache")
+    return MemoryCache(ttl_seconds, int(os.environ.get("CACHE_MAX_ENTRIES", 10000)))
+
+# Replaced from the environment when the app starts
+response_cache: CacheBackend = MemoryCache()
+
+def configure_cache() -> CacheBackend:
+    global response_cache
+    response_cache = create_cache()
+    logger.info(f"Response cache: {type(response_cache).__name__}, ttl {response_cache.ttl_seconds}s")
+    return response_cache
+
+def cache_stats() -> Dict[str, Any]:
+    return response_cache.stats()
+
+async def cached_body(key: str) -> Optional[bytes]:
+    """Cached bytes for key; a cache outage reads as a miss"""
+    try:
+        return await response_cache.get(key)
+    except Exception as e:
+        logger.error(f"Error reading cache key {key}: {str(e)}")
+        return None
+
+async def store_body(key: str, body: bytes):
+    try:
+        await response_cache.set(key, body)
+    except Exception as e:
+        logger.error(f"Error writing cache key {key}: {str(e)}")
+
+def client_key(client_id: str) -> str:
+    return f"client:{client_id}"
+
+def test_result_key(test_id: str) -> str:
+    return f"test_result:{test_id}"
+
+async def invalidate_clients(*client_ids: str):
+    """Drop cached client bodies after their fields or test statistics change"""
+    try:
+        await response_cache.delete(*(client_key(client_id) for client_id in client_ids))
+    except Exception as e:
+        logger.error(f"Error invalidating cached clients: {str(e)}")
+
+async def invalidate_test_results(*test_ids: str):
+    try:
+        await response_cache.delete(*(test_result_key(test_id) for test_id in test_ids))
+    except Exception as e:
+        logger.error(f"Error invalidating cached test results: {str(e)}")
+
+async def invalidate_prefix(prefix: str):
+    try:
+        await response_cache.delete_prefix(prefix)
+    except Exception as e:
+        logger.error(f"Error invalidating cached {prefix}*: {str(e)}")
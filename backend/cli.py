@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import typer
+from database import connect_database, close_database
+from migrations import migrate_native_dates
+from export import EXPORT_BATCH_SIZE, export_chunks
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+app = typer.Typer(help="Maintenance commands for the FMS Assessment API database")
+
+def run(coroutine_fn, *args, **kwargs):
+    """Run a coroutine function against the configured database"""
+    async def main():
+        db = await connect_database()
+        try:
+            return await coroutine_fn(db, *args, **kwargs)
+        finally:
+            await close_database()
+    return asyncio.run(main())
+
+@app.command("migrate-dates")
+def migrate_dates(
+    batch_size: int = typer.Option(1000, min=1, help="Documents converted per bulk write")
+):
+    """Convert legacy ISO string dates to native BSON dates (safe to re-run)"""
+    converted = run(migrate_native_dates, batch_size=batch_size)
+    for collection_name, count in converted.items():
+        typer.echo(f"{collection_name}: {count} documents converted")
+
+@app.command("export")
+def export(
+    collection: str = typer.Argument(..., help="clients or test_results"),
+    format: str = typer.Option("ndjson", help="ndjson, csv or parquet"),
+    output: str = typer.Option(None, help="Output file (defaults to <collection>.<format>)"),
+    batch_size: int = typer.Option(EXPORT_BATCH_SIZE, min=1, help="Documents read and encoded per chunk")
+):
+    """Stream a whole collection to a file with constant memory"""
+    if collection not in ("clients", "test_results"):
+        raise typer.BadParameter("collection must be clients or test_results")
+    if format not in ("ndjson", "csv", "parquet"):
+        raise typer.BadParameter("format must be ndjson, csv or parquet")
+    path = output or f"{collection}.{format}"
+
+    async def write_export(db):
+        written = 0
+        with open(path, "wb") as file:
+            async for chunk in export_chunks(db, collection, format, batch_size):
+                file.write(chunk)
+                written += len(chunk)
+        return written
+
+    written = run(write_export)
+    typer.echo(f"{collection}: {written} bytes written to {path}")
+
+if __name__ == "__main__":
+    app()
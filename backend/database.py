@@ -1,18 +1,105 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
 import os
+import logging
 from dotenv import load_dotenv
+from fastapi import HTTPException
+from metrics import mongo_event_listeners
+from repositories import storage_backend
 
-load_dotenv()
+load_dotenv(Path(__file__).parent / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger(__name__)
+
+# Optional pool/driver settings, read from the environment when the app
+# starts. Unset variables fall back to the MONGO_URL options and then to
+# the PyMongo defaults. zstd and snappy compression need the zstandard and
+# python-snappy packages respectively; zlib is always available.
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+    "MONGO_READ_PREFERENCE": ("readPreference", str),
+    "MONGO_APP_NAME": ("appname", str),
+}
+
+# The one client per process, opened and closed by the app lifespan
+client: Optional[AsyncIOMotorClient] = None
+db: Optional[AsyncIOMotorDatabase] = None
+
+# Whether the deployment is a replica set or sharded cluster, detected once
+_transactions_supported: Optional[bool] = None
+
+T = TypeVar("T")
+
+def client_options() -> Dict[str, Any]:
+    """Motor client keyword arguments for every MONGO_* setting present in the environment"""
+    options = {}
+    for env_name, (option, convert) in CLIENT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value:
+            options[option] = convert(value)
+    return options
+
+async def connect_database() -> AsyncIOMotorDatabase:
+    """Open the shared connection pool (idempotent)"""
+    global client, db
+    if client is None:
+        options = client_options()
+        # Command and pool listeners feed the /metrics endpoint
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=mongo_event_listeners(), **options)
+        db = client[os.environ['DB_NAME']]
+        logger.info(f"Database client created for {os.environ['DB_NAME']} with options {options}")
+    return db
 
 async def get_database() -> AsyncIOMotorDatabase:
     """Dependency to get database instance"""
+    if db is None:
+        if storage_backend() != "mongodb":
+            # Analytics, jobs, batch sync, import and export are MongoDB only
+            raise HTTPException(status_code=501, detail="This endpoint needs the mongodb storage backend")
+        raise RuntimeError("Database is not connected")
     return db
 
 async def close_database():
     """Close database connection"""
-    client.close()
\ No newline at end of file
+    global client, db, _transactions_supported
+    if client is not None:
+        client.close()
+        client = None
+        db = None
+        _transactions_supported = None
+
+async def supports_transactions(db: AsyncIOMotorDatabase) -> bool:
+    """True when connected to a replica set or mongos; standalone servers have no transactions"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await db.client.admin.command("hello")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            logger.warning(f"Could not detect transaction support, assuming none: {str(e)}")
+            _transactions_supported = False
+    return _transactions_supported
+
+async def run_in_transaction(
+    db: AsyncIOMotorDatabase,
+    callback: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[T]]
+) -> T:
+    """Run callback(session) inside a transaction when the deployment supports it.
+
+    with_transaction retries the whole callback on transient errors and
+    unknown commit results. On a standalone server the callback runs
+    once with session=None, so it must tolerate partial application.
+    """
+    if not await supports_transactions(db):
+        return await callback(None)
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(callback)
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from database import supports_transactions
+from metrics import EVENT_SUBSCRIBERS, EVENTS_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# Change stream operation types, as reported to subscribers
+OPERATIONS = {"insert": "insert", "update": "update", "replace": "update", "delete": "delete"}
+
+CHANGE_PIPELINE = [
+    {"$match": {"ns.coll": {"$in": ["clients", "test_results"]}, "operationType": {"$in": list(OPERATIONS)}}},
+    # Only the identifiers travel to the app, not whole documents
+    {"$project": {"operationType": 1, "ns": 1, "fullDocument.id": 1, "fullDocument.client_id": 1}},
+]
+
+# Events a subscriber may fall behind by. A slower one has its backlog
+# replaced by a single resync, so one stalled dashboard neither holds up
+# the others nor grows memory without bound.
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "256"))
+
+# Standalone servers have no change streams and are polled instead. Each
+# poll re-reads POLL_OVERLAP back, so writes stamped by a slightly slower
+# clock are not missed; repeats are suppressed.
+POLL_INTERVAL_SECONDS = float(os.environ.get("EVENTS_POLL_INTERVAL_SECONDS", "2"))
+POLL_OVERLAP = timedelta(seconds=5)
+
+# Wait before reopening a failed change stream, doubling up to the max
+RETRY_SECONDS = 1
+MAX_RETRY_SECONDS = 30
+
+# Raised when the resume token is older than the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+Message = Tuple[str, Dict[str, Any]]
+
+RESYNC: Message = ("resync", {})
+
+class Subscriber:
+    """One open stream: a bounded queue of (event name, data) messages"""
+
+    def __init__(self, client_id: Optional[str] = None):
+        self.client_id = client_id
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        # A queued resync makes the reload cover any event published before it is read
+        self.resync_pending = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        # Deletes from a change stream carry no ids, so everyone gets them
+        return self.client_id is None or event["client_id"] in (None, self.client_id)
+
+    def offer(self, message: Message):
+        if self.resync_pending:
+            if message is not RESYNC:
+                EVENTS_DROPPED.inc()
+            return
+        if message is RESYNC:
+            self.resync_pending = True
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            EVENTS_DROPPED.inc((), self.queue.qsize() + 1)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resync_pending = True
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> Message:
+        message = await self.queue.get()
+        if message is RESYNC:
+            self.resync_pending = False
+        return message
+
+class ChangeBroker:
+    """Fans one upstream feed of client and test result changes out to every subscriber of this worker.
+
+    The feed is a change stream on replica sets and polling on standalone
+    servers. It runs only while someone is subscribed, so any number of
+    open dashboards costs one cursor per worker.
+    """
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, db: AsyncIOMotorDatabase, client_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(client_id)
+        self.subscribers.add(subscriber)
+        EVENT_SUBSCRIBERS.inc()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(db))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber not in self.subscribers:
+            return
+        self.subscribers.discard(subscriber)
+        EVENT_SUBSCRIBERS.dec()
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, event: Dict[str, Any]):
+        for subscriber in list(self.subscribers):
+            if subscriber.wants(event):
+                subscriber.offer(("change", event))
+
+    def resync(self):
+        """Changes may have been missed; every subscriber should reload"""
+        for subscriber in list(self.subscribers):
+            subscriber.offer(RESYNC)
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self, db: AsyncIOMotorDatabase):
+        if await supports_transactions(db):
+            await self._watch(db)
+        else:
+            logger.info("No change streams on a standalone server; polling for changes")
+            await self._poll(db)
+
+    async def _watch(self, db: AsyncIOMotorDatabase):
+        token = None
+        delay = RETRY_SECONDS
+        while True:
+            try:
+                async with db.watch(CHANGE_PIPELINE, full_document="updateLookup", resume_after=token) as stream:
+                    async for change in stream:
+                        token = stream.resume_token
+                        delay = RETRY_SECONDS
+                        self.publish(change_event(change))
+            except PyMongoError as e:
+                logger.warning(f"Change stream failed, reopening in {delay}s: {str(e)}")
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    token = None
+                if token is None:
+                    # Reopening from now skips whatever happened meanwhile
+                    self.resync()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+    async def _poll(self, db: AsyncIOMotorDatabase):
+        started = since = datetime.utcnow()
+        # Keys of events already published, with when they were last read
+        seen: Dict[tuple, datetime] = {}
+        while True:
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            now = datetime.utcnow()
+            # Writes from before the first subscriber are not news
+            start = max(since - POLL_OVERLAP, started)
+            try:
+                changes = await poll_changes(db, start)
+            except PyMongoError as e:
+                logger.warning(f"Polling for changes failed: {str(e)}")
+                continue
+            since = now
+            for key, event in changes:
+                if key not in seen:
+                    self.publish(event)
+                seen[key] = now
+            # Documents stamped before start are never read again
+            for key in [key for key, read_at in seen.items() if read_at < start]:
+                del seen[key]
+
+def change_event(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Subscriber event for a projected change stream document"""
+    collection = change["ns"]["coll"]
+    # Deleted documents (and updated ones deleted since) have no fullDocument
+    document = change.get("fullDocument") or {}
+    document_id = document.get("id")
+    return {
+        "collection": collection,
+        "operation": OPERATIONS[change["operationType"]],
+        "id": document_id,
+        "client_id": document_id if collection == "clients" else document.get("client_id"),
+    }
+
+async def poll_changes(db: AsyncIOMotorDatabase, start: datetime) -> List[Tuple[tuple, Dict[str, Any]]]:
+    """(dedupe key, event) for clients written and tests inserted since start.
+
+    Client writes are found by updated_at, new tests by their ObjectId's
+    timestamp. Deleting a test updates its client's statistics, so it
+    shows up as a client update; deleted clients are not seen by polling.
+    """
+    changes = []
+    async for client in db.clients.find(
+        {"updated_at": {"$gte": start}},
+        {"_id": 0, "id": 1, "version": 1, "created_at": 1, "updated_at": 1}
+    ):
+        operation = "insert" if client.get("updated_at") == client.get("created_at") else "update"
+        changes.append((
+            ("clients", client["id"], client.get("version")),
+            {"collection": "clients", "operation": operation, "id": client["id"], "client_id": client["id"]}
+        ))
+    async for test in db.test_results.find({"_id": {"$gte": ObjectId.from_datetime(start)}}, {"_id": 0, "id": 1, "client_id": 1}):
+        changes.append((
+            ("test_results", test["id"]),
+            {"collection": "test_results", "operation": "insert", "id": test["id"], "client_id": test["client_id"]}
+        ))
+    return changes
+
+# One broker per worker process
+broker = ChangeBroker()
+
+async def stop_events():
+    """Close the upstream feed at shutdown"""
+    await broker.stop()
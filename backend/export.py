@@ -0,0 +1,199 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from starlette.concurrency import run_in_threadpool
+from migrations import parse_iso_datetime
+from trends import EXERCISE_IDS
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Flat (CSV/Parquet) columns per collection as (name, type). NDJSON keeps
+# the stored document shape, including the nested test scores.
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "clients": [
+        ("id", "string"),
+        ("name", "string"),
+        ("email", "string"),
+        ("phone", "string"),
+        ("date_of_birth", "string"),
+        ("occupation", "string"),
+        ("created_at", "timestamp"),
+        ("total_tests", "int"),
+        ("latest_score", "int"),
+        ("last_test_date", "timestamp"),
+    ],
+    "test_results": [
+        ("id", "string"),
+        ("client_id", "string"),
+        ("test_date", "timestamp"),
+        ("total_score", "int"),
+        ("assessor_notes", "string"),
+    ] + [
+        (f"{exercise_id}_{part}", kind)
+        for exercise_id in EXERCISE_IDS
+        for part, kind in (("score", "int"), ("pain", "bool"), ("left", "int"), ("right", "int"), ("notes", "string"))
+    ],
+}
+
+EXPORT_DATE_FIELDS = {
+    "clients": ("created_at", "last_test_date"),
+    "test_results": ("test_date",),
+}
+
+# Internal bookkeeping that is not part of an export
+EXPORT_PROJECTION = {
+    "clients": {"_id": 0, "search_keys": 0, "version": 0},
+    "test_results": {"_id": 0, "idempotency_key": 0, "score_entries": 0},
+}
+
+async def iter_documents(
+    db: AsyncIOMotorDatabase,
+    collection_name: str,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Every document of a collection in lists of at most batch_size, read through one cursor"""
+    cursor = db[collection_name].find({}, EXPORT_PROJECTION[collection_name], batch_size=batch_size)
+    batch = []
+    async for document in cursor:
+        for field in EXPORT_DATE_FIELDS[collection_name]:
+            # Legacy ISO strings are exported like migrated BSON dates
+            parsed = parse_iso_datetime(document.get(field))
+            if parsed is not None:
+                document[field] = parsed
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def flatten_document(collection_name: str, document: Dict[str, Any]) -> Dict[str, Any]:
+    """One flat row with a column per exercise score field for test results"""
+    if collection_name != "test_results":
+        return document
+    row = {name: document.get(name) for name in ("id", "client_id", "test_date", "total_score", "assessor_notes")}
+    scores = document.get("scores") or {}
+    for exercise_id in EXERCISE_IDS:
+        score = scores.get(exercise_id) or {}
+        for part in ("score", "pain", "left", "right", "notes"):
+            row[f"{exercise_id}_{part}"] = score.get(part)
+    return row
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+def ndjson_chunk(documents: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(document, default=_json_default) + "\n" for document in documents).encode()
+
+def csv_chunk(collection_name: str, documents: List[Dict[str, Any]], header: bool = False) -> bytes:
+    columns = [name for name, _ in EXPORT_COLUMNS[collection_name]]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    for document in documents:
+        row = flatten_document(collection_name, document)
+        writer.writerow({
+            name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in row.items()
+        })
+    return buffer.getvalue().encode()
+
+def parquet_available() -> bool:
+    """Parquet export needs pyarrow next to pandas"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file handed to the Parquet writer; drained after every row group"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ParquetStream:
+    """Writes one row group per batch, so memory stays bounded by the batch size"""
+
+    def __init__(self, collection_name: str):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Microseconds: BSON dates are whole milliseconds, but legacy ISO
+        # strings carry microseconds that a millisecond cast refuses to drop
+        types = {"string": pa.string(), "int": pa.int64(), "bool": pa.bool_(), "timestamp": pa.timestamp("us")}
+        self._pd = pd
+        self._pa = pa
+        self.collection_name = collection_name
+        self.columns = [name for name, _ in EXPORT_COLUMNS[collection_name]]
+        self.schema = pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS[collection_name]])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self.schema, compression="snappy")
+
+    def write(self, documents: List[Dict[str, Any]]) -> bytes:
+        rows = [flatten_document(self.collection_name, document) for document in documents]
+        frame = self._pd.DataFrame.from_records(rows, columns=self.columns)
+        self._writer.write_table(self._pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+async def export_chunks(
+    db: AsyncIOMotorDatabase,
+    collection_name: str,
+    format: str,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """Encoded export of a whole collection, one chunk per batch of documents"""
+    if format == "parquet":
+        stream = await run_in_threadpool(ParquetStream, collection_name)
+        async for documents in iter_documents(db, collection_name, batch_size):
+            chunk = await run_in_threadpool(stream.write, documents)
+            if chunk:
+                yield chunk
+        yield await run_in_threadpool(stream.close)
+        return
+
+    first = True
+    async for documents in iter_documents(db, collection_name, batch_size):
+        if format == "csv":
+            yield csv_chunk(collection_name, documents, header=first)
+        else:
+            yield ndjson_chunk(documents)
+        first = False
+    if format == "csv" and first:
+        # An empty collection still gets its header row
+        yield csv_chunk(collection_name, [], header=True)
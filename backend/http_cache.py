@@ -0,0 +1,82 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from fastapi import Request, Response
+
+def strong_etag(body: bytes, prefix: str = "") -> str:
+    """Quoted strong ETag derived from the exact response bytes"""
+    digest = hashlib.sha256(body).hexdigest()[:20]
+    return f'"{prefix}{digest}"'
+
+def resource_etag(kind: str, resource_id: str, version: Optional[int] = None) -> str:
+    """Weak ETag from a document's version counter; documents written before versioning count as 0"""
+    return f'W/"{kind}-{resource_id}-{version or 0}"'
+
+def page_etag(kind: str, versions: List[Tuple[str, Optional[int]]], variant: str = "") -> str:
+    """Weak ETag for a list page: changes when a document joins, leaves, moves or is rewritten.
+
+    `variant` distinguishes differently shaped bodies over the same documents, such as projections.
+    """
+    digest = hashlib.sha256(
+        (variant + "|" + ";".join(f"{resource_id}:{version or 0}" for resource_id, version in versions)).encode()
+    )
+    return f'W/"{kind}-{digest.hexdigest()[:20]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check; uses weak comparison, as RFC 9110 requires for GET"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy is current; If-Modified-Since only counts without If-None-Match"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and isinstance(last_modified, datetime):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    # no-cache: browsers may keep the body but must revalidate before reuse
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if isinstance(last_modified, datetime):
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def conditional_json(
+    request: Request,
+    body: bytes,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Response:
+    """The JSON body, or an empty 304 when the request's validators still match"""
+    headers = validator_headers(etag, last_modified)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def pack_entry(etag: str, last_modified: Optional[datetime], body: bytes) -> bytes:
+    """Response-cache value holding the validators alongside the body"""
+    stamp = last_modified.isoformat() if isinstance(last_modified, datetime) else ""
+    return f"{etag}\n{stamp}\n".encode() + body
+
+def unpack_entry(entry: bytes) -> Tuple[str, Optional[datetime], bytes]:
+    etag, stamp, body = entry.split(b"\n", 2)
+    return etag.decode(), datetime.fromisoformat(stamp.decode()) if stamp else None, body
@@ -0,0 +1,168 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every index the application relies on, by collection. Names are fixed so
+# that re-running provisioning is a no-op and reports stay readable.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "clients": [
+        IndexModel([("id", pymongo.ASCENDING)], name="id_unique", unique=True),
+        # Keyset pages on GET /clients/ sort on (field, id)
+        IndexModel([("name", pymongo.ASCENDING), ("id", pymongo.ASCENDING)], name="name_id"),
+        IndexModel([("created_at", pymongo.ASCENDING), ("id", pymongo.ASCENDING)], name="created_at_id"),
+        IndexModel([("latest_score", pymongo.ASCENDING), ("id", pymongo.ASCENDING)], name="latest_score_id"),
+        IndexModel([("last_test_date", pymongo.ASCENDING), ("id", pymongo.ASCENDING)], name="last_test_date_id"),
+        # Prefix search with ?q=
+        IndexModel([("search_keys", pymongo.ASCENDING)], name="search_keys"),
+        # Change polling for GET /events on standalone servers
+        IndexModel([("updated_at", pymongo.ASCENDING)], name="updated_at"),
+    ],
+    "test_results": [
+        IndexModel([("id", pymongo.ASCENDING)], name="id_unique", unique=True),
+        # Client history (newest first) and cascade deletes by client_id
+        IndexModel([("client_id", pymongo.ASCENDING), ("test_date", pymongo.DESCENDING)], name="client_id_test_date"),
+        # Offline batch sync: a repeated idempotency key is rejected by the server
+        IndexModel(
+            [("idempotency_key", pymongo.ASCENDING)],
+            name="idempotency_key_unique",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}}
+        ),
+        # GET /test-results/filter: $elemMatch on one exercise, newest first.
+        # Equality, sort, range: exercise and pain (pinned to both values when
+        # not asked for, which the planner merges) leave runs already in
+        # (test_date, id) order, and the score range is checked on index keys.
+        IndexModel(
+            [
+                ("score_entries.exercise", pymongo.ASCENDING),
+                ("score_entries.pain", pymongo.ASCENDING),
+                ("test_date", pymongo.DESCENDING),
+                ("id", pymongo.DESCENDING),
+                ("score_entries.score", pymongo.ASCENDING),
+            ],
+            name="score_entries_test_date"
+        ),
+    ],
+    "jobs": [
+        IndexModel([("id", pymongo.ASCENDING)], name="id_unique", unique=True),
+        # Unfinished jobs with a lapsed lease, resumed at startup
+        IndexModel([("status", pymongo.ASCENDING), ("lease_expires_at", pymongo.ASCENDING)], name="status_lease_expires_at"),
+    ],
+}
+
+PROGRESS_POLL_SECONDS = 5
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Create any missing application indexes, logging build progress until they are ready.
+
+    An existing index on the same keys under another name (from releases
+    that let the server generate names) is dropped and rebuilt under the
+    fixed name, as is an index whose keys changed under the same name.
+    Each index is created on its own, so one conflict only costs that index.
+    """
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except Exception as e:
+            logger.error(f"Error provisioning indexes on {collection_name}: {str(e)}")
+            continue
+        wanted = {model.document["name"] for model in models}
+        for model in models:
+            name = model.document["name"]
+            keys = _index_keys(model.document["key"].items())
+            if name in existing and _index_keys(existing[name]["key"]) == keys:
+                continue
+            try:
+                if name in existing:
+                    logger.info(f"Dropping index {name} on {collection_name} to rebuild it with keys {keys}")
+                    await collection.drop_index(name)
+                for old_name in _renamed_indexes(existing, model, wanted):
+                    logger.info(f"Dropping index {old_name} on {collection_name} to rebuild it as {name}")
+                    await collection.drop_index(old_name)
+                await _build_index(db, collection_name, model)
+            except OperationFailure as e:
+                # Conflicting definitions or duplicate ids; leave the index
+                # out and surface the problem in the logs and index report
+                logger.error(f"Error creating index {name} on {collection_name}: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error provisioning index {name} on {collection_name}: {str(e)}")
+
+def _index_keys(keys) -> List[tuple]:
+    return [(field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in keys]
+
+def _renamed_indexes(existing: Dict[str, Dict[str, Any]], model: IndexModel, wanted: set) -> List[str]:
+    """Names of existing indexes with the model's keys under a name the application does not use"""
+    keys = _index_keys(model.document["key"].items())
+    return [
+        name for name, info in existing.items()
+        if name != "_id_" and name not in wanted and _index_keys(info["key"]) == keys
+    ]
+
+async def _build_index(db: AsyncIOMotorDatabase, collection_name: str, model: IndexModel):
+    name = model.document["name"]
+    logger.info(f"Building index {name} on {collection_name}")
+    build = asyncio.create_task(db[collection_name].create_indexes([model]))
+    while not build.done():
+        await asyncio.wait({build}, timeout=PROGRESS_POLL_SECONDS)
+        if not build.done():
+            for op in await index_build_progress(db, collection_name):
+                logger.info(f"Index build on {collection_name}: {op['message']}")
+    await build
+    logger.info(f"Index ready on {collection_name}: {name}")
+
+async def index_build_progress(db: AsyncIOMotorDatabase, collection_name: str = None) -> List[Dict[str, Any]]:
+    """In-progress index builds from $currentOp (empty if the user may not run it)"""
+    namespace = f"{db.name}.{collection_name}" if collection_name else {"$regex": f"^{db.name}\\."}
+    pipeline = [
+        {"$currentOp": {"allUsers": True, "idleConnections": False}},
+        {"$match": {"ns": namespace, "command.createIndexes": {"$exists": True}}},
+    ]
+    try:
+        ops = await db.client.admin.aggregate(pipeline).to_list(None)
+    except OperationFailure:
+        return []
+
+    progress = []
+    for op in ops:
+        done = op.get("progress", {})
+        progress.append({
+            "collection": op["ns"].split(".", 1)[1],
+            "indexes": [index["name"] for index in op.get("command", {}).get("indexes", [])],
+            "done": done.get("done"),
+            "total": done.get("total"),
+            "message": op.get("msg", "building"),
+        })
+    return progress
+
+async def index_report(db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+    """Missing, unused and in-progress indexes for every managed collection"""
+    report = {}
+    building = await index_build_progress(db)
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        expected = [model.document["name"] for model in models]
+
+        unused = []
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    unused.append({"name": stats["name"], "since": stats["accesses"]["since"]})
+        except OperationFailure as e:
+            logger.warning(f"Index usage stats unavailable for {collection_name}: {str(e)}")
+
+        report[collection_name] = {
+            "missing": [name for name in expected if name not in existing],
+            "unmanaged": [name for name in existing if name != "_id_" and name not in expected],
+            "unused": unused,
+            "building": [op for op in building if op["collection"] == collection_name],
+        }
+    return report
@@ -0,0 +1,171 @@
+import codecs
+import csv
+import json
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple, Union
+
+# A parsed upload row: (1-based row number, fields) or (row number, parse error)
+Row = Tuple[int, Any]
+
+# Most lines a quoted CSV field may span before the record is given up on
+MAX_RECORD_LINES = int(os.environ.get("IMPORT_MAX_RECORD_LINES", "100"))
+
+# Longest line (in characters) held while waiting for its newline
+MAX_LINE_LENGTH = int(os.environ.get("IMPORT_MAX_LINE_LENGTH", str(1024 * 1024)))
+
+def _line_too_long() -> ValueError:
+    return ValueError(f"Line longer than {MAX_LINE_LENGTH} characters")
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[str, ValueError]]:
+    """Split a stream of byte chunks into text lines without buffering the whole body.
+
+    A line longer than MAX_LINE_LENGTH is discarded as it arrives, so a body
+    without newlines is never held whole; a ValueError stands in its place.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    # The current line already went over the limit and is being skipped
+    overlong = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            if overlong or len(line) > MAX_LINE_LENGTH:
+                overlong = False
+                yield _line_too_long()
+            else:
+                yield line.rstrip("\r")
+        if len(pending) > MAX_LINE_LENGTH:
+            overlong, pending = True, ""
+    pending += decoder.decode(b"", final=True)
+    if overlong or len(pending) > MAX_LINE_LENGTH:
+        yield _line_too_long()
+    elif pending:
+        yield pending.rstrip("\r")
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """One JSON object per line; blank lines are skipped"""
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if isinstance(line, ValueError):
+            row_number += 1
+            yield row_number, line
+            continue
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(value, dict):
+            yield row_number, ValueError("Expected a JSON object")
+            continue
+        yield row_number, value
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Union[str, ValueError]]:
+    """Raw CSV records, joining the lines of quoted fields that span several.
+
+    A record whose quotes are still open after MAX_RECORD_LINES lines, or
+    at the end of the body, is usually a stray quote in an unquoted field
+    (O"Brien). Its first line is reported as an error and the lines after
+    it are read again as records of their own, so one bad row costs one row
+    rather than the rest of the file.
+    """
+    lines = iter_lines(chunks)
+    # Lines handed back by a record that never closed, read before the stream
+    replay: Deque[str] = deque()
+    record: List[str] = []
+    quotes = 0
+    while True:
+        if replay:
+            line = replay.popleft()
+        else:
+            try:
+                line = await lines.__anext__()
+            except StopAsyncIteration:
+                if not record:
+                    return
+                yield ValueError("Unterminated quoted field")
+                replay.extend(record[1:])
+                record, quotes = [], 0
+                continue
+            if isinstance(line, ValueError):
+                # An overlong line takes any record it was part of with it
+                record, quotes = [], 0
+                yield line
+                continue
+        record.append(line)
+        quotes += line.count('"')
+        # An odd number of quotes means a quoted field continues on the next line
+        if not quotes % 2:
+            text, record, quotes = "\n".join(record), [], 0
+            yield text
+        elif len(record) >= MAX_RECORD_LINES:
+            yield ValueError(f"Unterminated quoted field (no closing quote within {MAX_RECORD_LINES} lines)")
+            replay.extendleft(reversed(record[1:]))
+            record, quotes = [], 0
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Row]:
+    """CSV with a header row; quoted fields may span lines, empty cells become None"""
+    header: List[str] = []
+    row_number = 0
+    async for text in iter_csv_records(chunks):
+        if isinstance(text, ValueError):
+            row_number += 1
+            yield row_number, text
+            continue
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if not header:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row_number, {name: (value if value != "" else None) for name, value in zip(header, values)}
+
+ROW_READERS = {
+    "csv": iter_csv_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+async def iter_batches(rows: AsyncIterator[Row], size: int) -> AsyncIterator[List[Row]]:
+    """Group rows into lists of at most `size`"""
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class ImportReport:
+    """Counts and a bounded list of per-row errors for a bulk import"""
+
+    def __init__(self, max_errors: int = 1000):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, row: int, message: Any):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from models.job import Job
+
+logger = logging.getLogger(__name__)
+
+# A running job renews its lease on every checkpoint. A job whose lease has
+# lapsed (its worker died or shut down) is picked up again at the next start,
+# or by whichever worker next checks for lapsed leases.
+JOB_LEASE_SECONDS = 120
+
+# How often each worker looks for lapsed leases
+RECLAIM_INTERVAL_SECONDS = JOB_LEASE_SECONDS
+
+# Handlers by job type, registered by the modules that own the work
+JOB_HANDLERS: Dict[str, Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[None]]] = {}
+
+# Strong references, so running tasks are not garbage collected
+_tasks: Set[asyncio.Task] = set()
+
+# The periodic reclaim of lapsed jobs, started by resume_jobs
+_reclaim_task: Optional[asyncio.Task] = None
+
+def _lease() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+async def create_job(db: AsyncIOMotorDatabase, job: Job, params: Dict[str, Any]) -> Job:
+    """Persist a queued job; params are stored for the handler but not reported"""
+    # started_at stays unset until the first claim sets it with $min
+    document = job.dict(exclude={"started_at", "finished_at"})
+    await db.jobs.insert_one({**document, "params": params, "lease_expires_at": None})
+    return job
+
+async def get_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[Job]:
+    document = await db.jobs.find_one({"id": job_id}, {"_id": 0, "params": 0, "lease_expires_at": 0})
+    return Job(**document) if document else None
+
+async def claim_job(db: AsyncIOMotorDatabase, job_id: str) -> Optional[Dict[str, Any]]:
+    """Take the lease of an unfinished job unless another worker holds it"""
+    now = datetime.utcnow()
+    return await db.jobs.find_one_and_update(
+        {
+            "id": job_id,
+            "status": {"$in": ["queued", "running"]},
+            "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}]
+        },
+        {"$set": {"status": "running", "lease_expires_at": _lease()}, "$min": {"started_at": now}},
+        # The claim changes only status and lease, so the prior document
+        # carries everything the handler reads (params and checkpoint)
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def checkpoint_job(
+    db: AsyncIOMotorDatabase,
+    job_id: str,
+    increments: Optional[Dict[str, int]] = None,
+    values: Optional[Dict[str, Any]] = None,
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Record progress (in the caller's transaction when given) and renew the lease"""
+    update: Dict[str, Any] = {"$set": {**(values or {}), "lease_expires_at": _lease()}}
+    if increments:
+        update["$inc"] = increments
+    await db.jobs.update_one({"id": job_id}, update, session=session)
+
+async def _run_job(db: AsyncIOMotorDatabase, job_id: str):
+    job = await claim_job(db, job_id)
+    if job is None:
+        return
+    logger.info(f"Running {job['type']} job {job_id}")
+    try:
+        await JOB_HANDLERS[job["type"]](db, job)
+    except asyncio.CancelledError:
+        # Shutting down: give the lease back so the next start resumes at once
+        await db.jobs.update_one({"id": job_id}, {"$set": {"lease_expires_at": None}})
+        raise
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {str(e)}")
+        await db.jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow(), "lease_expires_at": None}}
+        )
+        return
+    await db.jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": "completed", "finished_at": datetime.utcnow(), "lease_expires_at": None}}
+    )
+    logger.info(f"Completed {job['type']} job {job_id}")
+
+def start_job(db: AsyncIOMotorDatabase, job_id: str):
+    """Run a job in the background of this worker"""
+    task = asyncio.create_task(_run_job(db, job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def resume_jobs(db: AsyncIOMotorDatabase):
+    """Restart unfinished jobs whose lease has lapsed, now and every RECLAIM_INTERVAL_SECONDS.
+
+    Without the timer a job whose worker died would wait for a restart,
+    which a long-lived multi-worker deployment may never have. Claims are
+    atomic, so workers checking at the same time never run a job twice.
+    """
+    global _reclaim_task
+    await reclaim_lapsed_jobs(db)
+    if _reclaim_task is None or _reclaim_task.done():
+        _reclaim_task = asyncio.create_task(_reclaim_periodically(db))
+
+async def _reclaim_periodically(db: AsyncIOMotorDatabase):
+    while True:
+        await asyncio.sleep(RECLAIM_INTERVAL_SECONDS)
+        await reclaim_lapsed_jobs(db)
+
+async def reclaim_lapsed_jobs(db: AsyncIOMotorDatabase):
+    """Restart unfinished jobs whose lease has lapsed, from their last checkpoint"""
+    try:
+        async for job in db.jobs.find(
+            {"status": {"$in": ["queued", "running"]}, "$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": datetime.utcnow()}}]},
+            {"_id": 0, "id": 1}
+        ):
+            logger.info(f"Resuming job {job['id']}")
+            start_job(db, job["id"])
+    except Exception as e:
+        logger.error(f"Error resuming jobs: {str(e)}")
+
+async def stop_jobs():
+    """Cancel this worker's running jobs at shutdown; their checkpoints survive"""
+    global _reclaim_task
+    if _reclaim_task is not None:
+        _reclaim_task.cancel()
+        await asyncio.gather(_reclaim_task, return_exceptions=True)
+        _reclaim_task = None
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
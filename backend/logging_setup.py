@@ -0,0 +1,173 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import orjson
+
+# Per-request state for log records: request id, the ASGI scope (its
+# "route" is set once routing has matched) and the sampling decision
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def current_request_id() -> Optional[str]:
+    context = _request_context.get()
+    return context["request_id"] if context else None
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """LOG_SAMPLE_RATES: comma-separated route=rate pairs, e.g. "/api/clients/{client_id}=0.05" """
+    rates = {}
+    for item in value.split(","):
+        route, _, rate = item.strip().rpartition("=")
+        if route:
+            rates[route.strip()] = float(rate)
+    return rates
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the request id and route, and samples INFO and below per request.
+
+    The decision is made once per request, on its first sampled record, so
+    a kept request keeps all of its lines. Warnings and errors are always
+    kept, as is everything logged outside a request.
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, default_rate: float = 1.0):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.default_rate = default_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        if context is None:
+            record.request_id = None
+            record.route = None
+            return True
+        route = context["scope"].get("route")
+        record.request_id = context["request_id"]
+        record.route = route.path_format if route is not None else None
+        if record.levelno >= logging.WARNING:
+            return True
+        if context["sampled"] is None:
+            rate = self.sample_rates.get(record.route, self.default_rate)
+            context["sampled"] = rate >= 1.0 or random.random() < rate
+        return context["sampled"]
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("request_id", "route"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry).decode()
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records for the listener thread; formatting and I/O happen there.
+
+    The message and traceback are rendered here, on the logging thread,
+    since args and exc_info may not survive the hand-off; request fields
+    travel as record attributes.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a background thread writing JSON to stderr (idempotent).
+
+    LOG_LEVEL sets the level, LOG_SAMPLE_RATE the default share of requests
+    whose INFO logs are kept and LOG_SAMPLE_RATES per-route overrides.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter(
+        parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "")),
+        float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    # Uvicorn's own stream handlers would write from the event loop
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware giving each HTTP request an id for its log records.
+
+    An incoming X-Request-ID header is reused (so ids follow a request
+    across services), otherwise one is generated; either way it is
+    returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = _request_context.set({"request_id": request_id, "scope": scope, "sampled": None})
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_context.reset(token)
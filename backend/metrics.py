@@ -0,0 +1,271 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Seconds; covers cached reads (sub-millisecond) up to slow exports
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric(ABC):
+    """A named family of series keyed by a tuple of label values.
+
+    Metrics updated only from the event loop skip locking; threadsafe ones
+    take a lock per update because PyMongo listeners run on Motor's
+    executor threads.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), threadsafe: bool = False):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock() if threadsafe else None
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for every series, without the HELP and TYPE lines"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), threadsafe: bool = False):
+        super().__init__(name, documentation, labelnames, threadsafe)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        if self._lock is None:
+            self._values[labels] = self._values.get(labels, 0) + amount
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}" for labels, value in values]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: Labels, value: float):
+        self._values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        threadsafe: bool = False
+    ):
+        super().__init__(name, documentation, labelnames, threadsafe)
+        self.buckets = tuple(buckets)
+        # Per series: [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float):
+        if self._lock is None:
+            self._observe(labels, value)
+            return
+        with self._lock:
+            self._observe(labels, value)
+
+    def _observe(self, labels: Labels, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> List[str]:
+        snapshot = [(labels, list(counts), total) for labels, (counts, total) in list(self._series.items())]
+        lines = []
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to handle an API request, by route template", ("method", "route")
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "API requests, by route template and status code", ("method", "route", "status")
+))
+HTTP_ERRORS = REGISTRY.register(Counter(
+    "http_request_errors_total", "API requests that failed with a 5xx status or an exception", ("method", "route")
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "API requests currently being handled"
+))
+MONGO_COMMAND_DURATION = REGISTRY.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips, by command", ("command",), threadsafe=True
+))
+MONGO_COMMAND_FAILURES = REGISTRY.register(Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed, by command", ("command",), threadsafe=True
+))
+MONGO_POOL_CHECKED_OUT = REGISTRY.register(Gauge(
+    "mongodb_pool_checked_out_connections", "Connections currently checked out of the pool, by server", ("address",), threadsafe=True
+))
+MONGO_POOL_OPEN = REGISTRY.register(Gauge(
+    "mongodb_pool_open_connections", "Open pool connections, by server", ("address",), threadsafe=True
+))
+MONGO_POOL_CHECKOUT_FAILURES = REGISTRY.register(Counter(
+    "mongodb_pool_checkout_failures_total", "Connection checkouts that failed (e.g. wait queue timeout), by reason", ("reason",), threadsafe=True
+))
+EVENT_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "events_subscribers", "Open /api/events streams"
+))
+EVENTS_DROPPED = REGISTRY.register(Counter(
+    "events_dropped_total", "Change events discarded because a subscriber fell behind"
+))
+
+# Responses held open for as long as the client listens; events_subscribers
+# counts them instead of the in-flight gauge and the duration histogram
+STREAMING_TYPES = (b"text/event-stream",)
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing requests whose path starts with `prefix`.
+
+    The route label is the matched path template (/api/clients/{client_id}),
+    read from the scope after routing, so ids never become label values.
+    Event streams are counted as requests once they start and are then
+    left to their own metrics.
+    """
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        streaming = False
+
+        def route_labels():
+            route = scope.get("route")
+            return (scope["method"], route.path_format if route is not None else "unmatched")
+
+        async def send_with_status(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.lower().startswith(STREAMING_TYPES):
+                    streaming = True
+                    HTTP_IN_FLIGHT.dec()
+                    HTTP_REQUESTS.inc(route_labels() + (str(status),))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if not streaming:
+                elapsed = time.perf_counter() - started
+                HTTP_IN_FLIGHT.dec()
+                labels = route_labels()
+                HTTP_REQUEST_DURATION.observe(labels, elapsed)
+                HTTP_REQUESTS.inc(labels + (str(status),))
+                if status >= 500:
+                    HTTP_ERRORS.inc(labels)
+
+class CommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.observe((event.command_name,), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.observe((event.command_name,), event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.inc((event.command_name,))
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        MONGO_POOL_OPEN.inc(("%s:%s" % event.address,))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_OPEN.dec(("%s:%s" % event.address,))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.inc((str(event.reason),))
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKED_OUT.inc(("%s:%s" % event.address,))
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.dec(("%s:%s" % event.address,))
+
+def mongo_event_listeners() -> list:
+    """Listeners for the Motor client's event_listeners option"""
+    return [CommandMetrics(), PoolMetrics()]
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields that older releases stored as ISO strings, by collection
+DATE_FIELDS: Dict[str, List[str]] = {
+    "clients": ["created_at", "last_test_date"],
+    "test_results": ["test_date"],
+}
+
+def parse_iso_datetime(value: Any) -> Optional[datetime]:
+    """Parse a legacy ISO date string, returning None if it is not one"""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+async def migrate_native_dates(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> Dict[str, int]:
+    """Convert ISO date strings to BSON dates in batches.
+
+    Only documents that still hold a string in one of the date fields are
+    selected, so an interrupted run is resumed by simply running it again.
+    Returns the number of converted documents per collection.
+    """
+    converted = {}
+    for collection_name, fields in DATE_FIELDS.items():
+        collection = db[collection_name]
+        pending = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {field: 1 for field in fields}
+        converted[collection_name] = 0
+        last_id = None
+
+        while True:
+            query = pending if last_id is None else {"$and": [pending, {"_id": {"$gt": last_id}}]}
+            batch = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+
+            operations = []
+            for document in batch:
+                updates = {}
+                for field in fields:
+                    parsed = parse_iso_datetime(document.get(field))
+                    if parsed is not None:
+                        updates[field] = parsed
+                if updates:
+                    # Match the old values too, so a concurrent write is never overwritten
+                    match = {"_id": document["_id"], **{field: document[field] for field in updates}}
+                    operations.append(UpdateOne(match, {"$set": updates}))
+                else:
+                    logger.warning(f"Unparseable date in {collection_name} document {document['_id']}")
+
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                converted[collection_name] += result.modified_count
+            last_id = batch[-1]["_id"]
+            logger.info(f"Converted {converted[collection_name]} {collection_name} documents to native dates")
+
+    return converted
@@ -0,0 +1,56 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class RiskBand(BaseModel):
+    threshold: int
+    at_risk: int
+    not_at_risk: int
+
+class ExercisePainPrevalence(BaseModel):
+    exercise_id: str
+    name: str
+    tests: int
+    pain: int
+    rate: float
+
+class AnalyticsSummary(BaseModel):
+    total_tests: int
+    score_distribution: Dict[str, int]
+    clients_tested: int
+    latest_score_distribution: Dict[str, int]
+    risk_band: RiskBand
+    pain_prevalence: List[ExercisePainPrevalence]
+    rebuilt_at: Optional[datetime] = None
+
+class ExerciseTrend(BaseModel):
+    exercise_id: str
+    scores: List[Optional[float]]
+    changes: List[Optional[float]]
+    rate_per_30_days: List[Optional[float]]
+    asymmetry: List[bool]
+    net_change: Optional[float] = None
+
+class ClientTrends(BaseModel):
+    client_id: str
+    test_dates: List[datetime]
+    total_scores: List[int]
+    total_score_slope_per_30_days: Optional[float] = None
+    exercises: List[ExerciseTrend]
+    asymmetric_exercises: List[str]
+
+class ExerciseCohortTrend(BaseModel):
+    exercise_id: str
+    clients: int
+    mean_change: Optional[float] = None
+    improved: int
+    declined: int
+    unchanged: int
+    asymmetry_rate: float
+
+class CohortTrends(BaseModel):
+    clients: int
+    tests: int
+    mean_total_change: Optional[float] = None
+    exercises: List[ExerciseCohortTrend]
+    seconds: float
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import uuid
 
@@ -27,4 +27,26 @@ class ClientUpdate(BaseModel):
     email: Optional[EmailStr] = None
     phone: Optional[str] = None
     date_of_birth: Optional[str] = None
-    occupation: Optional[str] = None
\ No newline at end of file
+    occupation: Optional[str] = None
+
+class ScoreBand(BaseModel):
+    label: str
+    min_score: int
+    max_score: int
+    clients: int
+
+class ClientsSummary(BaseModel):
+    total_clients: int
+    total_tests: int
+    tested_clients: int
+    untested_clients: int
+    recent_days: int
+    recently_tested_clients: int
+    # Clients by latest total score
+    score_bands: List[ScoreBand]
+
+def build_search_keys(name: str, email: str) -> List[str]:
+    """Lower-cased prefixes searched by GET /clients/?q=: the full name, each name word and the email"""
+    name = name.lower().strip()
+    keys = [name, email.lower()] + name.split()
+    return list(dict.fromkeys(keys))
@@ -8,6 +8,10 @@ class FMSExercise(BaseModel):
     instructions: str
     scoring_criteria: Dict[str, str]
 
+# Bump whenever an exercise or its scoring criteria change, so cached
+# copies of the catalog are replaced
+FMS_CATALOG_VERSION = 1
+
 # Static FMS exercises data
 FMS_EXERCISES = [
     FMSExercise(
@@ -94,4 +98,6 @@ FMS_EXERCISES = [
             "0": "Pain associated with any portion of this movement"
         }
     )
-]
\ No newline at end of file
+]
+
+FMS_EXERCISES_BY_ID: Dict[str, FMSExercise] = {exercise.id: exercise for exercise in FMS_EXERCISES}
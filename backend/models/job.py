@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+import uuid
+
+# Client ids per POST /clients/bulk-delete request
+MAX_BULK_DELETE = 10000
+
+class JobProgress(BaseModel):
+    clients_total: int = 0
+    clients_deleted: int = 0
+    tests_deleted: int = 0
+    # Checkpoint: clients before this index are done
+    next_index: int = 0
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    type: Literal["delete_clients"]
+    status: Literal["queued", "running", "completed", "failed"] = "queued"
+    progress: JobProgress = Field(default_factory=JobProgress)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class BulkDeleteRequest(BaseModel):
+    client_ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_DELETE)
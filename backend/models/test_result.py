@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Dict, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 import uuid
 
@@ -7,6 +7,17 @@ class ExerciseScore(BaseModel):
     score: int = Field(..., ge=0, le=3)
     pain: bool = Field(default=False)
     notes: Optional[str] = None
+    # Bilateral patterns may record each side; score is the lower of the two
+    left: Optional[int] = Field(None, ge=0, le=3)
+    right: Optional[int] = Field(None, ge=0, le=3)
+
+    @model_validator(mode="after")
+    def score_is_lower_side(self):
+        # Pain during a clearing test scores the pattern 0 whatever the sides scored
+        if self.left is not None and self.right is not None:
+            if self.score != min(self.left, self.right) and not (self.pain and self.score == 0):
+                raise ValueError("score must be the lower of left and right (or 0 with pain)")
+        return self
 
 class TestResult(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -22,4 +33,65 @@ class TestResultCreate(BaseModel):
     assessor_notes: Optional[str] = None
     
     def calculate_total_score(self) -> int:
-        return sum(exercise_score.score for exercise_score in self.scores.values())
\ No newline at end of file
+        return sum(exercise_score.score for exercise_score in self.scores.values())
+
+def build_score_entries(scores: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Shadow array of the scores dict, one {exercise, score, pain} entry per exercise.
+
+    Stored next to scores so a multikey index can answer per-exercise
+    filters across clients; never returned by the API.
+    """
+    entries = []
+    for exercise_id, exercise_score in scores.items():
+        if isinstance(exercise_score, BaseModel):
+            exercise_score = exercise_score.dict()
+        entries.append({
+            "exercise": exercise_id,
+            "score": exercise_score.get("score"),
+            "pain": bool(exercise_score.get("pain", False)),
+        })
+    return entries
+
+# Top-level fields a caller may request with ?fields= on the history endpoint
+TEST_RESULT_FIELDS = ("id", "client_id", "test_date", "scores", "total_score", "assessor_notes")
+
+class TestResultView(BaseModel):
+    """A TestResult restricted to a subset of its fields; fields not loaded are left out of the response"""
+    id: Optional[str] = None
+    client_id: Optional[str] = None
+    test_date: Optional[datetime] = None
+    scores: Optional[Dict[str, ExerciseScore]] = None
+    total_score: Optional[int] = None
+    assessor_notes: Optional[str] = None
+
+# Results per POST /test-results/batch request
+MAX_BATCH_SIZE = 500
+
+class TestResultBatchItem(TestResultCreate):
+    """A result scored offline; re-sending the same idempotency_key never creates a second test"""
+    idempotency_key: str = Field(..., min_length=1, max_length=128)
+    test_date: Optional[datetime] = None
+
+    @field_validator("test_date")
+    @classmethod
+    def test_date_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Stored dates are naive UTC; an offset (toISOString() sends Z) would not compare with them
+        from repositories.documents import naive_utc  # repositories.documents imports these models
+        return naive_utc(value)
+
+class TestResultBatch(BaseModel):
+    # Items are validated one by one so a bad item fails alone
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TestResultBatchItemStatus(BaseModel):
+    index: int
+    idempotency_key: Optional[str] = None
+    status: Literal["created", "duplicate", "invalid", "error"]
+    id: Optional[str] = None
+    errors: Optional[List[Dict[str, str]]] = None
+
+class TestResultBatchResponse(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[TestResultBatchItemStatus]
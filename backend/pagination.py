@@ -0,0 +1,80 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymongo
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_cursor(value: Any, last_id: str) -> str:
+    """Encode the sort value and id of the last returned document as an opaque token"""
+    payload = json.dumps([_encode_value(value), last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[Any, str]:
+    """Decode a token produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = _decode_value(value)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(last_id, str):
+        raise ValueError("Invalid cursor")
+    return value, last_id
+
+def keyset_sort(field: str, descending: bool) -> List[Tuple[str, int]]:
+    """Sort specification for a keyset page, using `id` as the tie-breaker"""
+    direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+    return [(field, direction), ("id", direction)]
+
+def keyset_filter(
+    field: str,
+    descending: bool,
+    value: Any,
+    last_id: str,
+    date_field: bool = False
+) -> Dict[str, Any]:
+    """Filter matching every document that sorts after (value, last_id).
+
+    MongoDB sorts null/missing values before everything else, so a null
+    value needs its own branch: ascending pages move from nulls on to real
+    values, descending pages finish with the nulls. For a `date_field`,
+    legacy ISO strings likewise sort before BSON dates until the
+    native-date migration has run, and $gt/$lt never compare across types.
+    """
+    id_op = "$lt" if descending else "$gt"
+    if value is None:
+        same_value = {field: None, "id": {id_op: last_id}}
+        if descending:
+            return same_value
+        return {"$or": [same_value, {field: {"$ne": None}}]}
+
+    value_op = "$lt" if descending else "$gt"
+    branches = [
+        {field: {value_op: value}},
+        {field: value, "id": {id_op: last_id}},
+    ]
+    if descending:
+        branches.append({field: None})
+        if date_field and isinstance(value, datetime):
+            branches.append({field: {"$type": "string"}})
+    elif date_field and isinstance(value, str):
+        branches.append({field: {"$type": "date"}})
+    return {"$or": branches}
+
+def next_cursor(documents: List[Dict[str, Any]], field: str, limit: int) -> Optional[str]:
+    """Token for the page after `documents`, or None when this was the last page"""
+    if len(documents) <= limit:
+        return None
+    last = documents[limit - 1]
+    return encode_cursor(last.get(field), last["id"])
@@ -0,0 +1,58 @@
+import logging
+import os
+from typing import Optional
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from repositories.base import After, ClientRepository, Repositories, TestResultRepository
+
+logger = logging.getLogger(__name__)
+
+# STORAGE_BACKEND values. MongoDB is the full deployment; memory (nothing
+# persisted, for tests and benchmarks) and sqlite (one file, SQLITE_PATH,
+# for single-clinic installs) cover client and test result CRUD only.
+STORAGE_BACKENDS = ("mongodb", "memory", "sqlite")
+
+# Set by the app lifespan
+repositories: Optional[Repositories] = None
+
+def storage_backend() -> str:
+    backend = os.environ.get("STORAGE_BACKEND", "mongodb").strip().lower()
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}, not {backend!r}")
+    return backend
+
+def create_repositories(backend: str, db: Optional[AsyncIOMotorDatabase] = None) -> Repositories:
+    if backend == "mongodb":
+        from repositories.mongo import create_mongo_repositories
+        return create_mongo_repositories(db)
+    if backend == "memory":
+        from repositories.memory import create_memory_repositories
+        return create_memory_repositories()
+    from repositories.sqlite import create_sqlite_repositories
+    return create_sqlite_repositories(os.environ.get("SQLITE_PATH", "fms.sqlite3"))
+
+def configure_repositories(db: Optional[AsyncIOMotorDatabase] = None) -> Repositories:
+    global repositories
+    backend = storage_backend()
+    repositories = create_repositories(backend, db)
+    logger.info(f"Storage backend: {backend}")
+    return repositories
+
+async def close_repositories():
+    global repositories
+    if repositories is not None:
+        await repositories.close()
+        repositories = None
+
+async def get_repositories() -> Repositories:
+    """Dependency to get the configured repositories"""
+    if repositories is None:
+        raise HTTPException(status_code=503, detail="Storage is not configured")
+    return repositories
+
+__all__ = [
+    "After", "ClientRepository", "Repositories", "STORAGE_BACKENDS", "TestResultRepository",
+    "close_repositories", "configure_repositories", "create_repositories", "get_repositories", "storage_backend",
+]
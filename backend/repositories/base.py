@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Position after the last document of a keyset page: (sort value, id)
+After = Optional[Tuple[Any, str]]
+
+class ClientRepository(ABC):
+    """Storage of client documents.
+
+    Documents are the dicts the routes build from Client, plus the
+    bookkeeping fields search_keys, version and updated_at. Reads return
+    every Client field with version and updated_at, never search_keys.
+    """
+
+    @abstractmethod
+    async def create(self, document: Dict[str, Any]):
+        """Store a new client"""
+
+    @abstractmethod
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Store new clients, each on its own; returns the error message of every document not stored, by position"""
+
+    @abstractmethod
+    async def get(self, client_id: str) -> Optional[Dict[str, Any]]:
+        """The client, or None if it does not exist"""
+
+    @abstractmethod
+    async def page(
+        self,
+        sort: str,
+        descending: bool,
+        q: Optional[str],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` clients ordered by (sort, id), nulls first, after the given position.
+
+        q matches a prefix of any search key (already lower-cased).
+        """
+
+    @abstractmethod
+    async def update(self, client_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Set fields and bump version; returns the updated client or None if it does not exist"""
+
+    @abstractmethod
+    async def delete(self, client_id: str) -> bool:
+        """Delete a client and all of its tests; returns whether the client existed"""
+
+    @abstractmethod
+    async def summary(self, since: datetime) -> Dict[str, Any]:
+        """Dashboard counts: total_clients, total_tests, recently_tested_clients
+        (last tested at or after since) and latest_scores, the number of
+        clients per latest total score.
+        """
+
+class TestResultRepository(ABC):
+    """Storage of test result documents and the test statistics they keep on their client.
+
+    Creating or deleting a test also updates the client's total_tests,
+    latest_score and last_test_date (and version), as one unit where the
+    backend allows it. Reads never return score_entries or idempotency_key.
+    """
+
+    @abstractmethod
+    async def create(self, document: Dict[str, Any]):
+        """Store a new test and count it on its client"""
+
+    @abstractmethod
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, Optional[str]]:
+        """Store new tests and count them on their clients, as one unit where the backend allows it.
+
+        Returns the documents not stored, by position: None for an
+        idempotency_key that is already stored, otherwise the error message.
+        """
+
+    @abstractmethod
+    async def idempotency_ids(self, keys: List[str]) -> Dict[str, str]:
+        """Ids of the stored tests with any of the given idempotency keys, by key"""
+
+    @abstractmethod
+    async def get(self, test_id: str) -> Optional[Dict[str, Any]]:
+        """The test, or None if it does not exist"""
+
+    @abstractmethod
+    async def history(
+        self,
+        client_id: str,
+        fields: Optional[Set[str]],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` of a client's tests, newest first, restricted to `fields` when given"""
+
+    @abstractmethod
+    async def filter(
+        self,
+        entry: Dict[str, Any],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Up to `limit` tests of any client, newest first, with a score entry matching `entry`.
+
+        entry holds exercise and optionally pain and a score range as
+        {"$gte": low, "$lte": high}, the shape of a MongoDB $elemMatch.
+        """
+
+    @abstractmethod
+    async def delete(self, test_id: str) -> Optional[Dict[str, Any]]:
+        """Delete a test and recompute its client's statistics; returns the deleted test or None"""
+
+class Repositories:
+    """The configured backend's repositories.
+
+    `db` is the Motor database when the backend is MongoDB; features that
+    only exist there (analytics, jobs, export, admin) use it directly.
+    """
+
+    def __init__(self, backend: str, clients: ClientRepository, test_results: TestResultRepository, db=None):
+        self.backend = backend
+        self.clients = clients
+        self.test_results = test_results
+        self.db = db
+
+    async def close(self):
+        pass
@@ -0,0 +1,57 @@
+import copy
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+from models.client import Client
+from models.test_result import TestResult
+
+# Fields returned by reads of the memory and SQLite backends, matching the
+# Motor backend's projections
+CLIENT_READ_FIELDS = tuple(Client.model_fields) + ("version", "updated_at")
+TEST_RESULT_READ_FIELDS = tuple(TestResult.model_fields)
+
+def read_fields(document: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """A copy of the given fields; missing ones stay missing, as with a MongoDB projection"""
+    return {field: copy.deepcopy(document[field]) for field in fields if field in document}
+
+def naive_utc(value: Any) -> Any:
+    """Stored dates are naive UTC; aware query values are converted so they compare"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def sort_key(value: Any, document_id: str) -> tuple:
+    """(field, id) ordering with nulls first, as MongoDB sorts them"""
+    return (value is not None, value, document_id)
+
+def entry_matches(score_entry: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+    """Evaluate a score_entries $elemMatch (exercise, pain, score $gte/$lte) against one entry"""
+    if score_entry.get("exercise") != entry["exercise"]:
+        return False
+    if "pain" in entry and score_entry.get("pain") != entry["pain"]:
+        return False
+    score_range = entry.get("score") or {}
+    score = score_entry.get("score")
+    if "$gte" in score_range and (score is None or score < score_range["$gte"]):
+        return False
+    if "$lte" in score_range and (score is None or score > score_range["$lte"]):
+        return False
+    return True
+
+def fold_test_into_stats(client: Dict[str, Any], total_score: int, test_date: datetime):
+    """Count a new test on the client in place; only a test at least as new as the last one sets the latest score"""
+    client["total_tests"] = client.get("total_tests", 0) + 1
+    last_test_date = client.get("last_test_date")
+    if last_test_date is None or last_test_date <= test_date:
+        client["latest_score"] = total_score
+        client["last_test_date"] = test_date
+    client["version"] = client.get("version", 0) + 1
+    client["updated_at"] = datetime.utcnow()
+
+def test_stats(tests: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """total_tests, latest_score and last_test_date recomputed from a client's remaining tests"""
+    tests = list(tests)
+    if not tests:
+        return {"total_tests": 0, "latest_score": None, "last_test_date": None}
+    latest = max(tests, key=lambda test: (test["test_date"], test["id"]))
+    return {"total_tests": len(tests), "latest_score": latest["total_score"], "last_test_date": latest["test_date"]}
@@ -0,0 +1,284 @@
+import copy
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from repositories.base import After, ClientRepository, Repositories, TestResultRepository
+from repositories.documents import (
+    CLIENT_READ_FIELDS, TEST_RESULT_READ_FIELDS, entry_matches, fold_test_into_stats, naive_utc, read_fields,
+    sort_key, test_stats
+)
+
+# Fields GET /clients/ may sort on, each kept as a sorted index
+CLIENT_SORT_FIELDS = ("name", "created_at", "latest_score", "last_test_date")
+
+class SortedKeys:
+    """Tuples kept in order with bisect, so a page seeks to its position instead of sorting.
+
+    The memory backend's stand-in for the MongoDB and SQLite indexes.
+    """
+
+    def __init__(self):
+        self.keys: List[tuple] = []
+
+    def add(self, key: tuple):
+        insort(self.keys, key)
+
+    def remove(self, key: tuple):
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+    def walk(self, descending: bool, after: Optional[tuple] = None) -> Iterator[tuple]:
+        """Keys in order (or reversed), starting strictly after the given key"""
+        if descending:
+            index = bisect_left(self.keys, after) if after is not None else len(self.keys)
+            while index > 0:
+                index -= 1
+                yield self.keys[index]
+        else:
+            index = bisect_right(self.keys, after) if after is not None else 0
+            while index < len(self.keys):
+                yield self.keys[index]
+                index += 1
+
+    def dated(self, from_date: Optional[datetime], to_date: Optional[datetime], after: After) -> Iterator[tuple]:
+        """(date, id) keys newest first within the date range, after the cursor"""
+        end = bisect_right(self.keys, to_date, key=lambda key: key[0]) if to_date is not None else len(self.keys)
+        if after is not None:
+            end = min(end, bisect_left(self.keys, (naive_utc(after[0]), after[1])))
+        for index in range(end - 1, -1, -1):
+            key = self.keys[index]
+            if from_date is not None and key[0] < from_date:
+                return
+            yield key
+
+class MemoryStore:
+    """Documents of both collections plus the sorted indexes the reads use.
+
+    Everything runs on the event loop without awaiting in between, so
+    each operation is atomic. Documents are copied in and out, so callers
+    never share state with the store. Writes go through the methods here
+    so the indexes stay in step with the documents.
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, Dict[str, Any]] = {}
+        self.tests: Dict[str, Dict[str, Any]] = {}
+        # sort field -> sort_key(value, id) of every client
+        self.clients_by_field: Dict[str, SortedKeys] = {field: SortedKeys() for field in CLIENT_SORT_FIELDS}
+        # (search key, client id) for prefix search
+        self.search_keys = SortedKeys()
+        # client_id -> (test_date, id) of its tests
+        self.tests_by_client: Dict[str, SortedKeys] = {}
+        # exercise id -> (test_date, id) of tests with an entry for it
+        self.tests_by_exercise: Dict[str, SortedKeys] = {}
+        # exercise id -> test id -> that exercise's score entry
+        self.entries_by_exercise: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # idempotency_key -> id of the test synced with it
+        self.tests_by_idempotency_key: Dict[str, str] = {}
+
+    def add_client(self, client: Dict[str, Any]):
+        self.clients[client["id"]] = client
+        self._index_client(client)
+
+    def remove_client(self, client_id: str) -> Optional[Dict[str, Any]]:
+        client = self.clients.pop(client_id, None)
+        if client is not None:
+            self._unindex_client(client)
+        return client
+
+    def change_client(self, client: Dict[str, Any], change: Callable[[Dict[str, Any]], None]):
+        """Apply change to a stored client in place, re-indexing it around the change"""
+        self._unindex_client(client)
+        change(client)
+        self._index_client(client)
+
+    def _index_client(self, client: Dict[str, Any]):
+        for field, keys in self.clients_by_field.items():
+            keys.add(sort_key(client.get(field), client["id"]))
+        for search_key in set(client.get("search_keys") or ()):
+            self.search_keys.add((search_key, client["id"]))
+
+    def _unindex_client(self, client: Dict[str, Any]):
+        for field, keys in self.clients_by_field.items():
+            keys.remove(sort_key(client.get(field), client["id"]))
+        for search_key in set(client.get("search_keys") or ()):
+            self.search_keys.remove((search_key, client["id"]))
+
+    def search(self, prefix: str) -> Set[str]:
+        """Ids of clients with a search key starting with prefix"""
+        ids = set()
+        for search_key, client_id in self.search_keys.walk(False, (prefix,)):
+            if not search_key.startswith(prefix):
+                break
+            ids.add(client_id)
+        return ids
+
+    def add_test(self, test: Dict[str, Any]):
+        self.tests[test["id"]] = test
+        key = (test["test_date"], test["id"])
+        self.tests_by_client.setdefault(test["client_id"], SortedKeys()).add(key)
+        if test.get("idempotency_key") is not None:
+            self.tests_by_idempotency_key[test["idempotency_key"]] = test["id"]
+        for entry in test.get("score_entries") or ():
+            self.entries_by_exercise.setdefault(entry["exercise"], {})[test["id"]] = entry
+            self.tests_by_exercise.setdefault(entry["exercise"], SortedKeys()).add(key)
+
+    def remove_test(self, test_id: str) -> Optional[Dict[str, Any]]:
+        test = self.tests.pop(test_id, None)
+        if test is None:
+            return None
+        key = (test["test_date"], test_id)
+        self.tests_by_client.get(test["client_id"], SortedKeys()).remove(key)
+        self.tests_by_idempotency_key.pop(test.get("idempotency_key"), None)
+        for entry in test.get("score_entries") or ():
+            self.entries_by_exercise.get(entry["exercise"], {}).pop(test_id, None)
+            self.tests_by_exercise.get(entry["exercise"], SortedKeys()).remove(key)
+        return test
+
+    def client_tests(self, client_id: str) -> List[Dict[str, Any]]:
+        return [self.tests[test_id] for _, test_id in self.tests_by_client.get(client_id, SortedKeys()).keys]
+
+def _bump(client: Dict[str, Any], fields: Dict[str, Any]):
+    client.update(fields)
+    client["updated_at"] = datetime.utcnow()
+    client["version"] = client.get("version", 0) + 1
+
+class MemoryClientRepository(ClientRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def create(self, document: Dict[str, Any]):
+        if document["id"] in self.store.clients:
+            raise ValueError(f"Duplicate client id {document['id']}")
+        self.store.add_client(copy.deepcopy(document))
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, str]:
+        failures = {}
+        for position, document in enumerate(documents):
+            if document["id"] in self.store.clients:
+                failures[position] = f"Duplicate client id {document['id']}"
+            else:
+                self.store.add_client(copy.deepcopy(document))
+        return failures
+
+    async def get(self, client_id: str) -> Optional[Dict[str, Any]]:
+        client = self.store.clients.get(client_id)
+        return read_fields(client, CLIENT_READ_FIELDS) if client is not None else None
+
+    async def page(self, sort: str, descending: bool, q: Optional[str], after: After, limit: int) -> List[Dict[str, Any]]:
+        position = sort_key(naive_utc(after[0]), after[1]) if after is not None else None
+        if q:
+            # Only the matches are ordered, keeping the `limit` first past the cursor
+            keys = [sort_key(self.store.clients[client_id].get(sort), client_id) for client_id in self.store.search(q)]
+            if position is not None:
+                keys = [key for key in keys if (key < position if descending else key > position)]
+            keys = (heapq.nlargest if descending else heapq.nsmallest)(limit, keys)
+        else:
+            keys = list(islice(self.store.clients_by_field[sort].walk(descending, position), limit))
+        return [read_fields(self.store.clients[key[-1]], CLIENT_READ_FIELDS) for key in keys]
+
+    async def update(self, client_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        client = self.store.clients.get(client_id)
+        if client is None:
+            return None
+        self.store.change_client(client, lambda client: _bump(client, copy.deepcopy(fields)))
+        return read_fields(client, CLIENT_READ_FIELDS)
+
+    async def delete(self, client_id: str) -> bool:
+        for _, test_id in list(self.store.tests_by_client.pop(client_id, SortedKeys()).keys):
+            self.store.remove_test(test_id)
+        return self.store.remove_client(client_id) is not None
+
+    async def summary(self, since: datetime) -> Dict[str, Any]:
+        latest_scores: Dict[int, int] = {}
+        recently_tested = 0
+        for client in self.store.clients.values():
+            if client.get("latest_score") is not None:
+                latest_scores[client["latest_score"]] = latest_scores.get(client["latest_score"], 0) + 1
+            last_test_date = client.get("last_test_date")
+            if last_test_date is not None and last_test_date >= since:
+                recently_tested += 1
+        return {
+            "total_clients": len(self.store.clients),
+            "total_tests": len(self.store.tests),
+            "recently_tested_clients": recently_tested,
+            "latest_scores": latest_scores,
+        }
+
+class MemoryTestResultRepository(TestResultRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    async def create(self, document: Dict[str, Any]):
+        if document["id"] in self.store.tests:
+            raise ValueError(f"Duplicate test result id {document['id']}")
+        self._add(document)
+
+    def _add(self, document: Dict[str, Any]):
+        self.store.add_test(copy.deepcopy(document))
+        client = self.store.clients.get(document["client_id"])
+        if client is not None:
+            self.store.change_client(client, lambda client: fold_test_into_stats(client, document["total_score"], document["test_date"]))
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, Optional[str]]:
+        failures: Dict[int, Optional[str]] = {}
+        for position, document in enumerate(documents):
+            if document.get("idempotency_key") in self.store.tests_by_idempotency_key:
+                failures[position] = None
+            elif document["id"] in self.store.tests:
+                failures[position] = f"Duplicate test result id {document['id']}"
+            else:
+                self._add(document)
+        return failures
+
+    async def idempotency_ids(self, keys: List[str]) -> Dict[str, str]:
+        return {key: self.store.tests_by_idempotency_key[key] for key in keys if key in self.store.tests_by_idempotency_key}
+
+    async def get(self, test_id: str) -> Optional[Dict[str, Any]]:
+        test = self.store.tests.get(test_id)
+        return read_fields(test, TEST_RESULT_READ_FIELDS) if test is not None else None
+
+    async def history(
+        self,
+        client_id: str,
+        fields: Optional[Set[str]],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        keys = self.store.tests_by_client.get(client_id, SortedKeys()).dated(naive_utc(from_date), naive_utc(to_date), after)
+        return [read_fields(self.store.tests[test_id], fields or TEST_RESULT_READ_FIELDS) for _, test_id in islice(keys, limit)]
+
+    async def filter(
+        self,
+        entry: Dict[str, Any],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        # Newest first through the exercise's tests; pain and score are checked
+        # on the entries, as the MongoDB index checks them on its keys
+        entries = self.store.entries_by_exercise.get(entry["exercise"], {})
+        keys = self.store.tests_by_exercise.get(entry["exercise"], SortedKeys()).dated(naive_utc(from_date), naive_utc(to_date), after)
+        matching = (test_id for _, test_id in keys if entry_matches(entries[test_id], entry))
+        return [read_fields(self.store.tests[test_id], TEST_RESULT_READ_FIELDS) for test_id in islice(matching, limit)]
+
+    async def delete(self, test_id: str) -> Optional[Dict[str, Any]]:
+        test = self.store.remove_test(test_id)
+        if test is None:
+            return None
+        client = self.store.clients.get(test["client_id"])
+        if client is not None:
+            stats = test_stats(self.store.client_tests(test["client_id"]))
+            self.store.change_client(client, lambda client: _bump(client, stats))
+        return read_fields(test, TEST_RESULT_READ_FIELDS)
+
+def create_memory_repositories() -> Repositories:
+    store = MemoryStore()
+    return Repositories("memory", MemoryClientRepository(store), MemoryTestResultRepository(store))
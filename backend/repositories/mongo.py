@@ -0,0 +1,463 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from analytics import (
+    SUMMARY_ID, record_client_removed, record_latest_score_change, record_latest_score_changes, record_test_added,
+    record_test_removed, record_tests_added, record_tests_removed, tests_removal_increments
+)
+from database import run_in_transaction
+from pagination import keyset_filter, keyset_sort
+from repositories.base import After, ClientRepository, Repositories, TestResultRepository
+from repositories.documents import naive_utc
+from serialization import CLIENT_SHAPE, TEST_RESULT_SHAPE, TEST_RESULT_VIEW_SHAPE
+
+logger = logging.getLogger(__name__)
+
+# Client fields that older releases stored as ISO strings
+CLIENT_DATE_FIELDS = ("created_at", "last_test_date")
+
+# Tests removed per transaction when deleting a client
+DELETE_BATCH_SIZE = 1000
+
+# Transactions a batch insert may run before giving up on concurrent syncs of the same keys
+BATCH_ATTEMPTS = 3
+
+# MongoDB's duplicate key error code
+DUPLICATE_KEY = 11000
+
+CLIENT_READ_PROJECTION = {**CLIENT_SHAPE.projection, "version": 1, "updated_at": 1}
+
+def _date_range(field: str, from_date: Optional[datetime], to_date: Optional[datetime]) -> Dict[str, Any]:
+    """Filter bounding a date field, or {} without bounds.
+
+    BSON compares dates only with dates, so legacy ISO strings (until the
+    native-date migration has run) get their own branch; they compare in
+    date order as strings.
+    """
+    date_range, string_range = {}, {}
+    if from_date:
+        date_range["$gte"] = from_date
+        string_range["$gte"] = naive_utc(from_date).isoformat()
+    if to_date:
+        date_range["$lte"] = to_date
+        string_range["$lte"] = naive_utc(to_date).isoformat()
+    if not date_range:
+        return {}
+    return {"$or": [{field: date_range}, {field: {"$type": "string", **string_range}}]}
+
+class MongoClientRepository(ClientRepository):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def create(self, document: Dict[str, Any]):
+        await self.db.clients.insert_one(document)
+        document.pop("_id", None)
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, str]:
+        try:
+            await self.db.clients.insert_many(documents, ordered=False)
+            return {}
+        except BulkWriteError as e:
+            return {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        finally:
+            for document in documents:
+                document.pop("_id", None)
+
+    async def get(self, client_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.clients.find_one({"id": client_id}, CLIENT_READ_PROJECTION)
+
+    async def page(self, sort: str, descending: bool, q: Optional[str], after: After, limit: int) -> List[Dict[str, Any]]:
+        filters = []
+        if q:
+            filters.append({"search_keys": {"$regex": "^" + re.escape(q)}})
+        if after is not None:
+            filters.append(keyset_filter(sort, descending, after[0], after[1], sort in CLIENT_DATE_FIELDS))
+        query = {"$and": filters} if filters else {}
+        return await self.db.clients.find(query, CLIENT_READ_PROJECTION) \
+            .sort(keyset_sort(sort, descending)) \
+            .limit(limit) \
+            .to_list(limit)
+
+    async def update(self, client_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.db.clients.find_one_and_update(
+            {"id": client_id},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+            projection=CLIENT_READ_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, client_id: str) -> bool:
+        return await delete_client_cascade(self.db, client_id)
+
+    async def summary(self, since: datetime) -> Dict[str, Any]:
+        # The maintained analytics counters plus one indexed count
+        summary = await self.db.analytics_summary.find_one(
+            {"_id": SUMMARY_ID},
+            {"_id": 0, "tests.count": 1, "clients.latest_score_histogram": 1}
+        ) or {}
+        recently_tested = await self.db.clients.count_documents({
+            "$or": [
+                {"last_test_date": {"$gte": since}},
+                # Legacy ISO strings compare in date order as strings
+                {"last_test_date": {"$type": "string", "$gte": since.isoformat()}}
+            ]
+        })
+        histogram = summary.get("clients", {}).get("latest_score_histogram", {})
+        return {
+            "total_clients": await self.db.clients.estimated_document_count(),
+            "total_tests": summary.get("tests", {}).get("count", 0),
+            "recently_tested_clients": recently_tested,
+            "latest_scores": {int(score): count for score, count in histogram.items()},
+        }
+
+class MongoTestResultRepository(TestResultRepository):
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def create(self, document: Dict[str, Any]):
+        db = self.db
+
+        async def insert_with_stats(session):
+            await db.test_results.insert_one(document, session=session)
+            try:
+                await update_client_test_stats(document["client_id"], document["total_score"], document["test_date"], db, session)
+            except Exception as e:
+                if session is not None:
+                    raise
+                # Standalone server: the test is stored, so rebuild the
+                # stats from history rather than leave them short
+                logger.error(f"Error updating client test stats: {str(e)}")
+                await recalculate_client_test_stats(document["client_id"], db)
+            try:
+                await record_test_added(db, document, session)
+            except Exception as e:
+                if session is not None:
+                    raise
+                # Drift is repaired by POST /api/admin/rebuild-analytics
+                logger.error(f"Error updating analytics summary: {str(e)}")
+
+        await run_in_transaction(db, insert_with_stats)
+        document.pop("_id", None)
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, Optional[str]]:
+        db = self.db
+        failures: Dict[int, Optional[str]] = {}
+        # Positions still to insert
+        pending = list(range(len(documents)))
+
+        async def insert_batch(session):
+            tests = [documents[position] for position in pending]
+            if not tests:
+                return
+            try:
+                await db.test_results.insert_many(tests, ordered=False, session=session)
+                inserted = tests
+            except BulkWriteError as e:
+                if session is not None:
+                    raise
+                # Standalone server: a concurrent sync may have stored some keys first
+                errors = {error["index"]: error for error in e.details["writeErrors"]}
+                inserted = [test for index, test in enumerate(tests) if index not in errors]
+                for index, error in errors.items():
+                    failures[pending[index]] = None if error["code"] == DUPLICATE_KEY else error["errmsg"]
+
+            if not inserted:
+                return
+            try:
+                await update_clients_test_stats_batch(inserted, db, session)
+            except Exception as e:
+                if session is not None:
+                    raise
+                # Standalone server: the tests are stored, so rebuild the
+                # affected clients' stats from history
+                logger.error(f"Error updating client test stats: {str(e)}")
+                for client_id in {test["client_id"] for test in inserted}:
+                    await recalculate_client_test_stats(client_id, db)
+            try:
+                await record_tests_added(db, inserted, session)
+            except Exception as e:
+                if session is not None:
+                    raise
+                logger.error(f"Error updating analytics summary: {str(e)}")
+
+        attempts = 0
+        while True:
+            try:
+                await run_in_transaction(db, insert_batch)
+                break
+            except BulkWriteError as e:
+                # The transaction aborted because a concurrent sync stored
+                # some of these keys first: report those and insert the rest
+                attempts += 1
+                if attempts >= BATCH_ATTEMPTS or not only_duplicate_keys(e):
+                    raise
+                logger.info("Retrying test batch: a concurrent sync stored some of its keys")
+                stored = await self.idempotency_ids([documents[position]["idempotency_key"] for position in pending])
+                for position in pending:
+                    if documents[position]["idempotency_key"] in stored:
+                        failures[position] = None
+                pending = [position for position in pending if position not in failures]
+        for document in documents:
+            document.pop("_id", None)
+        return failures
+
+    async def idempotency_ids(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        return {
+            test["idempotency_key"]: test["id"]
+            async for test in self.db.test_results.find(
+                {"idempotency_key": {"$in": keys}},
+                {"_id": 0, "id": 1, "idempotency_key": 1}
+            )
+        }
+
+    async def get(self, test_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.test_results.find_one({"id": test_id}, TEST_RESULT_SHAPE.projection)
+
+    async def history(
+        self,
+        client_id: str,
+        fields: Optional[Set[str]],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        projection = TEST_RESULT_VIEW_SHAPE.projection if fields is None else {"_id": 0, **{field: 1 for field in fields}}
+        query: Dict[str, Any] = {"client_id": client_id, **_date_range("test_date", from_date, to_date)}
+        return await self._page(query, projection, after, limit)
+
+    async def filter(
+        self,
+        entry: Dict[str, Any],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        if "pain" not in entry:
+            # Both values as point bounds, so the index still supplies the
+            # (test_date, id) order through a merge instead of a blocking sort
+            entry = {**entry, "pain": {"$in": [False, True]}}
+        # $elemMatch keeps every condition on the same exercise's entry
+        query: Dict[str, Any] = {"score_entries": {"$elemMatch": entry}, **_date_range("test_date", from_date, to_date)}
+        return await self._page(query, TEST_RESULT_SHAPE.projection, after, limit)
+
+    async def _page(self, query: Dict[str, Any], projection: Dict[str, Any], after: After, limit: int) -> List[Dict[str, Any]]:
+        if after is not None:
+            query = {"$and": [query, keyset_filter("test_date", True, after[0], after[1], date_field=True)]}
+        return await self.db.test_results.find(query, projection) \
+            .sort(keyset_sort("test_date", True)) \
+            .limit(limit) \
+            .to_list(limit)
+
+    async def delete(self, test_id: str) -> Optional[Dict[str, Any]]:
+        test_result = await self.db.test_results.find_one_and_delete({"id": test_id}, projection={"_id": 0})
+        if test_result is None:
+            return None
+        # Update client's test statistics and the facility summary
+        await record_test_removed(self.db, test_result)
+        await recalculate_client_test_stats(test_result["client_id"], self.db)
+        return test_result
+
+def create_mongo_repositories(db: AsyncIOMotorDatabase) -> Repositories:
+    return Repositories("mongodb", MongoClientRepository(db), MongoTestResultRepository(db), db=db)
+
+async def update_client_test_stats(
+    client_id: str,
+    latest_score: int,
+    test_date: datetime,
+    db: AsyncIOMotorDatabase,
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Fold a new test into the client's statistics with a server-side update.
+
+    A test newer than (or as new as) the client's last one also becomes the
+    latest score; a backdated one only increments the count, so imports in
+    any order converge on the same result.
+    """
+    before = await db.clients.find_one_and_update(
+        {
+            "id": client_id,
+            "$or": [
+                {"last_test_date": None},
+                {"last_test_date": {"$lte": test_date}},
+                # Legacy ISO string, not yet migrated to a BSON date
+                {"last_test_date": {"$type": "string"}}
+            ]
+        },
+        {
+            "$inc": {"total_tests": 1, "version": 1},
+            "$max": {"last_test_date": test_date},
+            "$set": {"latest_score": latest_score, "updated_at": datetime.utcnow()}
+        },
+        projection={"_id": 0, "latest_score": 1},
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if before is None:
+        await db.clients.update_one(
+            {"id": client_id},
+            {"$inc": {"total_tests": 1, "version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            session=session
+        )
+    else:
+        await record_latest_score_change(db, before.get("latest_score"), latest_score, session)
+
+def only_duplicate_keys(error: BulkWriteError) -> bool:
+    write_errors = error.details.get("writeErrors", [])
+    return bool(write_errors) and all(item["code"] == DUPLICATE_KEY for item in write_errors)
+
+async def update_clients_test_stats_batch(
+    tests: List[Dict[str, Any]],
+    db: AsyncIOMotorDatabase,
+    session: Optional[AsyncIOMotorClientSession] = None
+):
+    """Fold a batch of new tests into their clients' statistics with one ordered bulk_write.
+
+    Each client gets the same two updates as update_client_test_stats,
+    with filters that exclude each other: the first applies when the
+    batch's newest test is the client's latest, otherwise the second
+    only adds to the count.
+    """
+    newest: Dict[str, Dict[str, Any]] = {}
+    counts: Dict[str, int] = {}
+    for test in tests:
+        client_id = test["client_id"]
+        counts[client_id] = counts.get(client_id, 0) + 1
+        if client_id not in newest or test["test_date"] >= newest[client_id]["test_date"]:
+            newest[client_id] = test
+    
+    before = {
+        client["id"]: client
+        async for client in db.clients.find(
+            {"id": {"$in": list(newest)}},
+            {"_id": 0, "id": 1, "latest_score": 1, "last_test_date": 1},
+            session=session
+        )
+    }
+    
+    operations = []
+    score_changes = []
+    now = datetime.utcnow()
+    for client_id, test in newest.items():
+        test_date = test["test_date"]
+        operations.append(UpdateOne(
+            {
+                "id": client_id,
+                "$or": [
+                    {"last_test_date": None},
+                    {"last_test_date": {"$lte": test_date}},
+                    {"last_test_date": {"$type": "string"}}
+                ]
+            },
+            {
+                "$inc": {"total_tests": counts[client_id], "version": 1},
+                "$max": {"last_test_date": test_date},
+                "$set": {"latest_score": test["total_score"], "updated_at": now}
+            }
+        ))
+        operations.append(UpdateOne(
+            {"id": client_id, "last_test_date": {"$gt": test_date}},
+            {"$inc": {"total_tests": counts[client_id], "version": 1}, "$set": {"updated_at": now}}
+        ))
+        
+        client = before.get(client_id)
+        if client is not None:
+            last_test_date = client.get("last_test_date")
+            if last_test_date is None or isinstance(last_test_date, str) or last_test_date <= test_date:
+                score_changes.append((client.get("latest_score"), test["total_score"]))
+    
+    await db.clients.bulk_write(operations, ordered=True, session=session)
+    await record_latest_score_changes(db, score_changes, session)
+
+def latest_test_stats_stages():
+    """Pipeline stages reducing one client's tests to count, latest score and latest date"""
+    return [
+        {"$sort": {"test_date": -1}},
+        {
+            "$group": {
+                "_id": None,
+                "total_tests": {"$sum": 1},
+                "latest_score": {"$first": "$total_score"},
+                "last_test_date": {"$first": "$test_date"}
+            }
+        },
+        {"$project": {"_id": 0}}
+    ]
+
+async def recalculate_client_test_stats(client_id: str, db: AsyncIOMotorDatabase):
+    """Recalculate client's test statistics after a test is deleted"""
+    try:
+        # Count and pick the most recent test inside MongoDB; only one
+        # small document comes back however long the history is
+        pipeline = [{"$match": {"client_id": client_id}}] + latest_test_stats_stages()
+        stats = await db.test_results.aggregate(pipeline).to_list(1)
+
+        # No tests left resets the stats
+        stats = stats[0] if stats else {
+            "total_tests": 0,
+            "latest_score": None,
+            "last_test_date": None
+        }
+        before = await db.clients.find_one_and_update(
+            {"id": client_id},
+            {"$set": {**stats, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+            projection={"_id": 0, "latest_score": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is not None:
+            await record_latest_score_change(db, before.get("latest_score"), stats["latest_score"])
+    except Exception as e:
+        logger.error(f"Error recalculating client test stats: {str(e)}")
+
+async def delete_client_cascade(
+    db: AsyncIOMotorDatabase,
+    client_id: str,
+    on_tests_deleted: Optional[Callable[[Optional[AsyncIOMotorClientSession], int], Awaitable[None]]] = None,
+    on_client_deleted: Optional[Callable[[Optional[AsyncIOMotorClientSession], bool], Awaitable[None]]] = None
+) -> bool:
+    """Delete a client's tests in bounded batches, then the client; returns whether the client existed.
+
+    Every batch removes its tests and their analytics counts together, in
+    a transaction where available, and the client goes last, so a failure
+    halfway never leaves orphaned tests and re-running simply continues.
+    The callbacks run inside the same transactions, for job checkpoints.
+    """
+    while True:
+        batch = await db.test_results.find({"client_id": client_id}, {"_id": 0, "id": 1}) \
+            .limit(DELETE_BATCH_SIZE) \
+            .to_list(DELETE_BATCH_SIZE)
+        if not batch:
+            break
+        match = {"id": {"$in": [test["id"] for test in batch]}}
+
+        async def delete_tests(session):
+            increments = await tests_removal_increments(db, match, session)
+            result = await db.test_results.delete_many(match, session=session)
+            await record_tests_removed(db, increments, session)
+            if on_tests_deleted is not None:
+                await on_tests_deleted(session, result.deleted_count)
+
+        await run_in_transaction(db, delete_tests)
+
+    async def delete_record(session):
+        client = await db.clients.find_one_and_delete(
+            {"id": client_id},
+            projection={"_id": 0, "latest_score": 1},
+            session=session
+        )
+        if client is not None:
+            await record_client_removed(db, client.get("latest_score"), session)
+        if on_client_deleted is not None:
+            await on_client_deleted(session, client is not None)
+        return client is not None
+
+    return await run_in_transaction(db, delete_record)
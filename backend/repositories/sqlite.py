@@ -0,0 +1,423 @@
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from repositories.base import After, ClientRepository, Repositories, TestResultRepository
+from repositories.documents import (
+    CLIENT_READ_FIELDS, TEST_RESULT_READ_FIELDS, fold_test_into_stats, naive_utc, read_fields, test_stats
+)
+
+T = TypeVar("T")
+
+# Indexed columns hold copies of document fields; dates as fixed-width
+# naive UTC text, so text order is date order. The documents themselves
+# are stored as JSON.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    created_at TEXT,
+    latest_score INTEGER,
+    last_test_date TEXT,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clients_name_id ON clients (name, id);
+CREATE INDEX IF NOT EXISTS clients_created_at_id ON clients (created_at, id);
+CREATE INDEX IF NOT EXISTS clients_latest_score_id ON clients (latest_score, id);
+CREATE INDEX IF NOT EXISTS clients_last_test_date_id ON clients (last_test_date, id);
+CREATE TABLE IF NOT EXISTS client_search_keys (
+    key TEXT NOT NULL,
+    client_id TEXT NOT NULL,
+    PRIMARY KEY (key, client_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS client_search_keys_client_id ON client_search_keys (client_id);
+CREATE TABLE IF NOT EXISTS test_results (
+    id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    test_date TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS test_results_client_id_test_date ON test_results (client_id, test_date, id);
+CREATE TABLE IF NOT EXISTS test_idempotency_keys (
+    key TEXT PRIMARY KEY,
+    test_id TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS test_idempotency_keys_test_id ON test_idempotency_keys (test_id);
+CREATE TABLE IF NOT EXISTS score_entries (
+    test_id TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    pain INTEGER NOT NULL,
+    score INTEGER,
+    test_date TEXT NOT NULL
+);
+-- Equality, sort, range: (exercise, pain) pin a run already in test_date
+-- order, and score is filtered inside the index as it is walked
+DROP INDEX IF EXISTS score_entries_exercise;
+CREATE INDEX IF NOT EXISTS score_entries_exercise_pain_test_date ON score_entries (exercise, pain, test_date, test_id, score);
+CREATE INDEX IF NOT EXISTS score_entries_test_id ON score_entries (test_id);
+"""
+
+CLIENT_DATE_FIELDS = ("created_at", "last_test_date", "updated_at")
+TEST_RESULT_DATE_FIELDS = ("test_date",)
+
+# Sortable client fields and whether they hold dates
+CLIENT_SORT_COLUMNS = {"name": False, "created_at": True, "latest_score": False, "last_test_date": True}
+
+def _sortable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return naive_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return value
+
+def _dumps(document: Dict[str, Any]) -> str:
+    return orjson.dumps(document).decode()
+
+def _loads(text: str, date_fields: Tuple[str, ...]) -> Dict[str, Any]:
+    document = orjson.loads(text)
+    for field in date_fields:
+        if isinstance(document.get(field), str):
+            document[field] = datetime.fromisoformat(document[field])
+    return document
+
+def _keyset_condition(column: str, descending: bool, after: After, is_date: bool) -> Tuple[str, List[Any]]:
+    """SQL matching rows after (value, id) in (column, id) order; NULLs sort first, as in MongoDB"""
+    value, last_id = after
+    id_op = "<" if descending else ">"
+    if value is None:
+        if descending:
+            return f"({column} IS NULL AND id {id_op} ?)", [last_id]
+        return f"(({column} IS NULL AND id {id_op} ?) OR {column} IS NOT NULL)", [last_id]
+    value = _sortable(value) if is_date else value
+    condition = f"({column} {id_op} ? OR ({column} = ? AND id {id_op} ?)"
+    if descending:
+        condition += f" OR {column} IS NULL"
+    return condition + ")", [value, value, last_id]
+
+def _date_page_condition(
+    date_column: str,
+    id_column: str,
+    from_date: Optional[datetime],
+    to_date: Optional[datetime],
+    after: After
+) -> Tuple[str, List[Any]]:
+    """SQL (starting with AND) bounding a newest-first page by date range and keyset position"""
+    sql, parameters = "", []
+    if from_date:
+        sql += f" AND {date_column} >= ?"
+        parameters.append(_sortable(from_date))
+    if to_date:
+        sql += f" AND {date_column} <= ?"
+        parameters.append(_sortable(to_date))
+    if after is not None:
+        last_date = _sortable(after[0])
+        sql += f" AND ({date_column} < ? OR ({date_column} = ? AND {id_column} < ?))"
+        parameters += [last_date, last_date, after[1]]
+    return sql, parameters
+
+class SQLiteDatabase:
+    """One connection shared by the repositories; calls run one at a time on the threadpool"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _call(self, function: Callable[[sqlite3.Connection], T]) -> T:
+        # The connection context commits, or rolls back on an exception
+        with self._lock, self.connection:
+            return function(self.connection)
+
+    async def run(self, function: Callable[[sqlite3.Connection], T]) -> T:
+        return await run_in_threadpool(self._call, function)
+
+    def close(self):
+        self.connection.close()
+
+def _save_client(connection: sqlite3.Connection, client: Dict[str, Any], insert: bool = False):
+    columns = (
+        client.get("name"),
+        _sortable(client.get("created_at")),
+        client.get("latest_score"),
+        _sortable(client.get("last_test_date")),
+        _dumps({field: value for field, value in client.items() if field != "search_keys"}),
+        client["id"],
+    )
+    if insert:
+        connection.execute(
+            "INSERT INTO clients (name, created_at, latest_score, last_test_date, document, id) VALUES (?, ?, ?, ?, ?, ?)",
+            columns
+        )
+    else:
+        connection.execute(
+            "UPDATE clients SET name = ?, created_at = ?, latest_score = ?, last_test_date = ?, document = ? WHERE id = ?",
+            columns
+        )
+    if "search_keys" in client:
+        connection.execute("DELETE FROM client_search_keys WHERE client_id = ?", (client["id"],))
+        connection.executemany(
+            "INSERT OR IGNORE INTO client_search_keys (key, client_id) VALUES (?, ?)",
+            [(key, client["id"]) for key in client["search_keys"]]
+        )
+
+def _insert_test(connection: sqlite3.Connection, document: Dict[str, Any]):
+    """Store a test with its score entries and idempotency key, and count it on its client"""
+    test_date = _sortable(document["test_date"])
+    connection.execute(
+        "INSERT INTO test_results (id, client_id, test_date, document) VALUES (?, ?, ?, ?)",
+        (
+            document["id"],
+            document["client_id"],
+            test_date,
+            _dumps({field: value for field, value in document.items() if field != "score_entries"}),
+        )
+    )
+    connection.executemany(
+        "INSERT INTO score_entries (test_id, exercise, pain, score, test_date) VALUES (?, ?, ?, ?, ?)",
+        [
+            (document["id"], entry["exercise"], int(entry["pain"]), entry["score"], test_date)
+            for entry in document.get("score_entries") or ()
+        ]
+    )
+    if document.get("idempotency_key") is not None:
+        connection.execute(
+            "INSERT INTO test_idempotency_keys (key, test_id) VALUES (?, ?)",
+            (document["idempotency_key"], document["id"])
+        )
+    client = _load_client(connection, document["client_id"])
+    if client is not None:
+        fold_test_into_stats(client, document["total_score"], document["test_date"])
+        _save_client(connection, client)
+
+def _load_client(connection: sqlite3.Connection, client_id: str) -> Optional[Dict[str, Any]]:
+    row = connection.execute("SELECT document FROM clients WHERE id = ?", (client_id,)).fetchone()
+    return _loads(row[0], CLIENT_DATE_FIELDS) if row else None
+
+def _client_tests(connection: sqlite3.Connection, client_id: str) -> List[Dict[str, Any]]:
+    rows = connection.execute("SELECT document FROM test_results WHERE client_id = ?", (client_id,))
+    return [_loads(row[0], TEST_RESULT_DATE_FIELDS) for row in rows]
+
+def _update_stats(connection: sqlite3.Connection, client: Dict[str, Any], stats: Dict[str, Any]):
+    client.update(stats)
+    client["version"] = client.get("version", 0) + 1
+    client["updated_at"] = datetime.utcnow()
+    _save_client(connection, client)
+
+class SQLiteClientRepository(ClientRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def create(self, document: Dict[str, Any]):
+        await self.database.run(lambda connection: _save_client(connection, document, insert=True))
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, str]:
+        def insert_many(connection):
+            failures = {}
+            for position, document in enumerate(documents):
+                try:
+                    _save_client(connection, document, insert=True)
+                except sqlite3.IntegrityError as e:
+                    failures[position] = str(e)
+            return failures
+
+        return await self.database.run(insert_many)
+
+    async def get(self, client_id: str) -> Optional[Dict[str, Any]]:
+        client = await self.database.run(lambda connection: _load_client(connection, client_id))
+        return read_fields(client, CLIENT_READ_FIELDS) if client is not None else None
+
+    async def page(self, sort: str, descending: bool, q: Optional[str], after: After, limit: int) -> List[Dict[str, Any]]:
+        is_date = CLIENT_SORT_COLUMNS[sort]
+        conditions, parameters = [], []
+        if q:
+            # Prefix range over the search key index
+            conditions.append("id IN (SELECT client_id FROM client_search_keys WHERE key >= ? AND key < ?)")
+            parameters += [q, q + "\U0010ffff"]
+        if after is not None:
+            condition, values = _keyset_condition(sort, descending, after, is_date)
+            conditions.append(condition)
+            parameters += values
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT document FROM clients"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {sort} {direction}, id {direction} LIMIT ?"
+        rows = await self.database.run(lambda connection: connection.execute(sql, parameters + [limit]).fetchall())
+        return [read_fields(_loads(row[0], CLIENT_DATE_FIELDS), CLIENT_READ_FIELDS) for row in rows]
+
+    async def update(self, client_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        def update(connection):
+            client = _load_client(connection, client_id)
+            if client is None:
+                return None
+            client.update(fields)
+            client["version"] = client.get("version", 0) + 1
+            client["updated_at"] = datetime.utcnow()
+            _save_client(connection, client)
+            return client
+
+        client = await self.database.run(update)
+        return read_fields(client, CLIENT_READ_FIELDS) if client is not None else None
+
+    async def delete(self, client_id: str) -> bool:
+        def delete(connection):
+            connection.execute(
+                "DELETE FROM score_entries WHERE test_id IN (SELECT id FROM test_results WHERE client_id = ?)",
+                (client_id,)
+            )
+            connection.execute(
+                "DELETE FROM test_idempotency_keys WHERE test_id IN (SELECT id FROM test_results WHERE client_id = ?)",
+                (client_id,)
+            )
+            connection.execute("DELETE FROM test_results WHERE client_id = ?", (client_id,))
+            connection.execute("DELETE FROM client_search_keys WHERE client_id = ?", (client_id,))
+            return connection.execute("DELETE FROM clients WHERE id = ?", (client_id,)).rowcount > 0
+
+        return await self.database.run(delete)
+
+    async def summary(self, since: datetime) -> Dict[str, Any]:
+        def summary(connection):
+            return {
+                "total_clients": connection.execute("SELECT COUNT(*) FROM clients").fetchone()[0],
+                "total_tests": connection.execute("SELECT COUNT(*) FROM test_results").fetchone()[0],
+                "recently_tested_clients": connection.execute(
+                    "SELECT COUNT(*) FROM clients WHERE last_test_date >= ?", (_sortable(since),)
+                ).fetchone()[0],
+                "latest_scores": dict(connection.execute(
+                    "SELECT latest_score, COUNT(*) FROM clients WHERE latest_score IS NOT NULL GROUP BY latest_score"
+                ).fetchall()),
+            }
+
+        return await self.database.run(summary)
+
+class SQLiteTestResultRepository(TestResultRepository):
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    async def create(self, document: Dict[str, Any]):
+        await self.database.run(lambda connection: _insert_test(connection, document))
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> Dict[int, Optional[str]]:
+        def insert_many(connection):
+            failures: Dict[int, Optional[str]] = {}
+            for position, document in enumerate(documents):
+                if document.get("idempotency_key") is not None and connection.execute(
+                    "SELECT 1 FROM test_idempotency_keys WHERE key = ?", (document["idempotency_key"],)
+                ).fetchone():
+                    failures[position] = None
+                    continue
+                try:
+                    _insert_test(connection, document)
+                except sqlite3.IntegrityError as e:
+                    # A repeated id fails on the first insert, before anything else is written
+                    failures[position] = str(e)
+            return failures
+
+        return await self.database.run(insert_many)
+
+    async def idempotency_ids(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        sql = f"SELECT key, test_id FROM test_idempotency_keys WHERE key IN ({', '.join('?' * len(keys))})"
+        return dict(await self.database.run(lambda connection: connection.execute(sql, keys).fetchall()))
+
+    async def get(self, test_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self.database.run(
+            lambda connection: connection.execute("SELECT document FROM test_results WHERE id = ?", (test_id,)).fetchall()
+        )
+        return read_fields(_loads(rows[0][0], TEST_RESULT_DATE_FIELDS), TEST_RESULT_READ_FIELDS) if rows else None
+
+    async def history(
+        self,
+        client_id: str,
+        fields: Optional[Set[str]],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        rows = await self._page(
+            "SELECT document FROM test_results WHERE client_id = ?", [client_id],
+            "test_date", "id", from_date, to_date, after, limit
+        )
+        return [read_fields(_loads(row[0], TEST_RESULT_DATE_FIELDS), fields or TEST_RESULT_READ_FIELDS) for row in rows]
+
+    async def filter(
+        self,
+        entry: Dict[str, Any],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        # One index-ordered run per pain value, merged by the UNION ALL; only
+        # the final page is sorted again after the join
+        conditions = ""
+        condition_parameters: List[Any] = []
+        score_range = entry.get("score") or {}
+        if "$gte" in score_range:
+            conditions += " AND score >= ?"
+            condition_parameters.append(score_range["$gte"])
+        if "$lte" in score_range:
+            conditions += " AND score <= ?"
+            condition_parameters.append(score_range["$lte"])
+        page_condition, page_parameters = _date_page_condition("test_date", "test_id", from_date, to_date, after)
+        branches, parameters = [], []
+        for pain in ([entry["pain"]] if "pain" in entry else [False, True]):
+            branches.append("SELECT test_date, test_id FROM score_entries WHERE exercise = ? AND pain = ?" + conditions + page_condition)
+            parameters += [entry["exercise"], int(pain)] + condition_parameters + page_parameters
+        sql = (
+            f"SELECT t.document FROM ({' UNION ALL '.join(branches)} ORDER BY test_date DESC, test_id DESC LIMIT ?) e"
+            " JOIN test_results t ON t.id = e.test_id ORDER BY e.test_date DESC, e.test_id DESC"
+        )
+        rows = await self.database.run(lambda connection: connection.execute(sql, parameters + [limit]).fetchall())
+        return [read_fields(_loads(row[0], TEST_RESULT_DATE_FIELDS), TEST_RESULT_READ_FIELDS) for row in rows]
+
+    async def _page(
+        self,
+        sql: str,
+        parameters: List[Any],
+        date_column: str,
+        id_column: str,
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+        after: After,
+        limit: int
+    ) -> List[tuple]:
+        """Newest first by (date, id); test dates are never null"""
+        condition, values = _date_page_condition(date_column, id_column, from_date, to_date, after)
+        sql += condition + f" ORDER BY {date_column} DESC, {id_column} DESC LIMIT ?"
+        return await self.database.run(lambda connection: connection.execute(sql, parameters + values + [limit]).fetchall())
+
+    async def delete(self, test_id: str) -> Optional[Dict[str, Any]]:
+        def delete(connection):
+            row = connection.execute("SELECT document FROM test_results WHERE id = ?", (test_id,)).fetchone()
+            if row is None:
+                return None
+            test = _loads(row[0], TEST_RESULT_DATE_FIELDS)
+            connection.execute("DELETE FROM score_entries WHERE test_id = ?", (test_id,))
+            connection.execute("DELETE FROM test_idempotency_keys WHERE test_id = ?", (test_id,))
+            connection.execute("DELETE FROM test_results WHERE id = ?", (test_id,))
+            client = _load_client(connection, test["client_id"])
+            if client is not None:
+                _update_stats(connection, client, test_stats(_client_tests(connection, test["client_id"])))
+            return test
+
+        test = await self.database.run(delete)
+        return read_fields(test, TEST_RESULT_READ_FIELDS) if test is not None else None
+
+class SQLiteRepositories(Repositories):
+    def __init__(self, database: SQLiteDatabase):
+        super().__init__("sqlite", SQLiteClientRepository(database), SQLiteTestResultRepository(database))
+        self.database = database
+
+    async def close(self):
+        await run_in_threadpool(self.database.close)
+
+def create_sqlite_repositories(path: str) -> Repositories:
+    return SQLiteRepositories(SQLiteDatabase(path))
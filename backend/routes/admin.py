@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
+from indexes import index_report
+from cache import cache_stats, invalidate_prefix
+from routes.test_results import rebuild_all_client_test_stats
+from analytics import rebuild_analytics_summary
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/indexes")
+async def get_index_report(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Report missing, unused and in-progress indexes per collection"""
+    try:
+        return await index_report(db)
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit/miss counters of the response cache in this worker"""
+    return cache_stats()
+
+@router.post("/rebuild-client-stats")
+async def rebuild_client_stats(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Recompute total_tests, latest_score and last_test_date for every client"""
+    try:
+        started = time.perf_counter()
+        clients = await rebuild_all_client_test_stats(db)
+        await invalidate_prefix("client:")
+        # The latest-score histogram is derived from the client stats
+        await rebuild_analytics_summary(db)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Rebuilt test stats for {clients} clients in {elapsed:.2f}s")
+        return {"clients": clients, "seconds": round(elapsed, 3)}
+    except Exception as e:
+        logger.error(f"Error rebuilding client stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/rebuild-analytics")
+async def rebuild_analytics(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Recompute the facility analytics summary from scratch"""
+    try:
+        started = time.perf_counter()
+        await rebuild_analytics_summary(db)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Rebuilt analytics summary in {elapsed:.2f}s")
+        return {"seconds": round(elapsed, 3)}
+    except Exception as e:
+        logger.error(f"Error rebuilding analytics summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, HTTPException, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.analytics import AnalyticsSummary, ClientTrends, CohortTrends, ExercisePainPrevalence, RiskBand
+from models.fms_exercise import FMS_EXERCISES
+from database import get_database
+from analytics import SUMMARY_ID
+from trends import client_trends, cohort_trends, load_history, trend_cache
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# Total scores at or below this are the higher injury-risk band
+RISK_THRESHOLD = 14
+MAX_TOTAL_SCORE = 21
+
+@router.get("/summary", response_model=AnalyticsSummary)
+async def get_analytics_summary(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Facility-wide score distribution, risk band and pain prevalence per exercise"""
+    try:
+        summary = await db.analytics_summary.find_one({"_id": SUMMARY_ID}) or {}
+        tests = summary.get("tests", {})
+        score_histogram = tests.get("score_histogram", {})
+        latest_histogram = summary.get("clients", {}).get("latest_score_histogram", {})
+        exercises = tests.get("exercises", {})
+        
+        score_distribution = {str(score): score_histogram.get(str(score), 0) for score in range(MAX_TOTAL_SCORE + 1)}
+        latest_score_distribution = {str(score): latest_histogram.get(str(score), 0) for score in range(MAX_TOTAL_SCORE + 1)}
+        at_risk = sum(count for score, count in latest_score_distribution.items() if int(score) <= RISK_THRESHOLD)
+        clients_tested = sum(latest_score_distribution.values())
+        
+        pain_prevalence = []
+        for exercise in FMS_EXERCISES:
+            counts = exercises.get(exercise.id, {})
+            tested = counts.get("tested", 0)
+            pain = counts.get("pain", 0)
+            pain_prevalence.append(ExercisePainPrevalence(
+                exercise_id=exercise.id,
+                name=exercise.name,
+                tests=tested,
+                pain=pain,
+                rate=round(pain / tested, 4) if tested else 0.0
+            ))
+        
+        return AnalyticsSummary(
+            total_tests=tests.get("count", 0),
+            score_distribution=score_distribution,
+            clients_tested=clients_tested,
+            latest_score_distribution=latest_score_distribution,
+            risk_band=RiskBand(
+                threshold=RISK_THRESHOLD,
+                at_risk=at_risk,
+                not_at_risk=clients_tested - at_risk
+            ),
+            pain_prevalence=pain_prevalence,
+            rebuilt_at=summary.get("rebuilt_at")
+        )
+    except Exception as e:
+        logger.error(f"Error fetching analytics summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/clients/{client_id}/trends", response_model=ClientTrends)
+async def get_client_trends(
+    client_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Per-exercise score trajectories, change between screens and left/right asymmetry for one client"""
+    try:
+        client = await db.clients.find_one({"id": client_id}, {"_id": 0, "total_tests": 1, "last_test_date": 1})
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
+        
+        signature = (client.get("total_tests", 0), client.get("last_test_date"))
+        trends = trend_cache.get(client_id, signature)
+        if trends is None:
+            history = await load_history(db, {"client_id": client_id})
+            trends = client_trends(client_id, history)
+            trend_cache.put(client_id, signature, trends)
+        
+        return ClientTrends(**trends)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing trends for client {client_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/trends", response_model=CohortTrends)
+async def get_cohort_trends(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """First-to-latest screen change per exercise across all clients with repeat screens"""
+    try:
+        started = time.perf_counter()
+        history = await load_history(db, {})
+        trends = cohort_trends(history)
+        return CohortTrends(**trends, seconds=round(time.perf_counter() - started, 3))
+    except Exception as e:
+        logger.error(f"Error computing cohort trends: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,72 +1,222 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Literal, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.client import Client, ClientCreate, ClientUpdate
+from models.client import Client, ClientCreate, ClientUpdate, ClientsSummary, ScoreBand, build_search_keys
+from models.job import BulkDeleteRequest, Job, JobProgress
 from database import get_database
+from pagination import decode_cursor, next_cursor
+from repositories import Repositories, get_repositories
+from repositories.mongo import delete_client_cascade
+from trends import invalidate_client_trends
+from cache import cached_body, client_key, invalidate_clients, invalidate_prefix, store_body
+from serialization import CLIENT_SHAPE, dumps
+from http_cache import conditional_json, not_modified, pack_entry, page_etag, resource_etag, unpack_entry, validator_headers
+from ingest import ImportReport, ROW_READERS, iter_batches
+from jobs import JOB_HANDLERS, checkpoint_job, create_job, start_job
+from pydantic import ValidationError
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/clients", tags=["clients"])
 
+IMPORT_BATCH_SIZE = 1000
+
+# Clients with longer histories are deleted by a background job
+INLINE_DELETE_MAX_TESTS = 5000
+
+# Dashboard bands of the latest total score: (label, lowest, highest)
+SCORE_BANDS = (("low", 0, 13), ("moderate", 14, 16), ("good", 17, 21))
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
 @router.post("/", response_model=Client)
 async def create_client(
     client_data: ClientCreate,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    repositories: Repositories = Depends(get_repositories)
 ):
     """Create a new client"""
     try:
         client = Client(**client_data.dict())
         client_dict = client.dict()
+        client_dict["search_keys"] = build_search_keys(client.name, client.email)
+        # Conditional GETs validate against version and updated_at
+        client_dict["version"] = 1
+        client_dict["updated_at"] = client.created_at
         
-        # Convert datetime to string for MongoDB
-        client_dict["created_at"] = client_dict["created_at"].isoformat()
-        
-        result = await db.clients.insert_one(client_dict)
-        if result.inserted_id:
-            logger.info(f"Created client: {client.name}")
-            return client
-        else:
-            raise HTTPException(status_code=500, detail="Failed to create client")
+        await repositories.clients.create(client_dict)
+        logger.info("Created client: %s", client.name)
+        return client
     except Exception as e:
         logger.error(f"Error creating client: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/import")
+async def import_clients(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the request Content-Type"),
+    repositories: Repositories = Depends(get_repositories)
+):
+    """Bulk-create clients from a streamed CSV (with header) or NDJSON body, returning a per-row error report"""
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    
+    report = ImportReport()
+    try:
+        rows = ROW_READERS[format](request.stream())
+        async for batch in iter_batches(rows, IMPORT_BATCH_SIZE):
+            await _import_client_batch(batch, report, repositories)
+    except Exception as e:
+        logger.error(f"Error importing clients: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(f"Imported {report.inserted} of {report.rows} clients ({report.failed} failed)")
+    return report.as_dict()
+
+def _validate_client_rows(batch: List, report: ImportReport) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Validate one chunk of rows against ClientCreate, recording failures in the report"""
+    documents: List[Dict[str, Any]] = []
+    row_numbers: List[int] = []
+    for row_number, fields in batch:
+        report.rows += 1
+        if isinstance(fields, Exception):
+            report.add_error(row_number, str(fields))
+            continue
+        try:
+            validated = ClientCreate(**fields)
+        except ValidationError as e:
+            report.add_error(row_number, [
+                {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+                for error in e.errors()
+            ])
+            continue
+        # Already validated as ClientCreate; construct skips a second email check
+        client = Client.model_construct(**validated.dict())
+        client_dict = client.dict()
+        client_dict["search_keys"] = build_search_keys(client.name, client.email)
+        client_dict["version"] = 1
+        client_dict["updated_at"] = client.created_at
+        documents.append(client_dict)
+        row_numbers.append(row_number)
+    return documents, row_numbers
+
+async def _import_client_batch(batch: List, report: ImportReport, repositories: Repositories):
+    """Validate a chunk off the event loop, then write it with a single insert_many"""
+    documents, row_numbers = await run_in_threadpool(_validate_client_rows, batch, report)
+    if not documents:
+        return
+    failures = await repositories.clients.insert_many(documents)
+    report.inserted += len(documents) - len(failures)
+    for position, message in failures.items():
+        report.add_error(row_numbers[position], message)
+
 @router.get("/", response_model=List[Client])
 async def get_clients(
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    q: Optional[str] = Query(None, max_length=100, description="Prefix of a name word or the email"),
+    sort: Literal["name", "created_at", "latest_score", "last_test_date"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    repositories: Repositories = Depends(get_repositories)
 ):
-    """Get all clients"""
+    """Get one page of clients; the token for the next page is sent in the X-Next-Cursor header"""
     try:
-        clients = await db.clients.find().to_list(1000)
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
         
-        # Convert datetime strings back to datetime objects for response
-        for client in clients:
-            client["created_at"] = client["created_at"]
-            if client.get("last_test_date"):
-                client["last_test_date"] = client["last_test_date"]
+        search = q.strip().lower() if q and q.strip() else None
+        clients = await repositories.clients.page(sort, order == "desc", search, after, limit + 1)
         
-        return [Client(**client) for client in clients]
+        page = clients[:limit]
+        for client in page:
+            client.pop("updated_at", None)
+        etag = page_etag("clients", [(client["id"], client.pop("version", None)) for client in page])
+        headers = validator_headers(etag)
+        token = next_cursor(clients, sort, limit)
+        if token:
+            headers["X-Next-Cursor"] = token
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        return ORJSONResponse(CLIENT_SHAPE.documents(page), headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching clients: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/summary", response_model=ClientsSummary)
+async def get_clients_summary(
+    days: int = Query(30, ge=1, le=3650, description="Window for recently tested clients"),
+    repositories: Repositories = Depends(get_repositories)
+):
+    """Dashboard KPIs; on MongoDB from the maintained analytics counters plus one indexed count"""
+    try:
+        summary = await repositories.clients.summary(datetime.utcnow() - timedelta(days=days))
+        latest_scores = summary["latest_scores"]
+        tested_clients = sum(latest_scores.values())
+        score_bands = [
+            ScoreBand(
+                label=label,
+                min_score=low,
+                max_score=high,
+                clients=sum(latest_scores.get(score, 0) for score in range(low, high + 1))
+            )
+            for label, low, high in SCORE_BANDS
+        ]
+        
+        return ClientsSummary(
+            total_clients=summary["total_clients"],
+            total_tests=summary["total_tests"],
+            tested_clients=tested_clients,
+            untested_clients=max(summary["total_clients"] - tested_clients, 0),
+            recent_days=days,
+            recently_tested_clients=summary["recently_tested_clients"],
+            score_bands=score_bands
+        )
+    except Exception as e:
+        logger.error(f"Error fetching clients summary: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{client_id}", response_model=Client)
 async def get_client(
     client_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    repositories: Repositories = Depends(get_repositories)
 ):
-    """Get a specific client by ID"""
+    """Get a specific client by ID, answering 304 when the caller's ETag is current"""
     try:
-        client = await db.clients.find_one({"id": client_id})
-        if not client:
-            raise HTTPException(status_code=404, detail="Client not found")
-        
-        # Convert datetime strings back to datetime objects
-        client["created_at"] = client["created_at"]
-        if client.get("last_test_date"):
-            client["last_test_date"] = client["last_test_date"]
+        key = client_key(client_id)
+        entry = await cached_body(key)
+        if entry is None:
+            client = await repositories.clients.get(client_id)
+            if not client:
+                raise HTTPException(status_code=404, detail="Client not found")
+            etag = resource_etag("client", client_id, client.pop("version", None))
+            last_modified = client.pop("updated_at", None) or client.get("created_at")
+            if not_modified(request, etag, last_modified):
+                return Response(status_code=304, headers=validator_headers(etag, last_modified))
+            body = dumps(CLIENT_SHAPE.document(client))
+            await store_body(key, pack_entry(etag, last_modified, body))
+        else:
+            etag, last_modified, body = unpack_entry(entry)
         
-        return Client(**client)
+        return conditional_json(request, body, etag, last_modified)
     except HTTPException:
         raise
     except Exception as e:
@@ -77,7 +227,7 @@ async def get_client(
 async def update_client(
     client_id: str,
     client_data: ClientUpdate,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    repositories: Repositories = Depends(get_repositories)
 ):
     """Update a client"""
     try:
@@ -87,19 +237,20 @@ async def update_client(
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
         
-        result = await db.clients.update_one(
-            {"id": client_id},
-            {"$set": update_data}
-        )
+        # Keep the search prefixes in sync with name and email
+        if "name" in update_data or "email" in update_data:
+            current = await repositories.clients.get(client_id)
+            if not current:
+                raise HTTPException(status_code=404, detail="Client not found")
+            update_data["search_keys"] = build_search_keys(
+                update_data.get("name", current["name"]),
+                update_data.get("email", current["email"])
+            )
         
-        if result.matched_count == 0:
+        updated_client = await repositories.clients.update(client_id, update_data)
+        if updated_client is None:
             raise HTTPException(status_code=404, detail="Client not found")
-        
-        # Get updated client
-        updated_client = await db.clients.find_one({"id": client_id})
-        updated_client["created_at"] = updated_client["created_at"]
-        if updated_client.get("last_test_date"):
-            updated_client["last_test_date"] = updated_client["last_test_date"]
+        await invalidate_clients(client_id)
         
         return Client(**updated_client)
     except HTTPException:
@@ -111,23 +262,97 @@ async def update_client(
 @router.delete("/{client_id}")
 async def delete_client(
     client_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    repositories: Repositories = Depends(get_repositories)
 ):
-    """Delete a client and all associated test results"""
+    """Delete a client and all associated test results.
+
+    Short histories are deleted within the request; on MongoDB longer ones
+    are handed to a background job and answered with 202 and the job to poll.
+    """
     try:
-        # Delete all test results for this client
-        await db.test_results.delete_many({"client_id": client_id})
+        client = await repositories.clients.get(client_id)
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
         
-        # Delete the client
-        result = await db.clients.delete_one({"id": client_id})
+        db = repositories.db
+        if db is not None and client.get("total_tests", 0) > INLINE_DELETE_MAX_TESTS:
+            job = await create_job(db, Job(type="delete_clients", progress=JobProgress(clients_total=1)), {"client_ids": [client_id]})
+            start_job(db, job.id)
+            logger.info("Queued deletion of client %s as job %s", client_id, job.id)
+            return ORJSONResponse({"message": "Client deletion queued", "job_id": job.id}, status_code=202)
         
-        if result.deleted_count == 0:
+        deleted = await repositories.clients.delete(client_id)
+        await forget_client(client_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Client not found")
         
-        logger.info(f"Deleted client: {client_id}")
+        logger.info("Deleted client: %s", client_id)
         return {"message": "Client deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error deleting client {client_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/bulk-delete", response_model=Job, status_code=202)
+async def bulk_delete_clients(
+    request: BulkDeleteRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Queue the deletion of many clients and their tests; poll GET /api/jobs/{id} for progress"""
+    try:
+        client_ids = list(dict.fromkeys(request.client_ids))
+        job = await create_job(
+            db,
+            Job(type="delete_clients", progress=JobProgress(clients_total=len(client_ids))),
+            {"client_ids": client_ids}
+        )
+        start_job(db, job.id)
+        logger.info("Queued deletion of %d clients as job %s", len(client_ids), job.id)
+        return job
+    except Exception as e:
+        logger.error(f"Error queueing client deletion: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def forget_client(client_id: str):
+    """Drop everything cached about a deleted client"""
+    invalidate_client_trends(client_id)
+    await invalidate_clients(client_id)
+    # Cached tests are keyed by test id alone; client deletes are rare
+    await invalidate_prefix("test_result:")
+
+async def run_delete_clients_job(db: AsyncIOMotorDatabase, job: Dict[str, Any]):
+    """Job handler: delete the job's clients in order, resuming after the last finished one"""
+    client_ids = job["params"]["client_ids"]
+    for index in range(job["progress"]["next_index"], len(client_ids)):
+        async def tests_deleted(session, count):
+            await checkpoint_job(db, job["id"], {"progress.tests_deleted": count}, session=session)
+        
+        async def client_deleted(session, existed, index=index):
+            await checkpoint_job(
+                db,
+                job["id"],
+                {"progress.clients_deleted": int(existed)},
+                {"progress.next_index": index + 1},
+                session=session
+            )
+        
+        await delete_client_cascade(db, client_ids[index], tests_deleted, client_deleted)
+        await forget_client(client_ids[index])
+
+JOB_HANDLERS["delete_clients"] = run_delete_clients_job
+
+async def backfill_client_search_keys(db: AsyncIOMotorDatabase):
+    """Add search_keys to clients created before server-side search existed"""
+    try:
+        updated = 0
+        async for client in db.clients.find({"search_keys": {"$exists": False}}, {"id": 1, "name": 1, "email": 1}):
+            await db.clients.update_one(
+                {"id": client["id"]},
+                {"$set": {"search_keys": build_search_keys(client["name"], client["email"])}}
+            )
+            updated += 1
+        if updated:
+            logger.info(f"Backfilled search keys for {updated} clients")
+    except Exception as e:
+        logger.error(f"Error backfilling client search keys: {str(e)}")
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
+from events import RESYNC, broker
+from serialization import dumps
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Comment lines on an idle stream keep proxies from timing it out
+HEARTBEAT_SECONDS = 15
+
+# Browser reconnect delay after the stream drops
+RECONNECT_MILLISECONDS = 3000
+
+@router.get("")
+async def stream_changes(
+    request: Request,
+    client_id: Optional[str] = Query(None, description="Only changes to this client and its tests (plus deletes, which carry no ids)"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Server-Sent Events for client and test result changes.
+
+    `change` events carry {collection, operation, id, client_id}; a
+    `resync` event means changes were missed (a reconnect, or a subscriber
+    too far behind) and the page should reload its data.
+    """
+    # EventSource sends Last-Event-ID when it reconnects
+    reconnected = request.headers.get("last-event-id") is not None
+    return StreamingResponse(
+        event_stream(db, client_id, reconnected),
+        media_type="text/event-stream",
+        # Disable proxy buffering, which would hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def event_stream(db: AsyncIOMotorDatabase, client_id: Optional[str], reconnected: bool):
+    subscriber = broker.subscribe(db, client_id)
+    try:
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n".encode()
+        # Ids only let the browser report a reconnect; nothing is replayed
+        event_id = 0
+        if reconnected:
+            subscriber.offer(RESYNC)
+        while True:
+            try:
+                name, data = await asyncio.wait_for(subscriber.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            event_id += 1
+            yield f"id: {event_id}\nevent: {name}\ndata: ".encode() + dumps(data) + b"\n\n"
+    finally:
+        broker.unsubscribe(subscriber)
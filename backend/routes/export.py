@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
+from export import EXPORT_MEDIA_TYPES, export_chunks, parquet_available
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/export", tags=["export"])
+
+@router.get("/{collection}")
+async def export_collection(
+    collection: Literal["clients", "test_results"],
+    format: Literal["ndjson", "csv", "parquet"] = Query("ndjson"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Stream every client or test result as NDJSON, CSV or Parquet (flat per-exercise columns)"""
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    async def body():
+        # Headers are already sent once streaming starts, so a failure can only be logged
+        try:
+            async for chunk in export_chunks(db, collection, format):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error exporting {collection}: {str(e)}")
+            raise
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    )
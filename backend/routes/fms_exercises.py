@@ -1,20 +1,58 @@
-from fastapi import APIRouter
-from typing import List
-from models.fms_exercise import FMSExercise, FMS_EXERCISES
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import TypeAdapter
+from typing import Dict, List, NamedTuple
+from models.fms_exercise import FMSExercise, FMS_CATALOG_VERSION, FMS_EXERCISES, FMS_EXERCISES_BY_ID
+from http_cache import etag_matches, strong_etag
+from compression import negotiate, precompress
 
 router = APIRouter(prefix="/fms-exercises", tags=["fms-exercises"])
 
+# The catalog is static, so each body is rendered (and compressed at the
+# highest levels) once at import time, and browsers may keep it for a day
+# before revalidating with If-None-Match
+CACHE_CONTROL = "public, max-age=86400"
+
+class Rendered(NamedTuple):
+    body: bytes
+    etag: str
+    # Content-Encoding -> compressed body
+    encoded: Dict[str, bytes]
+
+def _rendered(body: bytes) -> Rendered:
+    return Rendered(body, strong_etag(body, prefix=f"v{FMS_CATALOG_VERSION}-"), precompress(body))
+
+CATALOG = _rendered(TypeAdapter(List[FMSExercise]).dump_json(FMS_EXERCISES))
+EXERCISES = {exercise_id: _rendered(exercise.model_dump_json().encode()) for exercise_id, exercise in FMS_EXERCISES_BY_ID.items()}
+
 @router.get("/", response_model=List[FMSExercise])
-async def get_fms_exercises():
+async def get_fms_exercises(request: Request):
     """Get all FMS exercises with their scoring criteria"""
-    return FMS_EXERCISES
+    return _cached_json(request, CATALOG)
 
 @router.get("/{exercise_id}", response_model=FMSExercise)
-async def get_fms_exercise(exercise_id: str):
+async def get_fms_exercise(exercise_id: str, request: Request):
     """Get a specific FMS exercise by ID"""
-    for exercise in FMS_EXERCISES:
-        if exercise.id == exercise_id:
-            return exercise
-    
-    from fastapi import HTTPException
-    raise HTTPException(status_code=404, detail="Exercise not found")
\ No newline at end of file
+    rendered = EXERCISES.get(exercise_id)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    return _cached_json(request, rendered)
+
+def _cached_json(request: Request, rendered: Rendered) -> Response:
+    body, etag = rendered.body, rendered.etag
+    headers = {
+        "Cache-Control": CACHE_CONTROL,
+        "X-Catalog-Version": str(FMS_CATALOG_VERSION),
+    }
+    coding = None
+    if rendered.encoded:
+        headers["Vary"] = "Accept-Encoding"
+        coding = negotiate(request.headers.get("accept-encoding", ""), tuple(rendered.encoded))
+        if coding is not None:
+            # Each encoding is its own representation with its own strong ETag
+            body, etag = rendered.encoded[coding], f'{etag[:-1]}-{coding}"'
+    headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
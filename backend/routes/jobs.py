@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Depends
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.job import Job
+from database import get_database
+from jobs import get_job
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job_status(
+    job_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Status and progress of a background job"""
+    try:
+        job = await get_job(db, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from typing import List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.status_check import StatusCheck, StatusCheckCreate
+from database import get_database
+
+# Kept for backward compatibility with the original template endpoints
+router = APIRouter(prefix="/status", tags=["status"])
+
+@router.post("", response_model=StatusCheck)
+async def create_status_check(
+    input: StatusCheckCreate,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    status_dict = input.dict()
+    status_obj = StatusCheck(**status_dict)
+    _ = await db.status_checks.insert_one(status_obj.dict())
+    return status_obj
+
+@router.get("", response_model=List[StatusCheck])
+async def get_status_checks(
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    status_checks = await db.status_checks.find().to_list(1000)
+    return [StatusCheck(**status_check) for status_check in status_checks]
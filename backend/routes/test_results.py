@@ -1,8 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from typing import Any, Dict, List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.test_result import TestResult, TestResultCreate
-from database import get_database
+from models.test_result import (
+    TestResult, TestResultCreate, TestResultView, TEST_RESULT_FIELDS,
+    TestResultBatch, TestResultBatchItem, TestResultBatchItemStatus, TestResultBatchResponse, build_score_entries
+)
+from pagination import decode_cursor, next_cursor
+from repositories import Repositories, get_repositories
+from repositories.mongo import latest_test_stats_stages
+from trends import EXERCISE_IDS, invalidate_client_trends
+from cache import cached_body, invalidate_clients, invalidate_test_results, store_body, test_result_key
+from serialization import TEST_RESULT_SHAPE, TEST_RESULT_VIEW_SHAPE, dumps
+from http_cache import conditional_json, not_modified, page_etag, resource_etag, validator_headers
+from pydantic import ValidationError
+from pymongo import UpdateOne
 from datetime import datetime
 import logging
 
@@ -12,7 +24,7 @@ router = APIRouter(prefix="/test-results", tags=["test-results"])
 @router.post("/", response_model=TestResult)
 async def create_test_result(
     test_data: TestResultCreate,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    repositories: Repositories = Depends(get_repositories)
 ):
     """Create a new test result"""
     try:
@@ -27,70 +39,233 @@ async def create_test_result(
         
         test_dict = test_result.dict()
         
-        # Convert datetime to string for MongoDB
-        test_dict["test_date"] = test_dict["test_date"].isoformat()
-        
         # Convert ExerciseScore objects to dicts
         for exercise_id, exercise_score in test_dict["scores"].items():
             test_dict["scores"][exercise_id] = exercise_score.dict() if hasattr(exercise_score, 'dict') else exercise_score
+        test_dict["score_entries"] = build_score_entries(test_dict["scores"])
         
-        result = await db.test_results.insert_one(test_dict)
-        if result.inserted_id:
-            # Update client's test statistics
-            await update_client_test_stats(test_data.client_id, total_score, test_result.test_date, db)
-            
-            logger.info(f"Created test result for client: {test_data.client_id}")
-            return test_result
-        else:
-            raise HTTPException(status_code=500, detail="Failed to create test result")
+        # Stored together with the client's updated test statistics
+        await repositories.test_results.create(test_dict)
+        invalidate_client_trends(test_data.client_id)
+        await invalidate_clients(test_data.client_id)
+        logger.info("Created test result for client: %s", test_data.client_id)
+        return test_result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating test result: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/client/{client_id}", response_model=List[TestResult])
+@router.post("/batch", response_model=TestResultBatchResponse)
+async def create_test_results_batch(
+    batch: TestResultBatch,
+    repositories: Repositories = Depends(get_repositories)
+):
+    """Sync results scored offline; items whose idempotency_key was already stored are reported as duplicates"""
+    try:
+        statuses: List[Optional[TestResultBatchItemStatus]] = [None] * len(batch.items)
+        documents: Dict[str, Dict[str, Any]] = {}
+        indexes: Dict[str, int] = {}
+        
+        for index, item in enumerate(batch.items):
+            try:
+                test_data = TestResultBatchItem(**item)
+            except ValidationError as e:
+                statuses[index] = TestResultBatchItemStatus(
+                    index=index,
+                    idempotency_key=item.get("idempotency_key") if isinstance(item.get("idempotency_key"), str) else None,
+                    status="invalid",
+                    errors=[
+                        {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+                        for error in e.errors()
+                    ]
+                )
+                continue
+            
+            key = test_data.idempotency_key
+            if key in documents:
+                # Repeated within this batch: the first occurrence wins
+                statuses[index] = TestResultBatchItemStatus(index=index, idempotency_key=key, status="duplicate", id=documents[key]["id"])
+                continue
+            
+            test_result = TestResult(
+                **test_data.dict(exclude={"idempotency_key", "test_date"}),
+                total_score=test_data.calculate_total_score(),
+                **({"test_date": test_data.test_date} if test_data.test_date else {})
+            )
+            test_dict = test_result.dict()
+            test_dict["idempotency_key"] = key
+            test_dict["score_entries"] = build_score_entries(test_dict["scores"])
+            documents[key] = test_dict
+            indexes[key] = index
+        
+        # Keys already stored by an earlier (or concurrent) sync
+        stored = await repositories.test_results.idempotency_ids(list(documents))
+        for key, test_id in stored.items():
+            statuses[indexes[key]] = TestResultBatchItemStatus(index=indexes[key], idempotency_key=key, status="duplicate", id=test_id)
+            del documents[key]
+        
+        pending = list(documents.values())
+        failures = await repositories.test_results.insert_many(pending) if pending else {}
+        # Stored by a concurrent sync between the lookup and the insert
+        duplicates = [pending[position]["idempotency_key"] for position, error in failures.items() if error is None]
+        stored = await repositories.test_results.idempotency_ids(duplicates)
+        inserted = []
+        for position, test in enumerate(pending):
+            key = test["idempotency_key"]
+            if position not in failures:
+                inserted.append(test)
+                statuses[indexes[key]] = TestResultBatchItemStatus(index=indexes[key], idempotency_key=key, status="created", id=test["id"])
+            elif failures[position] is None:
+                statuses[indexes[key]] = TestResultBatchItemStatus(index=indexes[key], idempotency_key=key, status="duplicate", id=stored.get(key))
+            else:
+                statuses[indexes[key]] = TestResultBatchItemStatus(index=indexes[key], idempotency_key=key, status="error", errors=[
+                    {"field": "", "message": failures[position]}
+                ])
+        
+        client_ids = {test["client_id"] for test in inserted}
+        for client_id in client_ids:
+            invalidate_client_trends(client_id)
+        await invalidate_clients(*client_ids)
+        
+        counts = {status: sum(1 for item in statuses if item.status == status) for status in ("created", "duplicate")}
+        logger.info("Synced test batch: %d created, %d duplicates of %d", counts["created"], counts["duplicate"], len(statuses))
+        return TestResultBatchResponse(
+            created=counts["created"],
+            duplicates=counts["duplicate"],
+            failed=len(statuses) - counts["created"] - counts["duplicate"],
+            results=statuses
+        )
+    except Exception as e:
+        logger.error(f"Error syncing test result batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get(
+    "/client/{client_id}",
+    response_model=List[TestResultView],
+    response_model_exclude_unset=True
+)
 async def get_client_test_results(
     client_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    from_date: Optional[datetime] = Query(None, alias="from", description="Earliest test_date (inclusive)"),
+    to_date: Optional[datetime] = Query(None, alias="to", description="Latest test_date (inclusive)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return; id and test_date are always included"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    repositories: Repositories = Depends(get_repositories)
 ):
-    """Get all test results for a specific client"""
+    """Get a page of a client's test results, newest first; the next page token is sent in the X-Next-Cursor header"""
     try:
-        test_results = await db.test_results.find({"client_id": client_id}).to_list(1000)
-        
-        # Convert datetime strings back to datetime objects and scores back to ExerciseScore objects
-        for test in test_results:
-            test["test_date"] = test["test_date"]
-            # Convert score dicts back to ExerciseScore objects
-            for exercise_id, score_data in test["scores"].items():
-                if isinstance(score_data, dict):
-                    from models.test_result import ExerciseScore
-                    test["scores"][exercise_id] = ExerciseScore(**score_data)
-        
-        return [TestResult(**test) for test in test_results]
+        requested = None
+        if fields:
+            requested = {field.strip() for field in fields.split(",") if field.strip()}
+            unknown = requested.difference(TEST_RESULT_FIELDS)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+            requested |= {"id", "test_date"}
+        
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        test_results = await repositories.test_results.history(client_id, requested, from_date, to_date, after, limit + 1)
+        
+        # Tests are never modified in place, so their ids version the page
+        page = test_results[:limit]
+        etag = page_etag("tests", [(test["id"], None) for test in page], variant=",".join(sorted(requested or ())))
+        headers = validator_headers(etag)
+        token = next_cursor(test_results, "test_date", limit)
+        if token:
+            headers["X-Next-Cursor"] = token
+        if not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        return ORJSONResponse(TEST_RESULT_VIEW_SHAPE.documents(page), headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching test results for client {client_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/filter", response_model=List[TestResult])
+async def filter_test_results(
+    exercise: str = Query(..., description="Exercise id, e.g. shoulderMobility"),
+    pain: Optional[bool] = Query(None, description="Only tests with (true) or without (false) pain on the exercise"),
+    min_score: Optional[int] = Query(None, ge=0, le=3),
+    max_score: Optional[int] = Query(None, ge=0, le=3),
+    from_date: Optional[datetime] = Query(None, alias="from", description="Earliest test_date (inclusive)"),
+    to_date: Optional[datetime] = Query(None, alias="to", description="Latest test_date (inclusive)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    repositories: Repositories = Depends(get_repositories)
+):
+    """Tests of any client matching a score or pain condition on one exercise, newest first.
+
+    Answered from the score_entries multikey index; the next page token is
+    sent in the X-Next-Cursor header.
+    """
+    try:
+        if exercise not in EXERCISE_IDS:
+            raise HTTPException(status_code=400, detail=f"Unknown exercise: {exercise}")
+        
+        entry: Dict[str, Any] = {"exercise": exercise}
+        if pain is not None:
+            entry["pain"] = pain
+        score_range = {}
+        if min_score is not None:
+            score_range["$gte"] = min_score
+        if max_score is not None:
+            score_range["$lte"] = max_score
+        if score_range:
+            entry["score"] = score_range
+        
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        test_results = await repositories.test_results.filter(entry, from_date, to_date, after, limit + 1)
+        
+        headers = {}
+        token = next_cursor(test_results, "test_date", limit)
+        if token:
+            headers["X-Next-Cursor"] = token
+        return ORJSONResponse(TEST_RESULT_SHAPE.documents(test_results[:limit]), headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error filtering test results on {exercise}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{test_id}", response_model=TestResult)
 async def get_test_result(
     test_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    repositories: Repositories = Depends(get_repositories)
 ):
-    """Get a specific test result by ID"""
+    """Get a specific test result by ID, answering 304 when the caller's ETag is current"""
     try:
-        test_result = await db.test_results.find_one({"id": test_id})
-        if not test_result:
-            raise HTTPException(status_code=404, detail="Test result not found")
-        
-        # Convert datetime string back to datetime object
-        test_result["test_date"] = test_result["test_date"]
+        # Tests are immutable, so the ETag is known before any lookup; a
+        # deleted test must still 404, hence the cache or database check
+        etag = resource_etag("test", test_id)
+        key = test_result_key(test_id)
+        body = await cached_body(key)
+        if body is None:
+            test_result = await repositories.test_results.get(test_id)
+            if not test_result:
+                raise HTTPException(status_code=404, detail="Test result not found")
+            if not_modified(request, etag):
+                return Response(status_code=304, headers=validator_headers(etag))
+            body = dumps(TEST_RESULT_SHAPE.document(test_result))
+            await store_body(key, body)
         
-        # Convert score dicts back to ExerciseScore objects
-        for exercise_id, score_data in test_result["scores"].items():
-            if isinstance(score_data, dict):
-                from models.test_result import ExerciseScore
-                test_result["scores"][exercise_id] = ExerciseScore(**score_data)
-        
-        return TestResult(**test_result)
+        return conditional_json(request, body, etag)
     except HTTPException:
         raise
     except Exception as e:
@@ -100,25 +275,20 @@ async def get_test_result(
 @router.delete("/{test_id}")
 async def delete_test_result(
     test_id: str,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    repositories: Repositories = Depends(get_repositories)
 ):
     """Delete a test result"""
     try:
-        # Get test result first to get client_id
-        test_result = await db.test_results.find_one({"id": test_id})
+        # Also recalculates the client's test statistics
+        test_result = await repositories.test_results.delete(test_id)
         if not test_result:
             raise HTTPException(status_code=404, detail="Test result not found")
         
-        # Delete the test result
-        result = await db.test_results.delete_one({"id": test_id})
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Test result not found")
-        
-        # Update client's test statistics
-        await recalculate_client_test_stats(test_result["client_id"], db)
+        invalidate_client_trends(test_result["client_id"])
+        await invalidate_test_results(test_id)
+        await invalidate_clients(test_result["client_id"])
         
-        logger.info(f"Deleted test result: {test_id}")
+        logger.info("Deleted test result: %s", test_id)
         return {"message": "Test result deleted successfully"}
     except HTTPException:
         raise
@@ -126,61 +296,72 @@ async def delete_test_result(
         logger.error(f"Error deleting test result {test_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def update_client_test_stats(client_id: str, latest_score: int, test_date: datetime, db: AsyncIOMotorDatabase):
-    """Update client's test statistics after a new test"""
+async def backfill_test_score_entries(db: AsyncIOMotorDatabase, batch_size: int = 1000):
+    """Add score_entries to tests stored before the per-exercise filter existed"""
     try:
-        # Get current client
-        client = await db.clients.find_one({"id": client_id})
-        if not client:
-            return
-        
-        # Update statistics
-        total_tests = client.get("total_tests", 0) + 1
-        
-        await db.clients.update_one(
-            {"id": client_id},
-            {
-                "$set": {
-                    "total_tests": total_tests,
-                    "latest_score": latest_score,
-                    "last_test_date": test_date.isoformat()
-                }
-            }
-        )
+        updated = 0
+        operations = []
+        async for test in db.test_results.find({"score_entries": {"$exists": False}}, {"_id": 1, "scores": 1}):
+            operations.append(UpdateOne(
+                {"_id": test["_id"]},
+                {"$set": {"score_entries": build_score_entries(test.get("scores") or {})}}
+            ))
+            if len(operations) >= batch_size:
+                await db.test_results.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await db.test_results.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        if updated:
+            logger.info(f"Backfilled score entries for {updated} test results")
     except Exception as e:
-        logger.error(f"Error updating client test stats: {str(e)}")
+        logger.error(f"Error backfilling test score entries: {str(e)}")
 
-async def recalculate_client_test_stats(client_id: str, db: AsyncIOMotorDatabase):
-    """Recalculate client's test statistics after a test is deleted"""
-    try:
-        # Get all remaining test results for this client
-        test_results = await db.test_results.find({"client_id": client_id}).to_list(1000)
-        
-        if not test_results:
-            # No tests left, reset stats
-            await db.clients.update_one(
-                {"id": client_id},
-                {
-                    "$set": {
-                        "total_tests": 0,
-                        "latest_score": None,
-                        "last_test_date": None
-                    }
-                }
-            )
-        else:
-            # Find the most recent test
-            most_recent_test = max(test_results, key=lambda x: x["test_date"])
-            
-            await db.clients.update_one(
-                {"id": client_id},
-                {
+async def rebuild_all_client_test_stats(db: AsyncIOMotorDatabase) -> int:
+    """Recompute the statistics of every client from test_results in one server-side pass.
+
+    Each client looks up its own tests through the (client_id, test_date)
+    index and the result is merged back onto the client by id, which also
+    resets clients whose tests are all gone (needs MongoDB 5.0+ for the
+    correlated $lookup pipeline). Returns the number of clients.
+    """
+    pipeline = [
+        {"$project": {"_id": 0, "id": 1}},
+        {
+            "$lookup": {
+                "from": "test_results",
+                "localField": "id",
+                "foreignField": "client_id",
+                "pipeline": latest_test_stats_stages(),
+                "as": "stats"
+            }
+        },
+        {
+            "$project": {
+                "id": 1,
+                "total_tests": {"$ifNull": [{"$arrayElemAt": ["$stats.total_tests", 0]}, 0]},
+                "latest_score": {"$ifNull": [{"$arrayElemAt": ["$stats.latest_score", 0]}, None]},
+                "last_test_date": {"$ifNull": [{"$arrayElemAt": ["$stats.last_test_date", 0]}, None]}
+            }
+        },
+        {
+            "$merge": {
+                "into": "clients",
+                "on": "id",
+                # Bump version and updated_at too, so cached copies revalidate
+                "whenMatched": [{
                     "$set": {
-                        "total_tests": len(test_results),
-                        "latest_score": most_recent_test["total_score"],
-                        "last_test_date": most_recent_test["test_date"]
+                        "total_tests": "$$new.total_tests",
+                        "latest_score": "$$new.latest_score",
+                        "last_test_date": "$$new.last_test_date",
+                        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                        "updated_at": "$$NOW"
                     }
-                }
-            )
-    except Exception as e:
-        logger.error(f"Error recalculating client test stats: {str(e)}")
\ No newline at end of file
+                }],
+                "whenNotMatched": "discard"
+            }
+        }
+    ]
+    await db.clients.aggregate(pipeline).to_list(None)
+    return await db.clients.count_documents({})
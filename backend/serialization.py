@@ -0,0 +1,61 @@
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import orjson
+from pydantic import BaseModel
+from models.client import Client
+from models.test_result import ExerciseScore, TestResult, TestResultView
+
+def read_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Inclusion projection fetching exactly the fields a model declares"""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+def field_defaults(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Plain (non-factory) defaults of a model's optional fields"""
+    return {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+class TrustedShape:
+    """Turns documents this API wrote itself into response dicts without re-validating them.
+
+    Stored documents were validated on the way in, so reads only fill the
+    defaults of fields added since (e.g. left/right on older scores) and
+    hand the dicts to orjson. Legacy ISO date strings pass through as the
+    strings they are until the native-date migration has run.
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        nested: Optional[Dict[str, Type[BaseModel]]] = None,
+        fill_defaults: bool = True
+    ):
+        self.projection = read_projection(model)
+        self.defaults = field_defaults(model) if fill_defaults else {}
+        # Dict-of-model fields, filled item by item
+        self.nested = {field: field_defaults(item_model) for field, item_model in (nested or {}).items()}
+
+    def document(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill missing defaults in place; documents come fresh from the driver"""
+        for name, default in self.defaults.items():
+            if name not in document:
+                document[name] = default
+        for field, defaults in self.nested.items():
+            for item in (document.get(field) or {}).values():
+                for name, default in defaults.items():
+                    if name not in item:
+                        item[name] = default
+        return document
+
+    def documents(self, documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.document(document) for document in documents]
+
+CLIENT_SHAPE = TrustedShape(Client)
+TEST_RESULT_SHAPE = TrustedShape(TestResult, nested={"scores": ExerciseScore})
+# History pages return only the requested fields (response_model_exclude_unset)
+TEST_RESULT_VIEW_SHAPE = TrustedShape(TestResultView, nested={"scores": ExerciseScore}, fill_defaults=False)
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value)
@@ -1,94 +1,107 @@
 from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
 import os
 import logging
-from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List
-import uuid
-from datetime import datetime
 
 # Import routes
-from routes.clients import router as clients_router
-from routes.test_results import router as test_results_router
+from routes.clients import router as clients_router, backfill_client_search_keys
+from routes.test_results import router as test_results_router, backfill_test_score_entries
 from routes.fms_exercises import router as fms_exercises_router
-from database import close_database
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from routes.analytics import router as analytics_router
+from routes.admin import router as admin_router
+from routes.export import router as export_router
+from routes.jobs import router as jobs_router
+from routes.status import router as status_router
+from routes.events import router as events_router
+from database import connect_database, close_database
+from repositories import close_repositories, configure_repositories, storage_backend
+from indexes import ensure_indexes
+from analytics import ensure_analytics_summary
+from cache import configure_cache
+from jobs import resume_jobs, stop_jobs
+from events import stop_events
+from metrics import REGISTRY, MetricsMiddleware
+from compression import CompressionMiddleware
+from logging_setup import RequestIdMiddleware, configure_logging
+
+# JSON logs written from a background thread
+configure_logging()
+logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = None
+    if storage_backend() == "mongodb":
+        # The app owns the single MongoDB connection pool for its whole lifetime
+        db = await connect_database()
+    configure_cache()
+    configure_repositories(db)
+    logger.info("FMS Assessment API started")
+    if db is not None:
+        logger.info(f"Database connected: {os.environ['DB_NAME']}")
+        await ensure_indexes(db)
+        await backfill_client_search_keys(db)
+        await backfill_test_score_entries(db)
+        await ensure_analytics_summary(db)
+        await resume_jobs(db)
+    yield
+    await stop_events()
+    await stop_jobs()
+    await close_repositories()
+    await close_database()
+    logger.info("FMS Assessment API shut down")
 
 # Create the main app without a prefix
 app = FastAPI(
     title="FMS Assessment API",
     description="API for Functional Movement Screen assessments and client management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Define Models (keeping original ones for backward compatibility)
-class StatusCheck(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    client_name: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-
-class StatusCheckCreate(BaseModel):
-    client_name: str
-
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "FMS Assessment API is running"}
 
-@api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
-    status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
-    return status_obj
-
-@api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
-
 # Include all routers
+api_router.include_router(status_router)
 api_router.include_router(clients_router)
 api_router.include_router(test_results_router)
 api_router.include_router(fms_exercises_router)
+api_router.include_router(analytics_router)
+api_router.include_router(admin_router)
+api_router.include_router(export_router)
+api_router.include_router(jobs_router)
+api_router.include_router(events_router)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Scraped by Prometheus; counts are per worker process
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# Innermost, so CORS headers and request timings cover compressed responses
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "X-Request-ID"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Added last so request timings include CORS handling
+app.add_middleware(MetricsMiddleware, prefix="/api")
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("FMS Assessment API started")
-    logger.info(f"Database connected: {os.environ['DB_NAME']}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    await close_database()
-    logger.info("FMS Assessment API shut down")
\ No newline at end of file
+# Outermost, so every log line of a request carries its id
+app.add_middleware(RequestIdMiddleware)
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.fms_exercise import FMS_EXERCISES
+import numpy as np
+
+# Column order of every score matrix: one column per FMS exercise
+EXERCISE_IDS = [exercise.id for exercise in FMS_EXERCISES]
+
+SECONDS_PER_30_DAYS = 30 * 24 * 3600.0
+
+def _score_projection() -> Dict[str, Any]:
+    """$project stage turning the scores dict into fixed-order arrays (null where missing)"""
+    return {
+        "_id": 0,
+        "client_id": 1,
+        "test_date": 1,
+        "total_score": 1,
+        "score": [f"$scores.{exercise_id}.score" for exercise_id in EXERCISE_IDS],
+        "left": [f"$scores.{exercise_id}.left" for exercise_id in EXERCISE_IDS],
+        "right": [f"$scores.{exercise_id}.right" for exercise_id in EXERCISE_IDS],
+    }
+
+class ScoreHistory:
+    """Test results as column arrays: dates (n,), totals (n,), scores/left/right (n, exercises) with NaN gaps"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.client_ids = np.array([row.get("client_id") for row in rows], dtype=object)
+        # Legacy ISO strings and BSON dates both parse to datetime64
+        self.dates = np.array([row["test_date"] for row in rows], dtype="datetime64[ms]")
+        self.totals = np.array([row["total_score"] for row in rows], dtype=float)
+        self.scores = np.array([row["score"] for row in rows], dtype=float).reshape(len(rows), len(EXERCISE_IDS))
+        self.left = np.array([row["left"] for row in rows], dtype=float).reshape(len(rows), len(EXERCISE_IDS))
+        self.right = np.array([row["right"] for row in rows], dtype=float).reshape(len(rows), len(EXERCISE_IDS))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def asymmetry(self) -> np.ndarray:
+        """(n, exercises) bool: both sides recorded and scored differently"""
+        return ~np.isnan(self.left) & ~np.isnan(self.right) & (self.left != self.right)
+
+async def load_history(db: AsyncIOMotorDatabase, match: Dict[str, Any], batch_size: int = 5000) -> ScoreHistory:
+    """Load the tests matching `match`, projected to flat score arrays inside MongoDB"""
+    cursor = db.test_results.aggregate(
+        [{"$match": match}, {"$project": _score_projection()}],
+        batchSize=batch_size
+    )
+    return ScoreHistory(await cursor.to_list(None))
+
+def _nullable(values: np.ndarray, digits: Optional[int] = None) -> List[Optional[float]]:
+    if digits is not None:
+        values = np.round(values, digits)
+    return [None if np.isnan(value) else value.item() for value in values]
+
+def _slope_per_30_days(seconds: np.ndarray, values: np.ndarray) -> Optional[float]:
+    """Least-squares slope of values over time, in points per 30 days"""
+    if len(values) < 2:
+        return None
+    x = seconds - seconds.mean()
+    denominator = (x * x).sum()
+    if denominator == 0:
+        return None
+    return round(float((x * (values - values.mean())).sum() / denominator * SECONDS_PER_30_DAYS), 4)
+
+def client_trends(client_id: str, history: ScoreHistory) -> Dict[str, Any]:
+    """Trajectories, screen-to-screen change and asymmetry for one client's history"""
+    order = np.argsort(history.dates, kind="stable")
+    dates = history.dates[order]
+    totals = history.totals[order]
+    scores = history.scores[order]
+    asymmetry = history.asymmetry()[order]
+
+    seconds = (dates - dates[0]).astype(float) / 1000.0 if len(dates) else np.zeros(0)
+    changes = np.diff(scores, axis=0)
+    gaps = np.diff(seconds)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.where(gaps[:, None] > 0, changes / gaps[:, None] * SECONDS_PER_30_DAYS, np.nan)
+
+    exercises = []
+    for column, exercise_id in enumerate(EXERCISE_IDS):
+        recorded = scores[:, column][~np.isnan(scores[:, column])]
+        exercises.append({
+            "exercise_id": exercise_id,
+            "scores": _nullable(scores[:, column]),
+            "changes": _nullable(changes[:, column]),
+            "rate_per_30_days": _nullable(rates[:, column], 4),
+            "asymmetry": asymmetry[:, column].tolist(),
+            "net_change": float(recorded[-1] - recorded[0]) if len(recorded) >= 2 else None,
+        })
+
+    return {
+        "client_id": client_id,
+        "test_dates": dates.astype("datetime64[ms]").tolist(),
+        "total_scores": [int(total) for total in totals],
+        "total_score_slope_per_30_days": _slope_per_30_days(seconds, totals),
+        "exercises": exercises,
+        "asymmetric_exercises": [
+            exercise_id for column, exercise_id in enumerate(EXERCISE_IDS)
+            if len(asymmetry) and asymmetry[-1, column]
+        ],
+    }
+
+def cohort_trends(history: ScoreHistory) -> Dict[str, Any]:
+    """First-to-latest screen change per exercise across every client with two or more tests"""
+    exercises_count = len(EXERCISE_IDS)
+    if len(history) == 0:
+        empty = np.zeros(0, dtype=int)
+        first = last = empty
+    else:
+        _, codes = np.unique(history.client_ids.astype(str), return_inverse=True)
+        order = np.lexsort((history.dates, codes))
+        codes = codes[order]
+        # Boundaries between clients in the sorted order
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)] - 1
+        repeat = ends > starts
+        first = order[starts[repeat]]
+        last = order[ends[repeat]]
+
+    changes = history.scores[last] - history.scores[first]
+    asymmetry_latest = history.asymmetry()[last]
+    sided_latest = ~np.isnan(history.left[last]) & ~np.isnan(history.right[last])
+    total_changes = history.totals[last] - history.totals[first]
+
+    with np.errstate(invalid="ignore"):
+        valid = ~np.isnan(changes)
+        counted = valid.sum(axis=0)
+        mean_change = np.where(counted > 0, np.nansum(changes, axis=0) / np.maximum(counted, 1), np.nan)
+        improved = (changes > 0).sum(axis=0)
+        declined = (changes < 0).sum(axis=0)
+        sided = sided_latest.sum(axis=0)
+        asymmetric = asymmetry_latest.sum(axis=0)
+
+    exercises = []
+    for column in range(exercises_count):
+        exercises.append({
+            "exercise_id": EXERCISE_IDS[column],
+            "clients": int(counted[column]),
+            "mean_change": None if np.isnan(mean_change[column]) else round(float(mean_change[column]), 4),
+            "improved": int(improved[column]),
+            "declined": int(declined[column]),
+            "unchanged": int(counted[column] - improved[column] - declined[column]),
+            "asymmetry_rate": round(float(asymmetric[column] / sided[column]), 4) if sided[column] else 0.0,
+        })
+
+    return {
+        "clients": int(len(last)),
+        "tests": len(history),
+        "mean_total_change": round(float(total_changes.mean()), 4) if len(last) else None,
+        "exercises": exercises,
+    }
+
+class TrendCache:
+    """Small LRU of computed client trends.
+
+    Entries remember the client's total_tests and last_test_date, so a
+    test written through another worker is noticed on the next read;
+    writes through this worker also invalidate the entry directly.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, client_id: str, signature: tuple) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(client_id)
+        if entry is None or entry[0] != signature:
+            return None
+        self._entries.move_to_end(client_id)
+        return entry[1]
+
+    def put(self, client_id: str, signature: tuple, trends: Dict[str, Any]):
+        self._entries[client_id] = (signature, trends)
+        self._entries.move_to_end(client_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, client_id: str):
+        self._entries.pop(client_id, None)
+
+trend_cache = TrendCache()
+
+def invalidate_client_trends(client_id: str):
+    """Drop cached trends after a test for this client is written or deleted"""
+    trend_cache.invalidate(client_id)
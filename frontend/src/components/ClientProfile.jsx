@@ -4,15 +4,20 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./ui/
 import { Button } from "./ui/button";
 import { Badge } from "./ui/badge";
 import { ArrowLeft, Calendar, Mail, Phone, Briefcase, User, Plus, TrendingUp, Loader2 } from "lucide-react";
-import { clientAPI, testResultAPI } from "../services/api";
+import { clientAPI, eventsAPI, testResultAPI } from "../services/api";
 import { useToast } from "../hooks/use-toast";
 
+// Live updates arrive in bursts (a test also updates its client); reload once
+const LIVE_UPDATE_DELAY_MS = 500;
+
 const ClientProfile = () => {
   const { clientId } = useParams();
   const navigate = useNavigate();
   const { toast } = useToast();
   const [client, setClient] = useState(null);
   const [testResults, setTestResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -20,19 +25,36 @@ const ClientProfile = () => {
     fetchClientData();
   }, [clientId]);
 
-  const fetchClientData = async () => {
+  useEffect(() => {
+    // New tests (and edits or deletes) show up without a manual reload
+    let timer = null;
+    const unsubscribe = eventsAPI.subscribe(() => {
+      clearTimeout(timer);
+      timer = setTimeout(() => fetchClientData({ quiet: true }), LIVE_UPDATE_DELAY_MS);
+    }, { clientId });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
+  }, [clientId]);
+
+  const fetchClientData = async ({ quiet = false } = {}) => {
     try {
-      setLoading(true);
+      // Live updates refresh in place, without the loading screen
+      if (!quiet) {
+        setLoading(true);
+      }
       setError(null);
       
       // Fetch client and test results in parallel
-      const [clientData, testResultsData] = await Promise.all([
+      const [clientData, testResultsPage] = await Promise.all([
         clientAPI.getClient(clientId),
-        testResultAPI.getClientTestResults(clientId)
+        testResultAPI.getClientTestResults(clientId, { limit: 20 })
       ]);
       
       setClient(clientData);
-      setTestResults(testResultsData);
+      setTestResults(testResultsPage.tests);
+      setNextCursor(testResultsPage.nextCursor);
     } catch (error) {
       console.error('Error fetching client data:', error);
       setError('Failed to load client data. Please try again.');
@@ -46,6 +68,24 @@ const ClientProfile = () => {
     }
   };
 
+  const loadMoreTests = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await testResultAPI.getClientTestResults(clientId, { limit: 20, cursor: nextCursor });
+      setTestResults([...testResults, ...page.tests]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error fetching more test results:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load more test results. Please try again.",
+        variant: "destructive",
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString();
   };
@@ -279,6 +319,19 @@ const ClientProfile = () => {
                         </CardContent>
                       </Card>
                     ))}
+                    {nextCursor && (
+                      <div className="flex justify-center">
+                        <Button
+                          variant="outline"
+                          onClick={loadMoreTests}
+                          disabled={loadingMore}
+                          className="bg-white/50 border-gray-300 hover:bg-white/80"
+                        >
+                          {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                          Load Older Tests
+                        </Button>
+                      </div>
+                    )}
                   </div>
                 )}
               </CardContent>
@@ -1,33 +1,74 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "./ui/card";
 import { Button } from "./ui/button";
 import { Input } from "./ui/input";
 import { Badge } from "./ui/badge";
 import { useNavigate } from "react-router-dom";
 import { Plus, Search, Users, TrendingUp, Calendar, Loader2 } from "lucide-react";
-import { clientAPI } from "../services/api";
+import { clientAPI, eventsAPI } from "../services/api";
 import AddClientModal from "./AddClientModal";
 import { useToast } from "../hooks/use-toast";
 
+// Window of the "tested recently" KPI
+const RECENT_DAYS = 30;
+
+// Live updates arrive in bursts (a test also updates its client); apply them together
+const LIVE_UPDATE_DELAY_MS = 500;
+
 const Dashboard = () => {
   const [searchTerm, setSearchTerm] = useState("");
   const [showAddModal, setShowAddModal] = useState(false);
   const [clients, setClients] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const navigate = useNavigate();
   const { toast } = useToast();
+  // Latest handler for the live update stream, which outlives re-renders
+  const liveUpdateRef = useRef(null);
+
+  useEffect(() => {
+    fetchSummary();
+  }, []);
 
   useEffect(() => {
-    fetchClients();
+    let timer = null;
+    let reloadList = false;
+    const changedClients = new Set();
+    const unsubscribe = eventsAPI.subscribe((event) => {
+      if (event.type === 'change' && event.collection === 'clients' && event.operation === 'update') {
+        changedClients.add(event.id);
+      } else if (event.type === 'resync' || event.collection === 'clients') {
+        // New or deleted clients change which clients the first page holds
+        reloadList = true;
+      }
+      clearTimeout(timer);
+      timer = setTimeout(() => {
+        liveUpdateRef.current(reloadList, [...changedClients]);
+        reloadList = false;
+        changedClients.clear();
+      }, LIVE_UPDATE_DELAY_MS);
+    });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
   }, []);
 
+  useEffect(() => {
+    // Debounce so typing a name doesn't fire a request per keystroke
+    const timer = setTimeout(() => fetchClients(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const fetchClients = async () => {
     try {
-      setLoading(true);
       setError(null);
-      const clientsData = await clientAPI.getClients();
-      setClients(clientsData);
+      const page = await clientAPI.getClients({ q: searchTerm || undefined });
+      setClients(page.clients);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error fetching clients:', error);
       setError('Failed to load clients. Please try again.');
@@ -41,16 +82,56 @@ const Dashboard = () => {
     }
   };
 
-  const filteredClients = clients.filter(client =>
-    client.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    client.email.toLowerCase().includes(searchTerm.toLowerCase())
-  );
+  const fetchSummary = async () => {
+    try {
+      setSummary(await clientAPI.getClientsSummary(RECENT_DAYS));
+    } catch (error) {
+      // The client list still works without the KPI cards
+      console.error('Error fetching clients summary:', error);
+    }
+  };
+
+  liveUpdateRef.current = async (reloadList, changedClientIds) => {
+    fetchSummary();
+    if (reloadList) {
+      fetchClients();
+      return;
+    }
+    // Refresh only the listed clients that changed, keeping loaded pages
+    const listed = changedClientIds.filter((id) => clients.some((client) => client.id === id));
+    try {
+      const updated = await Promise.all(listed.map((id) => clientAPI.getClient(id)));
+      const byId = new Map(updated.map((client) => [client.id, client]));
+      setClients((current) => current.map((client) => byId.get(client.id) || client));
+    } catch (error) {
+      console.error('Error refreshing updated clients:', error);
+    }
+  };
+
+  const loadMoreClients = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await clientAPI.getClients({ q: searchTerm || undefined, cursor: nextCursor });
+      setClients([...clients, ...page.clients]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error fetching more clients:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load more clients. Please try again.",
+        variant: "destructive",
+      });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const addClient = async (newClientData) => {
     try {
       const newClient = await clientAPI.createClient(newClientData);
       setClients([...clients, newClient]);
       setShowAddModal(false);
+      fetchSummary();
       toast({
         title: "Success",
         description: `${newClient.name} has been added successfully.`,
@@ -76,13 +157,7 @@ const Dashboard = () => {
     return "bg-red-100 text-red-800";
   };
 
-  const calculateTotalTests = () => {
-    return clients.reduce((sum, client) => sum + (client.total_tests || 0), 0);
-  };
-
-  const getRecentTestsCount = () => {
-    return clients.filter(client => client.last_test_date).length;
-  };
+  const formatStat = (value) => (summary ? value : "-");
 
   if (loading) {
     return (
@@ -131,7 +206,7 @@ const Dashboard = () => {
               <Users className="h-4 w-4 text-blue-600" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold text-blue-600">{clients.length}</div>
+              <div className="text-2xl font-bold text-blue-600">{formatStat(summary?.total_clients)}</div>
             </CardContent>
           </Card>
           <Card className="bg-white/70 backdrop-blur-sm border-0 shadow-lg">
@@ -141,19 +216,24 @@ const Dashboard = () => {
             </CardHeader>
             <CardContent>
               <div className="text-2xl font-bold text-green-600">
-                {calculateTotalTests()}
+                {formatStat(summary?.total_tests)}
               </div>
             </CardContent>
           </Card>
           <Card className="bg-white/70 backdrop-blur-sm border-0 shadow-lg">
             <CardHeader className="flex flex-row items-center justify-between space-y-0 pb-2">
-              <CardTitle className="text-sm font-medium">Recent Tests</CardTitle>
+              <CardTitle className="text-sm font-medium">Tested in {RECENT_DAYS} Days</CardTitle>
               <Calendar className="h-4 w-4 text-orange-600" />
             </CardHeader>
             <CardContent>
               <div className="text-2xl font-bold text-orange-600">
-                {getRecentTestsCount()}
+                {formatStat(summary?.recently_tested_clients)}
               </div>
+              {summary && (
+                <p className="text-xs text-gray-600 mt-1">
+                  {summary.score_bands.map((band) => `${band.clients} ${band.label}`).join(" · ")}
+                </p>
+              )}
             </CardContent>
           </Card>
         </div>
@@ -180,7 +260,7 @@ const Dashboard = () => {
 
         {/* Client List */}
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-          {filteredClients.map((client) => (
+          {clients.map((client) => (
             <Card key={client.id} className="bg-white/70 backdrop-blur-sm border-0 shadow-lg hover:shadow-xl transition-all duration-300 cursor-pointer group">
               <CardHeader>
                 <div className="flex justify-between items-start">
@@ -236,7 +316,21 @@ const Dashboard = () => {
           ))}
         </div>
 
-        {filteredClients.length === 0 && !loading && (
+        {nextCursor && (
+          <div className="flex justify-center mt-6">
+            <Button
+              variant="outline"
+              onClick={loadMoreClients}
+              disabled={loadingMore}
+              className="bg-white/70 border-gray-300 hover:bg-white/80 shadow-lg"
+            >
+              {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Load More
+            </Button>
+          </div>
+        )}
+
+        {clients.length === 0 && !loading && (
           <Card className="bg-white/70 backdrop-blur-sm border-0 shadow-lg">
             <CardContent className="text-center py-8">
               <p className="text-gray-500">
@@ -26,18 +26,18 @@ const TestResults = () => {
       setLoading(true);
       setError(null);
       
-      // Fetch test result and exercises data
-      const [testData, exercisesData] = await Promise.all([
-        testResultAPI.getTestResult(testId),
+      // The client is requested as soon as the test names it, while the
+      // exercise catalog is still loading
+      const testRequest = testResultAPI.getTestResult(testId);
+      const [testData, clientData, exercisesData] = await Promise.all([
+        testRequest,
+        testRequest.then((test) => clientAPI.getClient(test.client_id)),
         fmsExercisesAPI.getExercises()
       ]);
       
       setTestResult(testData);
-      setFmsExercises(exercisesData);
-      
-      // Fetch client data
-      const clientData = await clientAPI.getClient(testData.client_id);
       setClient(clientData);
+      setFmsExercises(exercisesData);
       
     } catch (error) {
       console.error('Error fetching test data:', error);
@@ -10,12 +10,37 @@ const apiClient = axios.create({
   headers: {
     'Content-Type': 'application/json',
   },
+  // 304 Not Modified is answered from the conditional cache below
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
 });
 
+// Recent GET responses by full URL, revalidated with If-None-Match so an
+// unchanged resource comes back as an empty 304
+const conditionalCache = new Map();
+const CONDITIONAL_CACHE_LIMIT = 200;
+
+const rememberResponse = (key, response) => {
+  conditionalCache.delete(key);
+  conditionalCache.set(key, {
+    etag: response.headers.etag,
+    data: response.data,
+    headers: response.headers,
+  });
+  if (conditionalCache.size > CONDITIONAL_CACHE_LIMIT) {
+    conditionalCache.delete(conditionalCache.keys().next().value);
+  }
+};
+
 // Request interceptor
 apiClient.interceptors.request.use(
   (config) => {
     console.log(`Making ${config.method?.toUpperCase()} request to: ${config.url}`);
+    if (config.method === 'get') {
+      const cached = conditionalCache.get(apiClient.getUri(config));
+      if (cached) {
+        config.headers['If-None-Match'] = cached.etag;
+      }
+    }
     return config;
   },
   (error) => {
@@ -27,6 +52,17 @@ apiClient.interceptors.request.use(
 // Response interceptor
 apiClient.interceptors.response.use(
   (response) => {
+    if (response.config.method === 'get') {
+      const key = apiClient.getUri(response.config);
+      const cached = conditionalCache.get(key);
+      if (response.status === 304 && cached) {
+        // Unchanged: reuse the stored body and headers (e.g. X-Next-Cursor)
+        response = { ...response, status: 200, data: cached.data, headers: cached.headers };
+        rememberResponse(key, response);
+      } else if (response.headers.etag) {
+        rememberResponse(key, response);
+      }
+    }
     console.log(`Response received from: ${response.config.url}`, response.data);
     return response;
   },
@@ -38,17 +74,31 @@ apiClient.interceptors.response.use(
 
 // Client API
 export const clientAPI = {
-  // Get all clients
-  getClients: async () => {
+  // Get a page of clients ({ q, sort, order, limit, cursor })
+  getClients: async (params = {}) => {
     try {
-      const response = await apiClient.get('/clients/');
-      return response.data;
+      const response = await apiClient.get('/clients/', { params });
+      return {
+        clients: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
     } catch (error) {
       console.error('Error fetching clients:', error);
       throw error;
     }
   },
 
+  // Dashboard KPIs: totals, clients tested in the last `days` and score bands
+  getClientsSummary: async (days = 30) => {
+    try {
+      const response = await apiClient.get('/clients/summary', { params: { days } });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching clients summary:', error);
+      throw error;
+    }
+  },
+
   // Get client by ID
   getClient: async (clientId) => {
     try {
@@ -71,6 +121,21 @@ export const clientAPI = {
     }
   },
 
+  // Bulk import clients from a CSV or NDJSON file; returns the per-row report
+  importClients: async (file, format) => {
+    try {
+      const response = await apiClient.post('/clients/import', file, {
+        params: format ? { format } : {},
+        headers: { 'Content-Type': file.type || 'text/csv' },
+        timeout: 0,
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error importing clients:', error);
+      throw error;
+    }
+  },
+
   // Update client
   updateClient: async (clientId, clientData) => {
     try {
@@ -96,17 +161,34 @@ export const clientAPI = {
 
 // Test Results API
 export const testResultAPI = {
-  // Get all test results for a client
-  getClientTestResults: async (clientId) => {
+  // Get a page of a client's test results, newest first ({ from, to, fields, limit, cursor })
+  getClientTestResults: async (clientId, params = {}) => {
     try {
-      const response = await apiClient.get(`/test-results/client/${clientId}`);
-      return response.data;
+      const response = await apiClient.get(`/test-results/client/${clientId}`, { params });
+      return {
+        tests: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
     } catch (error) {
       console.error('Error fetching test results:', error);
       throw error;
     }
   },
 
+  // Tests of any client matching one exercise ({ exercise, pain, min_score, max_score, from, to, limit, cursor })
+  filterTestResults: async (params) => {
+    try {
+      const response = await apiClient.get('/test-results/filter', { params });
+      return {
+        tests: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+      };
+    } catch (error) {
+      console.error('Error filtering test results:', error);
+      throw error;
+    }
+  },
+
   // Get test result by ID
   getTestResult: async (testId) => {
     try {
@@ -141,14 +223,21 @@ export const testResultAPI = {
   }
 };
 
+// The exercise catalog is static; fetch it once per page load and let the
+// browser revalidate it with its ETag after that
+let exercisesRequest = null;
+
 // FMS Exercises API
 export const fmsExercisesAPI = {
   // Get all FMS exercises
   getExercises: async () => {
+    if (!exercisesRequest) {
+      exercisesRequest = apiClient.get('/fms-exercises/').then((response) => response.data);
+    }
     try {
-      const response = await apiClient.get('/fms-exercises/');
-      return response.data;
+      return await exercisesRequest;
     } catch (error) {
+      exercisesRequest = null;
       console.error('Error fetching FMS exercises:', error);
       throw error;
     }
@@ -166,6 +255,24 @@ export const fmsExercisesAPI = {
   }
 };
 
+// Live updates over Server-Sent Events
+export const eventsAPI = {
+  // Calls onEvent({ type: 'change', collection, operation, id, client_id }) for
+  // each change, or onEvent({ type: 'resync' }) when changes were missed and
+  // everything should be reloaded. Pass clientId to follow a single client.
+  // Returns a function that closes the stream; EventSource reconnects by itself.
+  subscribe: (onEvent, { clientId } = {}) => {
+    const query = clientId ? `?client_id=${encodeURIComponent(clientId)}` : '';
+    const source = new EventSource(`${API}/events${query}`);
+    source.addEventListener('change', (message) => {
+      onEvent({ type: 'change', ...JSON.parse(message.data) });
+    });
+    source.addEventListener('resync', () => onEvent({ type: 'resync' }));
+    source.onerror = () => console.warn('Live updates disconnected, reconnecting');
+    return () => source.close();
+  }
+};
+
 // General API
 export const generalAPI = {
   // Health check
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The backend is imported the way the app runs it: from backend/ as the top level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def mongo_db():
+    """A fresh in-process MongoDB stand-in (mongomock-motor)"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["fms_test"]
+
+@pytest.fixture(params=["memory", "sqlite", "mongodb"])
+async def repositories(request, tmp_path, monkeypatch):
+    """The same repositories on each storage backend; MongoDB is mongomock-backed"""
+    from repositories import create_repositories
+
+    db = None
+    if request.param == "sqlite":
+        monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "fms.sqlite3"))
+    elif request.param == "mongodb":
+        db = request.getfixturevalue("mongo_db")
+    repositories = create_repositories(request.param, db)
+    yield repositories
+    await repositories.close()
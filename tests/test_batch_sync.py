@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import repositories.mongo as mongo
+import routes.test_results as test_results
+from indexes import ensure_indexes
+from models.test_result import TestResultBatch
+from repositories.mongo import create_mongo_repositories
+
+pytestmark = pytest.mark.anyio
+
+def _item(key: str, client_id: str = "client-1"):
+    return {
+        "idempotency_key": key,
+        "client_id": client_id,
+        "scores": {"deep_squat": {"score": 2}},
+    }
+
+async def _sync(repositories, *keys):
+    batch = TestResultBatch(items=[_item(key) for key in keys])
+    return await test_results.create_test_results_batch(batch, repositories=repositories)
+
+async def test_replayed_batch_reports_duplicates(repositories):
+    if repositories.db is not None:
+        await ensure_indexes(repositories.db)
+    await repositories.clients.create({"id": "client-1", "name": "Ada", "total_tests": 0, "latest_score": None, "last_test_date": None})
+    first = await _sync(repositories, "a", "b")
+    replay = await _sync(repositories, "a", "b", "c", "c")
+    assert (first.created, first.duplicates) == (2, 0)
+    assert (replay.created, replay.duplicates) == (1, 3)
+    assert [item.status for item in replay.results] == ["duplicate", "duplicate", "created", "duplicate"]
+    assert [item.id for item in replay.results[:2]] == [item.id for item in first.results]
+    assert replay.results[3].id == replay.results[2].id
+    assert (await repositories.clients.get("client-1"))["total_tests"] == 3
+    stored = await repositories.test_results.idempotency_ids(["a", "b", "c", "missing"])
+    assert stored == {"a": first.results[0].id, "b": first.results[1].id, "c": replay.results[2].id}
+
+async def test_deleting_a_test_frees_its_key(repositories):
+    first = await _sync(repositories, "a")
+    await repositories.test_results.delete(first.results[0].id)
+    assert await repositories.test_results.idempotency_ids(["a"]) == {}
+    assert (await _sync(repositories, "a")).created == 1
+
+async def test_concurrent_sync_aborting_the_transaction_is_retried(mongo_db, monkeypatch):
+    await ensure_indexes(mongo_db)
+    calls = []
+
+    async def run_in_transaction(db, callback):
+        calls.append(callback)
+        if len(calls) == 1:
+            # Another device stored "a" between the lookup and the insert
+            await db.test_results.insert_one({"id": "stored-elsewhere", "idempotency_key": "a", "client_id": "client-1"})
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+        return await callback(None)
+
+    monkeypatch.setattr(mongo, "run_in_transaction", run_in_transaction)
+    response = await _sync(create_mongo_repositories(mongo_db), "a", "b")
+    assert len(calls) == 2
+    assert [item.status for item in response.results] == ["duplicate", "created"]
+    assert response.results[0].id == "stored-elsewhere"
+    assert await mongo_db.test_results.count_documents({"idempotency_key": "a"}) == 1
+
+async def test_other_write_errors_still_fail(mongo_db, monkeypatch):
+    async def run_in_transaction(db, callback):
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+
+    monkeypatch.setattr(mongo, "run_in_transaction", run_in_transaction)
+    with pytest.raises(test_results.HTTPException):
+        await _sync(create_mongo_repositories(mongo_db), "a")
+
+async def test_dates_with_an_offset_are_stored_as_naive_utc(mongo_db, caplog):
+    await ensure_indexes(mongo_db)
+    await mongo_db.clients.insert_one({
+        "id": "client-1", "name": "Ada", "total_tests": 0, "latest_score": None, "last_test_date": None, "version": 1,
+    })
+    first = await _sync(create_mongo_repositories(mongo_db), "a")
+    assert first.created == 1
+    # mongomock's $max skips a null last_test_date, so the first sync falls back to a recalculation
+    caplog.clear()
+
+    items = [
+        {**_item("b"), "test_date": "2030-01-02T10:00:00.000Z"},
+        {**_item("c"), "test_date": "2030-01-02T12:30:00+02:00"},
+        {**_item("d"), "test_date": "2030-01-01T09:00:00"},
+    ]
+    response = await test_results.create_test_results_batch(TestResultBatch(items=items), repositories=create_mongo_repositories(mongo_db))
+    assert response.created == 3
+    # The incremental stats update ran; no fallback to recalculating from history
+    assert [record.message for record in caplog.records if record.levelname == "ERROR"] == []
+
+    dates = {test["idempotency_key"]: test["test_date"] async for test in mongo_db.test_results.find({"idempotency_key": {"$in": ["b", "c"]}})}
+    assert dates == {"b": datetime(2030, 1, 2, 10, 0), "c": datetime(2030, 1, 2, 10, 30)}
+    client = await mongo_db.clients.find_one({"id": "client-1"})
+    assert (client["total_tests"], client["last_test_date"]) == (4, datetime(2030, 1, 2, 10, 30))
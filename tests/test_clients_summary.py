@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from routes.clients import get_clients_summary
+
+pytestmark = pytest.mark.anyio
+
+async def test_summary_on_every_backend(repositories):
+    now = datetime.utcnow().replace(microsecond=0)
+    for client_id in ("low", "good", "untested"):
+        await repositories.clients.create({
+            "id": client_id,
+            "name": client_id,
+            "email": f"{client_id}@example.com",
+            "created_at": now - timedelta(days=90),
+            "total_tests": 0,
+            "latest_score": None,
+            "last_test_date": None,
+            "search_keys": [client_id],
+        })
+    tests = [("low", 10, 60), ("low", 12, 5), ("good", 18, 45)]
+    for index, (client_id, total_score, days_ago) in enumerate(tests):
+        await repositories.test_results.create({
+            "id": f"test-{index}",
+            "client_id": client_id,
+            "test_date": now - timedelta(days=days_ago),
+            "scores": {},
+            "total_score": total_score,
+            "score_entries": [],
+        })
+
+    summary = await get_clients_summary(days=30, repositories=repositories)
+    assert (summary.total_clients, summary.total_tests) == (3, 3)
+    assert (summary.tested_clients, summary.untested_clients) == (2, 1)
+    assert (summary.recent_days, summary.recently_tested_clients) == (30, 1)
+    assert {band.label: band.clients for band in summary.score_bands} == {"low": 1, "moderate": 0, "good": 1}
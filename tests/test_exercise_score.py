@@ -0,0 +1,22 @@
+import pytest
+from pydantic import ValidationError
+
+from models.test_result import ExerciseScore
+
+def test_bilateral_score_is_the_lower_side():
+    assert ExerciseScore(score=1, left=1, right=3).score == 1
+
+def test_bilateral_score_above_the_lower_side_is_rejected():
+    with pytest.raises(ValidationError, match="lower of left and right"):
+        ExerciseScore(score=3, left=1, right=3)
+
+def test_bilateral_score_below_the_lower_side_is_rejected():
+    with pytest.raises(ValidationError):
+        ExerciseScore(score=0, left=2, right=2)
+
+def test_pain_scores_zero_whatever_the_sides():
+    assert ExerciseScore(score=0, pain=True, left=2, right=3).score == 0
+
+def test_one_side_or_none_is_not_checked():
+    assert ExerciseScore(score=2, left=3).score == 2
+    assert ExerciseScore(score=2).score == 2
@@ -0,0 +1,23 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from export import export_chunks
+
+pytestmark = pytest.mark.anyio
+
+async def test_parquet_keeps_microseconds_of_legacy_string_dates(mongo_db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    pytest.importorskip("pandas")
+    await mongo_db.test_results.insert_many([
+        {"id": "legacy", "client_id": "c1", "test_date": "2024-03-01T10:15:30.123456", "total_score": 14, "scores": {}},
+        {"id": "native", "client_id": "c1", "test_date": datetime(2024, 3, 2, 9, 0, 0, 250000), "total_score": 15, "scores": {}},
+    ])
+    body = b"".join([chunk async for chunk in export_chunks(mongo_db, "test_results", "parquet")])
+    table = pq.read_table(io.BytesIO(body))
+    dates = dict(zip(table.column("id").to_pylist(), table.column("test_date").to_pylist()))
+    assert dates == {
+        "legacy": datetime(2024, 3, 1, 10, 15, 30, 123456),
+        "native": datetime(2024, 3, 2, 9, 0, 0, 250000),
+    }
@@ -0,0 +1,39 @@
+import pytest
+
+from indexes import INDEXES, ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+async def test_ensure_indexes_creates_every_index(mongo_db):
+    await ensure_indexes(mongo_db)
+    for collection_name, models in INDEXES.items():
+        existing = await mongo_db[collection_name].index_information()
+        assert {model.document["name"] for model in models} <= set(existing)
+
+async def test_ensure_indexes_renames_server_named_indexes(mongo_db):
+    # Indexes created by releases that let the server pick the names
+    await mongo_db.clients.create_index([("name", 1), ("id", 1)])
+    await mongo_db.clients.create_index("search_keys")
+
+    await ensure_indexes(mongo_db)
+
+    existing = await mongo_db.clients.index_information()
+    assert "name_1_id_1" not in existing
+    assert "search_keys_1" not in existing
+    assert {"name_id", "search_keys", "id_unique"} <= set(existing)
+
+async def test_ensure_indexes_is_idempotent(mongo_db):
+    await ensure_indexes(mongo_db)
+    before = await mongo_db.clients.index_information()
+    await ensure_indexes(mongo_db)
+    assert await mongo_db.clients.index_information() == before
+
+async def test_ensure_indexes_rebuilds_an_index_whose_keys_changed(mongo_db):
+    # The score_entries index as an earlier release built it, score before test_date
+    old_keys = [("score_entries.exercise", 1), ("score_entries.pain", 1), ("score_entries.score", 1), ("test_date", -1), ("id", -1)]
+    await mongo_db.test_results.create_index(old_keys, name="score_entries_test_date")
+
+    await ensure_indexes(mongo_db)
+
+    keys = [field for field, _ in (await mongo_db.test_results.index_information())["score_entries_test_date"]["key"]]
+    assert keys == ["score_entries.exercise", "score_entries.pain", "test_date", "id", "score_entries.score"]
@@ -0,0 +1,85 @@
+import pytest
+
+import ingest
+from ingest import iter_csv_rows
+
+pytestmark = pytest.mark.anyio
+
+async def _chunks(text: str):
+    yield text.encode()
+
+async def _rows(text: str):
+    return [row async for row in iter_csv_rows(_chunks(text))]
+
+async def test_quoted_field_spans_lines():
+    rows = await _rows('name,notes\nAda,"first line\nsecond line"\nGrace,\n')
+    assert rows == [
+        (1, {"name": "Ada", "notes": "first line\nsecond line"}),
+        (2, {"name": "Grace", "notes": None}),
+    ]
+
+async def test_stray_quote_costs_one_row(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_RECORD_LINES", 3)
+    lines = ["name,notes", 'O"Brien,x'] + [f"Client {index},y" for index in range(5)]
+    rows = await _rows("\n".join(lines) + "\n")
+    assert rows[0][0] == 1 and isinstance(rows[0][1], ValueError)
+    assert "3 lines" in str(rows[0][1])
+    assert [row for _, row in rows[1:]] == [{"name": f"Client {index}", "notes": "y"} for index in range(5)]
+    assert [number for number, _ in rows] == list(range(1, 7))
+
+async def test_stray_quote_near_the_end_keeps_the_last_rows():
+    rows = await _rows('name,notes\nO"Brien,x\nAda,y\nGrace,z')
+    assert isinstance(rows[0][1], ValueError)
+    assert str(rows[0][1]) == "Unterminated quoted field"
+    assert [row for _, row in rows[1:]] == [{"name": "Ada", "notes": "y"}, {"name": "Grace", "notes": "z"}]
+
+async def test_overlong_line_is_a_row_error(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_LENGTH", 20)
+
+    async def chunks():
+        yield b"name,notes\nAda,x\n"
+        # One line arriving in pieces with no newline in sight
+        for _ in range(50):
+            yield b"y" * 10
+        yield b"\nGrace,z\n"
+
+    lines = [line async for line in ingest.iter_lines(chunks())]
+    assert lines[:2] == ["name,notes", "Ada,x"] and lines[3:] == ["Grace,z"]
+    assert isinstance(lines[2], ValueError) and "20 characters" in str(lines[2])
+
+    rows = [row async for row in iter_csv_rows(chunks())]
+    assert rows[0] == (1, {"name": "Ada", "notes": "x"})
+    assert rows[1][0] == 2 and isinstance(rows[1][1], ValueError)
+    assert rows[2] == (3, {"name": "Grace", "notes": "z"})
+
+async def test_overlong_ndjson_line_at_the_end(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_LENGTH", 20)
+
+    async def chunks():
+        yield b'{"name": "Ada"}\n' + b"x" * 100
+
+    rows = [row async for row in ingest.iter_ndjson_rows(chunks())]
+    assert rows[0] == (1, {"name": "Ada"})
+    assert rows[1][0] == 2 and isinstance(rows[1][1], ValueError)
+
+async def test_import_stores_clients_on_every_backend(repositories):
+    httpx = pytest.importorskip("httpx")
+    from fastapi import FastAPI
+
+    from repositories import get_repositories
+    from routes.clients import router
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.dependency_overrides[get_repositories] = lambda: repositories
+    body = "name,email\nAda Lovelace,ada@example.com\nGrace Hopper,not-an-email\nAlan Turing,alan@example.com\n"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.post("/api/clients/import", content=body, headers={"content-type": "text/csv"})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert [error["row"] for error in report["errors"]] == [2]
+    clients = await repositories.clients.page("name", False, None, None, 10)
+    assert [client["name"] for client in clients] == ["Ada Lovelace", "Alan Turing"]
+    assert [client["name"] for client in await repositories.clients.page("name", False, "tur", None, 10)] == ["Alan Turing"]
@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+
+pytestmark = pytest.mark.anyio
+
+async def test_jobs_whose_lease_lapses_later_are_reclaimed(mongo_db, monkeypatch):
+    monkeypatch.setattr(jobs, "RECLAIM_INTERVAL_SECONDS", 0.05)
+    ran = asyncio.Event()
+
+    async def handler(db, job):
+        ran.set()
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "test_job", handler)
+    # Held by a worker that dies just after this worker started
+    await mongo_db.jobs.insert_one({
+        "id": "job-1",
+        "type": "test_job",
+        "status": "running",
+        "params": {},
+        "lease_expires_at": datetime.utcnow() + timedelta(seconds=0.2),
+    })
+    try:
+        await jobs.resume_jobs(mongo_db)
+        await asyncio.sleep(0.1)
+        assert not ran.is_set()
+        await asyncio.wait_for(ran.wait(), 2)
+        await asyncio.sleep(0.05)
+        job = await mongo_db.jobs.find_one({"id": "job-1"})
+        assert (job["status"], job["lease_expires_at"]) == ("completed", None)
+    finally:
+        await jobs.stop_jobs()
+    assert jobs._reclaim_task is None
@@ -0,0 +1,43 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_DURATION, HTTP_REQUESTS, MetricsMiddleware
+
+pytestmark = pytest.mark.anyio
+
+def _in_flight() -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in HTTP_IN_FLIGHT.samples())
+
+def _timed_routes():
+    return {line.split('route="', 1)[1].split('"', 1)[0] for line in HTTP_REQUEST_DURATION.samples()}
+
+async def test_event_streams_are_not_timed_or_counted_in_flight():
+    httpx = pytest.importorskip("httpx")
+    seen_in_flight = []
+    api = FastAPI()
+
+    @api.get("/api/metrics-test/events")
+    async def events():
+        async def stream():
+            seen_in_flight.append(_in_flight())
+            yield b"event: change\ndata: {}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @api.get("/api/metrics-test/clients")
+    async def clients():
+        seen_in_flight.append(_in_flight())
+        return JSONResponse([])
+
+    app = MetricsMiddleware(api)
+    baseline = _in_flight()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        assert (await http.get("/api/metrics-test/events")).status_code == 200
+        assert (await http.get("/api/metrics-test/clients")).status_code == 200
+
+    # The stream stops counting once it starts; the JSON request counts while it runs
+    assert seen_in_flight == [baseline, baseline + 1]
+    assert _in_flight() == baseline
+    assert "/api/metrics-test/clients" in _timed_routes()
+    assert "/api/metrics-test/events" not in _timed_routes()
+    assert HTTP_REQUESTS._values[("GET", "/api/metrics-test/events", "200")] == 1
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from repositories.mongo import create_mongo_repositories
+
+pytestmark = pytest.mark.anyio
+
+def _test(test_id, test_date):
+    return {
+        "id": test_id,
+        "client_id": "c1",
+        "test_date": test_date,
+        "scores": {"deepSquat": {"score": 1, "pain": False}},
+        "score_entries": [{"exercise": "deepSquat", "score": 1, "pain": False}],
+        "total_score": 1,
+    }
+
+@pytest.fixture
+async def repositories(mongo_db):
+    # One test still stored as an ISO string, as before the native-date migration
+    await mongo_db.test_results.insert_many([
+        _test("legacy", "2024-01-15T10:00:00.123456"),
+        _test("native", datetime(2024, 1, 20, 9, 30)),
+        _test("legacy-old", "2023-12-01T08:00:00"),
+        _test("native-old", datetime(2023, 12, 2)),
+    ])
+    return create_mongo_repositories(mongo_db)
+
+async def test_history_date_range_includes_legacy_string_dates(repositories):
+    tests = await repositories.test_results.history(
+        "c1", None, datetime(2024, 1, 1), datetime(2024, 1, 31), None, 10
+    )
+    assert {test["id"] for test in tests} == {"legacy", "native"}
+
+async def test_history_date_range_accepts_aware_bounds(repositories):
+    tests = await repositories.test_results.history(
+        "c1", None, datetime(2024, 1, 16, tzinfo=timezone.utc), None, None, 10
+    )
+    assert [test["id"] for test in tests] == ["native"]
+
+async def test_filter_date_range_includes_legacy_string_dates(repositories):
+    tests = await repositories.test_results.filter(
+        {"exercise": "deepSquat"}, datetime(2024, 1, 1), None, None, 10
+    )
+    assert {test["id"] for test in tests} == {"legacy", "native"}
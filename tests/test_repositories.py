@@ -0,0 +1,249 @@
+"""One suite run against every storage backend: memory, SQLite and (mongomock-backed) MongoDB"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from indexes import ensure_indexes
+from models.client import build_search_keys
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2024, 1, 1)
+
+# (id, name, created_at day, latest_score, last_test_date day); repeated
+# values and nulls exercise the id tie-breaker and null ordering
+CLIENTS = [
+    ("c1", "Ada Lovelace", 3, 14, 10),
+    ("c2", "Grace Hopper", 1, None, None),
+    ("c3", "Alan Turing", 3, 17, 12),
+    ("c4", "Ada Byron", 2, 14, None),
+    ("c5", "Edsger Dijkstra", 5, None, 12),
+    ("c6", "Barbara Liskov", 4, 9, 11),
+    ("c7", "Alan Kay", 1, 17, 10),
+]
+
+def _day(day):
+    return START + timedelta(days=day) if day is not None else None
+
+def _client(client_id, name, created, latest_score=None, last_test=None):
+    email = f"{client_id}@example.com"
+    return {
+        "id": client_id,
+        "name": name,
+        "email": email,
+        "phone": None,
+        "date_of_birth": None,
+        "occupation": None,
+        "created_at": _day(created),
+        "total_tests": 0,
+        "latest_score": latest_score,
+        "last_test_date": _day(last_test),
+        "search_keys": build_search_keys(name, email),
+    }
+
+def _test(test_id, client_id, test_date, total_score=10):
+    return {
+        "id": test_id,
+        "client_id": client_id,
+        "test_date": test_date,
+        "scores": {"deep_squat": {"score": 2, "pain": False}},
+        "total_score": total_score,
+        "assessor_notes": None,
+        "score_entries": [{"exercise": "deep_squat", "score": 2, "pain": False}],
+    }
+
+async def _create_clients(repositories):
+    for row in CLIENTS:
+        await repositories.clients.create(_client(*row))
+
+async def _walk(repositories, sort, descending, q=None, limit=2):
+    """Every id of a listing, fetched limit at a time through keyset cursors"""
+    ids, after = [], None
+    while True:
+        page = await repositories.clients.page(sort, descending, q, after, limit)
+        ids += [client["id"] for client in page]
+        if len(page) < limit:
+            return ids
+        after = (page[-1].get(sort), page[-1]["id"])
+
+def _expected(sort, descending):
+    documents = [_client(*row) for row in CLIENTS]
+    # Nulls first, then by value, ties by id
+    ordered = sorted(documents, key=lambda client: (client[sort] is not None, client[sort], client["id"]), reverse=descending)
+    return [client["id"] for client in ordered]
+
+async def test_client_create_get_update(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 3))
+    client = await repositories.clients.get("c1")
+    assert client["name"] == "Ada Lovelace"
+    assert client["created_at"] == _day(3)
+    assert "search_keys" not in client
+
+    updated = await repositories.clients.update("c1", {"occupation": "Mathematician"})
+    assert updated["occupation"] == "Mathematician"
+    assert updated["version"] == client.get("version", 0) + 1
+    assert (await repositories.clients.get("c1"))["occupation"] == "Mathematician"
+
+    assert await repositories.clients.get("missing") is None
+    assert await repositories.clients.update("missing", {"occupation": "None"}) is None
+
+@pytest.mark.parametrize("sort", ["name", "created_at", "latest_score", "last_test_date"])
+@pytest.mark.parametrize("descending", [False, True])
+async def test_client_pages_follow_cursors_in_every_order(repositories, sort, descending):
+    await _create_clients(repositories)
+    assert await _walk(repositories, sort, descending) == _expected(sort, descending)
+
+async def test_client_prefix_search(repositories):
+    await _create_clients(repositories)
+    assert await _walk(repositories, "name", False, q="ada") == ["c4", "c1"]
+    # Any name word or the email
+    assert await _walk(repositories, "name", False, q="kay") == ["c7"]
+    assert await _walk(repositories, "name", False, q="c6@") == ["c6"]
+    assert await _walk(repositories, "name", False, q="zz") == []
+
+async def test_test_create_counts_on_client_and_get(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    await repositories.test_results.create(_test("t1", "c1", _day(5), total_score=12))
+    await repositories.test_results.create(_test("t2", "c1", _day(3), total_score=15))
+
+    client = await repositories.clients.get("c1")
+    # The older test does not replace the latest score
+    assert (client["total_tests"], client["latest_score"], client["last_test_date"]) == (2, 12, _day(5))
+    test = await repositories.test_results.get("t2")
+    assert (test["client_id"], test["total_score"], test["test_date"]) == ("c1", 15, _day(3))
+    assert "score_entries" not in test
+    assert await repositories.test_results.get("missing") is None
+
+async def test_history_date_ranges_and_cursor(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    await repositories.clients.create(_client("c2", "Alan Turing", 0))
+    for day in range(1, 8):
+        await repositories.test_results.create(_test(f"t{day}", "c1", _day(day)))
+    await repositories.test_results.create(_test("other", "c2", _day(4)))
+
+    async def history(from_date=None, to_date=None, after=None, limit=10, fields=None):
+        tests = await repositories.test_results.history("c1", fields, from_date, to_date, after, limit)
+        return [test["id"] for test in tests]
+
+    assert await history() == [f"t{day}" for day in range(7, 0, -1)]
+    assert await history(from_date=_day(3), to_date=_day(5)) == ["t5", "t4", "t3"]
+    assert await history(from_date=_day(6)) == ["t7", "t6"]
+    assert await history(to_date=_day(2)) == ["t2", "t1"]
+    # Aware bounds compare with the stored naive UTC dates
+    aware = _day(5).replace(tzinfo=timezone.utc).astimezone(timezone(timedelta(hours=2)))
+    assert await history(from_date=aware) == ["t7", "t6", "t5"]
+    assert await history(from_date=_day(2), after=(_day(5), "t5"), limit=2) == ["t4", "t3"]
+
+    tests = await repositories.test_results.history("c1", {"id", "total_score"}, None, None, None, 1)
+    assert tests == [{"id": "t7", "total_score": 10}]
+
+async def test_test_delete_recomputes_client_stats(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    await repositories.test_results.create(_test("t1", "c1", _day(1), total_score=12))
+    await repositories.test_results.create(_test("t2", "c1", _day(2), total_score=16))
+
+    deleted = await repositories.test_results.delete("t2")
+    assert deleted["id"] == "t2"
+    client = await repositories.clients.get("c1")
+    assert (client["total_tests"], client["latest_score"], client["last_test_date"]) == (1, 12, _day(1))
+    assert await repositories.test_results.delete("t2") is None
+
+async def test_client_delete_cascades_to_its_tests(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    await repositories.clients.create(_client("c2", "Alan Turing", 0))
+    for day in range(1, 4):
+        await repositories.test_results.create(_test(f"t{day}", "c1", _day(day)))
+    await repositories.test_results.create(_test("other", "c2", _day(1)))
+
+    assert await repositories.clients.delete("c1") is True
+    assert await repositories.clients.get("c1") is None
+    assert [await repositories.test_results.get(f"t{day}") for day in range(1, 4)] == [None, None, None]
+    assert await repositories.test_results.history("c1", None, None, None, None, 10) == []
+    # Other clients keep their tests
+    assert (await repositories.test_results.get("other"))["client_id"] == "c2"
+    assert await repositories.clients.delete("c1") is False
+
+async def test_filter_by_exercise_entry_newest_first(repositories):
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    # (day, score, pain) of deep_squat; days 3 and 5 share a date to exercise the id tie-breaker
+    rows = [(1, 1, False), (2, 3, False), (3, 0, True), (3, 1, False), (4, 1, True), (5, 2, False), (6, 0, False)]
+    for index, (day, score, pain) in enumerate(rows):
+        test = _test(f"t{index}", "c1", _day(day))
+        test["scores"] = {"deep_squat": {"score": score, "pain": pain}}
+        test["score_entries"] = [{"exercise": "deep_squat", "score": score, "pain": pain}]
+        await repositories.test_results.create(test)
+
+    async def walk(entry, limit=2, **dates):
+        ids, after = [], None
+        while True:
+            page = await repositories.test_results.filter(entry, dates.get("from_date"), dates.get("to_date"), after, limit)
+            ids += [test["id"] for test in page]
+            if len(page) < limit:
+                return ids
+            after = (page[-1]["test_date"], page[-1]["id"])
+
+    low = {"exercise": "deep_squat", "score": {"$lte": 1}}
+    # Without pain, painful and pain-free entries interleave by date
+    assert await walk(low) == ["t6", "t4", "t3", "t2", "t0"]
+    assert await walk({**low, "pain": True}) == ["t4", "t2"]
+    assert await walk({**low, "pain": False}) == ["t6", "t3", "t0"]
+    assert await walk({"exercise": "deep_squat", "score": {"$gte": 2}}) == ["t5", "t1"]
+    assert await walk(low, from_date=_day(2), to_date=_day(4)) == ["t4", "t3", "t2"]
+    assert await walk({"exercise": "hurdle_step"}) == []
+
+@pytest.mark.parametrize("entry", [
+    {"exercise": "deep_squat", "score": {"$lte": 1}},
+    {"exercise": "deep_squat", "pain": True, "score": {"$gte": 1, "$lte": 2}},
+])
+async def test_sqlite_filter_reads_score_entries_in_index_order(tmp_path, entry):
+    from repositories.sqlite import create_sqlite_repositories
+
+    repositories = create_sqlite_repositories(str(tmp_path / "fms.sqlite3"))
+    connection = repositories.test_results.database.connection
+    statements = []
+    connection.set_trace_callback(statements.append)
+    try:
+        await repositories.test_results.filter(entry, _day(1), _day(9), (_day(5), "t5"), 10)
+        connection.set_trace_callback(None)
+        sql = next(statement for statement in statements if statement.startswith("SELECT t.document"))
+        plan = [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    finally:
+        await repositories.close()
+
+    searches = [step for step in plan if "score_entries" in step]
+    assert searches and all("COVERING INDEX score_entries_exercise_pain_test_date" in step for step in searches)
+    if "pain" not in entry:
+        assert any("MERGE (UNION ALL)" in step for step in plan)
+    # Only the final page of joined rows is sorted again
+    assert sum("TEMP B-TREE" in step for step in plan) <= 1
+
+async def test_client_pages_follow_writes(repositories):
+    await _create_clients(repositories)
+    # Renaming moves the client in name order and in search
+    await repositories.clients.update("c4", {"name": "Zoe Byron", "search_keys": build_search_keys("Zoe Byron", "c4@example.com")})
+    assert await _walk(repositories, "name", False, q="ada") == ["c1"]
+    assert await _walk(repositories, "name", False, q="zoe") == ["c4"]
+    assert (await _walk(repositories, "name", True))[0] == "c4"
+
+    # A new test sets the latest score; deleting it restores the previous order
+    await repositories.test_results.create(_test("t1", "c2", _day(20), total_score=21))
+    assert (await _walk(repositories, "latest_score", True))[0] == "c2"
+    assert (await _walk(repositories, "last_test_date", True))[0] == "c2"
+    await repositories.test_results.delete("t1")
+    assert (await _walk(repositories, "latest_score", False))[:2] == ["c2", "c5"]
+
+    await repositories.clients.delete("c1")
+    assert "c1" not in await _walk(repositories, "created_at", False)
+    assert await _walk(repositories, "name", False, q="lovelace") == []
+
+async def test_client_insert_many_reports_each_failure(repositories):
+    if repositories.db is not None:
+        # MongoDB rejects the repeated id through the unique index
+        await ensure_indexes(repositories.db)
+    await repositories.clients.create(_client("c1", "Ada Lovelace", 0))
+    failures = await repositories.clients.insert_many([
+        _client("c2", "Alan Turing", 1), _client("c1", "Ada Byron", 2), _client("c3", "Grace Hopper", 3),
+    ])
+    assert list(failures) == [1] and failures[1]
+    assert await _walk(repositories, "name", False) == ["c1", "c2", "c3"]
+    assert (await repositories.clients.get("c1"))["name"] == "Ada Lovelace"